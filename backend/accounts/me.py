@@ -1,5 +1,4 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Count
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -9,7 +8,8 @@ from accounts.models import UserProfile
 from accounts.permissions import IsAdmin
 from accounts.serializers import UserProfileSerializer, UserSerializer
 from accounts.utils import get_user_role
-from tickets.tasks import assign_ticket
+from tickets import agent_queue
+from tickets.tasks import assign_open_tickets_batch
 
 
 class MeView(APIView):
@@ -28,18 +28,9 @@ class AvailabilityView(APIView):
             return Response({"detail": "Only agents/admins can view availability"}, status=status.HTTP_403_FORBIDDEN)
 
         profile, _ = UserProfile.objects.get_or_create(user=request.user)
-        from tickets.models import Ticket
-
-        active_statuses = [
-            Ticket.Status.OPEN,
-            Ticket.Status.ASSIGNED,
-            Ticket.Status.IN_PROGRESS,
-            Ticket.Status.WAITING_ON_CUSTOMER,
-        ]
-        active_count = Ticket.objects.filter(assigned_agent=request.user, status__in=active_statuses).count()
 
         data = UserProfileSerializer(profile).data
-        data["active_assigned_count"] = active_count
+        data["active_assigned_count"] = profile.active_count
         return Response(data)
 
     def patch(self, request):
@@ -61,30 +52,13 @@ class AvailabilityView(APIView):
                 return Response({"detail": "capacity must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
 
         profile.save(update_fields=["is_available", "capacity"])
+        agent_queue.sync_agents([request.user.id])
 
         if role == UserProfile.Role.AGENT and (not before_available) and profile.is_available:
-            from tickets.models import Ticket
-
-            unassigned = (
-                Ticket.objects.filter(status=Ticket.Status.OPEN, assigned_agent__isnull=True)
-                .order_by("created_at")
-                .values_list("id", flat=True)[:50]
-            )
-            for tid in unassigned:
-                assign_ticket.delay(int(tid))
-
-        from tickets.models import Ticket
-
-        active_statuses = [
-            Ticket.Status.OPEN,
-            Ticket.Status.ASSIGNED,
-            Ticket.Status.IN_PROGRESS,
-            Ticket.Status.WAITING_ON_CUSTOMER,
-        ]
-        active_count = Ticket.objects.filter(assigned_agent=request.user, status__in=active_statuses).count()
+            assign_open_tickets_batch.delay(50)
 
         data = UserProfileSerializer(profile).data
-        data["active_assigned_count"] = active_count
+        data["active_assigned_count"] = profile.active_count
         return Response(data)
 
 
@@ -99,25 +73,6 @@ class AdminAgentsPresenceView(APIView):
             .order_by("username")
         )
 
-        from tickets.models import Ticket
-
-        active_statuses = [
-            Ticket.Status.OPEN,
-            Ticket.Status.ASSIGNED,
-            Ticket.Status.IN_PROGRESS,
-            Ticket.Status.WAITING_ON_CUSTOMER,
-        ]
-
-        counts = (
-            Ticket.objects.filter(
-                assigned_agent_id__in=agents.values_list("id", flat=True),
-                status__in=active_statuses,
-            )
-            .values("assigned_agent_id")
-            .annotate(c=Count("id"))
-        )
-        count_map = {row["assigned_agent_id"]: row["c"] for row in counts}
-
         out = []
         for u in agents:
             p = getattr(u, "profile", None)
@@ -128,7 +83,7 @@ class AdminAgentsPresenceView(APIView):
                     "email": u.email,
                     "is_available": bool(getattr(p, "is_available", False)),
                     "capacity": int(getattr(p, "capacity", 0) or 0),
-                    "active_assigned_count": int(count_map.get(u.id, 0)),
+                    "active_assigned_count": int(getattr(p, "active_count", 0) or 0),
                 }
             )
 
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.8 on 2026-10-18 20:12
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+ACTIVE_STATUSES = ["OPEN", "ASSIGNED", "IN_PROGRESS", "WAITING_ON_CUSTOMER"]
+
+
+def populate_active_count(apps, schema_editor):
+    Ticket = apps.get_model("tickets", "Ticket")
+    UserProfile = apps.get_model("accounts", "UserProfile")
+
+    counts = (
+        Ticket.objects.filter(assigned_agent__isnull=False, status__in=ACTIVE_STATUSES)
+        .values("assigned_agent_id")
+        .annotate(c=Count("id"))
+    )
+    for row in counts:
+        UserProfile.objects.filter(user_id=row["assigned_agent_id"]).update(active_count=row["c"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_emailotp_emailverificationtoken'),
+        ('tickets', '0003_ticket_search_vectors'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='active_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['role', 'is_available', 'active_count'], name='profile_agent_load_idx'),
+        ),
+        migrations.RunPython(populate_active_count, migrations.RunPython.noop),
+    ]
@@ -16,6 +16,14 @@ class UserProfile(models.Model):
 
     is_available = models.BooleanField(default=False)
     capacity = models.PositiveIntegerField(default=5)
+    # Denormalized count of assigned tickets in an active status; maintained by
+    # tickets.agent_load and repaired by the reconcile_agent_load command.
+    active_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["role", "is_available", "active_count"], name="profile_agent_load_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"UserProfile(user_id={self.user_id}, role={self.role})"
@@ -1,8 +1,9 @@
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 from accounts.models import UserProfile
+from accounts.utils import invalidate_user_role
 
 User = get_user_model()
 
@@ -11,3 +12,9 @@ User = get_user_model()
 def ensure_profile(sender, instance, created, **kwargs):
     if created:
         UserProfile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_role(sender, instance, **kwargs):
+    invalidate_user_role(instance.user_id)
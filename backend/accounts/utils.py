@@ -1,9 +1,56 @@
+from django.conf import settings
+from django.core.cache import cache
+
 from accounts.models import UserProfile
 
+# Memoized on the user instance, which DRF and Channels keep for exactly one
+# request / one socket, so repeated permission checks cost nothing.
+_ROLE_ATTR = "_cached_user_role"
+
+
+def role_cache_key(user_id) -> str:
+    return f"accounts:role:{user_id}"
+
+
+def invalidate_user_role(user_id) -> None:
+    try:
+        cache.delete(role_cache_key(user_id))
+    except Exception:
+        pass
+
+
+def _load_role(user) -> str:
+    role = UserProfile.objects.filter(user_id=user.pk).values_list("role", flat=True).first()
+    if role is None:
+        profile, _ = UserProfile.objects.get_or_create(user=user)
+        role = profile.role
+    return role
+
 
 def get_user_role(user) -> str:
     if user is None or not getattr(user, "is_authenticated", False):
         return UserProfile.Role.CUSTOMER
 
-    profile, _ = UserProfile.objects.get_or_create(user=user)
-    return profile.role
+    role = getattr(user, _ROLE_ATTR, None)
+    if role is not None:
+        return role
+
+    ttl = int(getattr(settings, "ROLE_CACHE_TTL", 0) or 0)
+    key = role_cache_key(user.pk)
+
+    if ttl > 0:
+        try:
+            role = cache.get(key)
+        except Exception:
+            role = None
+
+    if role is None:
+        role = _load_role(user)
+        if ttl > 0:
+            try:
+                cache.set(key, role, ttl)
+            except Exception:
+                pass
+
+    setattr(user, _ROLE_ATTR, role)
+    return role
@@ -1,9 +1,24 @@
 import os
 
 from celery import Celery
+from celery.signals import worker_process_shutdown
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
 app = Celery("ticket_automation")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
+
+
+@worker_process_shutdown.connect
+def _close_mail_pool(**kwargs):
+    from core.mail_pool import close_pool
+
+    close_pool()
+
+
+@worker_process_shutdown.connect
+def _close_ai_session(**kwargs):
+    from core.ai_client import close_session
+
+    close_session()
@@ -0,0 +1,249 @@
+# Gemini client used for AI drafts. One keep-alive requests.Session per process
+# (so repeated drafts reuse the TLS connection instead of handshaking twice per
+# call), and a TTL cache of the models the key can use, remembering the one that
+# last answered so the next draft tries it first without a discovery round-trip.
+
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+PREFERRED_MODELS = [
+    "gemini-1.5-flash",
+    "gemini-1.5-flash-latest",
+    "gemini-1.5-pro",
+    "gemini-1.5-pro-latest",
+    "gemini-1.0-pro",
+]
+
+# A model answering with these is unavailable to this key; try the next candidate.
+_SKIP_MODEL_STATUSES = {403, 404}
+
+
+class AIClientError(RuntimeError):
+    pass
+
+
+def _api_base() -> str:
+    return getattr(settings, "GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
+
+
+def _api_key() -> str:
+    return (getattr(settings, "GEMINI_API_KEY", "") or "").strip()
+
+
+def is_configured() -> bool:
+    return bool(_api_key())
+
+
+def _timeout() -> float:
+    return float(getattr(settings, "AI_REQUEST_TIMEOUT", 20))
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """The process-wide keep-alive session (recreated after fork)."""
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            size = max(1, int(getattr(settings, "AI_HTTP_POOL_SIZE", 10)))
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session, _session_pid = session, os.getpid()
+        return _session
+
+
+def close_session() -> None:
+    global _session
+    with _session_lock:
+        if _session is not None and _session_pid == os.getpid():
+            _session.close()
+        _session = None
+
+
+class ModelCache:
+    """Discovered generateContent models for one API key, plus the last one that worked."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._models = None
+        self._expires = 0.0
+        self._last_good = None
+        self._unavailable = set()
+
+    def candidates(self, discover, refresh: bool = False) -> tuple[list[str], bool]:
+        """Models to try, best first, and whether discovery ran for this call."""
+        with self._lock:
+            fresh = not refresh and self._models is not None and time.monotonic() < self._expires
+            last_good = self._last_good
+        if not fresh:
+            try:
+                discovered = discover()
+            except (requests.RequestException, ValueError) as exc:
+                # Not exc_info: request errors embed the URL, which carries the API key.
+                logger.warning("Gemini model discovery failed: %s", exc.__class__.__name__)
+                discovered = []
+            with self._lock:
+                # Retry discovery sooner when it failed, but not on every draft.
+                self._models = discovered
+                self._expires = time.monotonic() + (self.ttl if discovered else min(self.ttl, 60))
+                self._unavailable.clear()
+
+        with self._lock:
+            models = self._models
+            unavailable = set(self._unavailable)
+        if models:
+            ordered = [m for m in PREFERRED_MODELS if m in set(models)] or list(models)
+        else:
+            ordered = list(PREFERRED_MODELS)
+        ordered = [m for m in ordered if m not in unavailable] or ordered
+        if last_good in ordered:
+            ordered.remove(last_good)
+            ordered.insert(0, last_good)
+        return ordered, not fresh
+
+    def mark_good(self, model: str) -> None:
+        with self._lock:
+            self._last_good = model
+
+    def mark_unavailable(self, model: str) -> None:
+        with self._lock:
+            self._unavailable.add(model)
+            if self._last_good == model:
+                self._last_good = None
+
+
+_model_caches = {}
+_model_caches_lock = threading.Lock()
+
+
+def _model_cache(api_key: str) -> ModelCache:
+    with _model_caches_lock:
+        cache = _model_caches.get(api_key)
+        if cache is None:
+            cache = ModelCache(float(getattr(settings, "AI_MODEL_CACHE_TTL", 3600)))
+            _model_caches[api_key] = cache
+        return cache
+
+
+def reset_model_cache() -> None:
+    with _model_caches_lock:
+        _model_caches.clear()
+
+
+def list_models(api_key: str) -> list[str]:
+    res = get_session().get(f"{_api_base()}/models", params={"key": api_key}, timeout=_timeout())
+    if not res.ok:
+        return []
+    data = res.json() if res.content else {}
+    out = []
+    for m in data.get("models") or []:
+        name = (m.get("name") or "").strip()
+        if not name.startswith("models/"):
+            continue
+        if "generateContent" not in set(m.get("supportedGenerationMethods") or []):
+            continue
+        out.append(name[len("models/") :])
+    return out
+
+
+def _extract_text(data: dict, strip: bool = True) -> str:
+    candidates = data.get("candidates") or []
+    if not candidates:
+        return ""
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    text = "".join(p.get("text", "") for p in parts if isinstance(p, dict))
+    return text.strip() if strip else text
+
+
+def _payload(prompt: str, temperature: float, max_output_tokens: int) -> dict:
+    return {
+        "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+        "generationConfig": {"temperature": temperature, "maxOutputTokens": max_output_tokens},
+    }
+
+
+def _post(api_key: str, method: str, payload: dict, stream: bool = False) -> requests.Response:
+    """POST ``models/<model>:<method>`` to the first candidate model that accepts it."""
+    cache = _model_cache(api_key)
+    session = get_session()
+    params = {"key": api_key, "alt": "sse"} if stream else {"key": api_key}
+    last_status, last_body = "unknown", ""
+    refresh = False
+    while True:
+        candidates, discovered = cache.candidates(lambda: list_models(api_key), refresh=refresh)
+        for model in candidates:
+            try:
+                res = session.post(
+                    f"{_api_base()}/models/{model}:{method}",
+                    params=params,
+                    json=payload,
+                    timeout=_timeout(),
+                    stream=stream,
+                )
+            except requests.RequestException as exc:
+                raise AIClientError(f"Gemini API request failed: {exc.__class__.__name__}") from exc
+            if res.ok:
+                cache.mark_good(model)
+                return res
+            # Reading the (small) error body also releases a streamed connection.
+            last_status, last_body = res.status_code, res.text
+            if res.status_code not in _SKIP_MODEL_STATUSES:
+                break
+            cache.mark_unavailable(model)
+        else:
+            # Every cached model was rejected: the list is stale, re-discover once.
+            if not discovered:
+                refresh = True
+                continue
+        break
+
+    body = (last_body or "").strip()[:1000]
+    raise AIClientError(f"Gemini API error: HTTP {last_status} {body} (tried models: {', '.join(candidates[:8])})")
+
+
+def _require_key() -> str:
+    api_key = _api_key()
+    if not api_key:
+        raise AIClientError("GEMINI_API_KEY is not configured")
+    return api_key
+
+
+def generate(prompt: str, temperature: float = 0.3, max_output_tokens: int = 300) -> str:
+    """Generate a completion for ``prompt``; raises AIClientError on failure."""
+    api_key = _require_key()
+    res = _post(api_key, "generateContent", _payload(prompt, temperature, max_output_tokens))
+    return _extract_text(res.json() if res.content else {})
+
+
+def stream_generate(prompt: str, temperature: float = 0.3, max_output_tokens: int = 300):
+    """Yield the completion for ``prompt`` in chunks as the API produces them (server-sent events)."""
+    api_key = _require_key()
+    res = _post(api_key, "streamGenerateContent", _payload(prompt, temperature, max_output_tokens), stream=True)
+    with res:
+        try:
+            for line in res.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                try:
+                    chunk = _extract_text(json.loads(line[len("data:") :]), strip=False)
+                except ValueError:
+                    continue
+                if chunk:
+                    yield chunk
+        except requests.RequestException as exc:
+            raise AIClientError(f"Gemini API stream failed: {exc.__class__.__name__}") from exc
@@ -0,0 +1,75 @@
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Bumped on ticket lifecycle events; entries from an older generation are
+# treated as stale (served once more while a single caller recomputes).
+GENERATION_KEY = "analytics:generation"
+
+
+def _fresh_seconds() -> int:
+    return int(getattr(settings, "ANALYTICS_CACHE_TTL", 30))
+
+
+def _stale_seconds() -> int:
+    return int(getattr(settings, "ANALYTICS_CACHE_STALE_TTL", 600))
+
+
+def _generation() -> int:
+    gen = cache.get(GENERATION_KEY)
+    if gen is None:
+        cache.add(GENERATION_KEY, 1, None)
+        gen = cache.get(GENERATION_KEY) or 1
+    return int(gen)
+
+
+def invalidate() -> None:
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, 1, None)
+    except Exception:
+        pass
+
+
+def cached(endpoint: str, params: dict, compute):
+    """Return ``compute()``'s result through the shared cache with stale-while-revalidate.
+
+    Fresh entries are returned as-is. Once an entry expires or its generation
+    is invalidated, one caller recomputes while concurrent callers keep getting
+    the stale copy. Cache outages fall through to ``compute()``.
+    """
+    if _fresh_seconds() <= 0:
+        return compute()
+
+    key = f"analytics:{endpoint}:{urlencode(sorted(params.items()))}"
+    lock_key = f"{key}:lock"
+    try:
+        entry = cache.get(key)
+        gen = _generation()
+    except Exception:
+        return compute()
+
+    now = time.time()
+    if entry is not None:
+        if entry["generation"] == gen and entry["fresh_until"] > now:
+            return entry["data"]
+        try:
+            if not cache.add(lock_key, 1, 30):
+                return entry["data"]
+        except Exception:
+            return entry["data"]
+
+    data = compute()
+    try:
+        cache.set(
+            key,
+            {"data": data, "generation": gen, "fresh_until": now + _fresh_seconds()},
+            _stale_seconds(),
+        )
+        cache.delete(lock_key)
+    except Exception:
+        pass
+    return data
@@ -1,16 +1,16 @@
 from urllib.parse import parse_qs
 
-from asgiref.sync import sync_to_async
 from channels.middleware import BaseMiddleware
 from django.contrib.auth.models import AnonymousUser
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
 
 
-@sync_to_async
 def _get_user_from_token(token: str):
-    jwt_auth = JWTAuthentication()
-    validated = jwt_auth.get_validated_token(token)
-    return jwt_auth.get_user(validated)
+    # Signature and expiry checks only, no database query: consumers resolve
+    # what they need about the user (active flag, role) together with their
+    # own authorization query.
+    return TokenUser(JWTAuthentication().get_validated_token(token))
 
 
 class JWTAuthMiddleware(BaseMiddleware):
@@ -21,7 +21,7 @@ class JWTAuthMiddleware(BaseMiddleware):
 
         if token:
             try:
-                scope["user"] = await _get_user_from_token(token)
+                scope["user"] = _get_user_from_token(token)
             except Exception:
                 scope["user"] = AnonymousUser()
         else:
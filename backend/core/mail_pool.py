@@ -0,0 +1,156 @@
+# Per-process pool of open email backend connections. Django's send_mail opens
+# (and for SMTP, TLS-negotiates) a new connection per call; Celery email bursts
+# spend most of their time in those handshakes. Connections here are reused,
+# health-checked with NOOP after sitting idle, and replaced when they fail.
+
+import logging
+import os
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+
+def _is_disconnect(exc) -> bool:
+    """True if ``exc`` means the connection is dead, as opposed to a rejected message."""
+    if isinstance(exc, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+class ConnectionPool:
+    def __init__(self, size: int, backend: str | None = None, max_idle: float = 60.0, check_after: float = 5.0, **kwargs):
+        self.size = max(1, size)
+        self.backend = backend
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self.kwargs = kwargs
+        self._idle = []  # (connection, last_used) pairs, most recently used last
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+
+    def _open(self):
+        conn = get_connection(self.backend, fail_silently=False, **self.kwargs)
+        conn.open()
+        return conn
+
+    @staticmethod
+    def _close(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_alive(self, conn) -> bool:
+        smtp = getattr(conn, "connection", None)
+        if smtp is None:
+            # Non-SMTP backends (console, locmem) have nothing to go stale.
+            return not hasattr(conn, "connection")
+        try:
+            return smtp.noop()[0] == 250
+        except OSError:
+            return False
+
+    def _acquire(self):
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    return self._open()
+                conn, last_used = entry
+                idle_for = time.monotonic() - last_used
+                if idle_for < self.check_after:
+                    return conn
+                if idle_for < self.max_idle and self._is_alive(conn):
+                    return conn
+                self._close(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, conn, broken: bool = False) -> None:
+        try:
+            if broken:
+                self._close(conn)
+            else:
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        except BaseException as exc:
+            self._release(conn, broken=_is_disconnect(exc))
+            raise
+        else:
+            self._release(conn)
+
+    def send_messages(self, messages) -> int:
+        """Send ``messages`` over one pooled connection, reconnecting once per message on disconnect."""
+        sent = 0
+        pending = list(messages)
+        retried = False
+        while pending:
+            try:
+                with self.connection() as conn:
+                    while pending:
+                        sent += conn.send_messages([pending[0]]) or 0
+                        pending.pop(0)
+                        retried = False
+            except OSError as exc:
+                if retried or not _is_disconnect(exc):
+                    raise
+                retried = True
+                logger.info("Email connection dropped; retrying on a fresh connection")
+        return sent
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+
+_pool = None
+_pool_pid = None
+
+
+def get_pool():
+    """The process-wide pool, or None when pooling is disabled (``EMAIL_POOL_SIZE=0``)."""
+    global _pool, _pool_pid
+    size = int(getattr(settings, "EMAIL_POOL_SIZE", 4))
+    if size <= 0:
+        return None
+    # Sockets must not be shared with a forked child (Celery prefork workers).
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = ConnectionPool(
+            size,
+            max_idle=float(getattr(settings, "EMAIL_POOL_MAX_IDLE", 60)),
+            check_after=float(getattr(settings, "EMAIL_POOL_CHECK_AFTER", 5)),
+        )
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def send_messages(messages) -> int:
+    pool = get_pool()
+    if pool is None:
+        with get_connection(fail_silently=False) as conn:
+            return conn.send_messages(list(messages)) or 0
+    return pool.send_messages(messages)
+
+
+def close_pool() -> None:
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.close_all()
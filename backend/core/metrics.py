@@ -0,0 +1,71 @@
+# Lightweight process-independent counters kept in the shared cache. Counts are
+# best-effort (cache eviction or an outage resets them) and meant for dashboards
+# and quick checks, not billing.
+
+import logging
+import time
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "metrics:"
+
+
+def incr(name: str, amount: int = 1) -> None:
+    if not amount:
+        return
+    key = f"{KEY_PREFIX}{name}"
+    try:
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            if not cache.add(key, amount, None):
+                cache.incr(key, amount)
+    except Exception:
+        logger.debug("Failed to record metric %s", name, exc_info=True)
+
+
+def read(names) -> dict:
+    names = list(names)
+    try:
+        values = cache.get_many([f"{KEY_PREFIX}{n}" for n in names])
+    except Exception:
+        values = {}
+    return {n: int(values.get(f"{KEY_PREFIX}{n}") or 0) for n in names}
+
+
+def set_gauge(name: str, value: int, ttl: int = 300) -> None:
+    try:
+        cache.set(f"{KEY_PREFIX}{name}", int(value), ttl)
+    except Exception:
+        logger.debug("Failed to record metric %s", name, exc_info=True)
+
+
+class LocalCounters:
+    """Process-local counters for hot paths (e.g. inside the event loop), pushed to the cache in batches."""
+
+    def __init__(self, flush_interval: float = 10.0):
+        self.flush_interval = flush_interval
+        self._counts = {}
+        self._peaks = {}
+        self._last_flush = time.monotonic()
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        self._counts[name] = self._counts.get(name, 0) + amount
+
+    def observe_max(self, name: str, value: int) -> None:
+        if value > self._peaks.get(name, 0):
+            self._peaks[name] = value
+
+    def due(self) -> bool:
+        return time.monotonic() - self._last_flush >= self.flush_interval
+
+    def flush(self) -> None:
+        counts, self._counts = self._counts, {}
+        peaks, self._peaks = self._peaks, {}
+        self._last_flush = time.monotonic()
+        for name, amount in counts.items():
+            incr(name, amount)
+        for name, value in peaks.items():
+            set_gauge(name, value)
@@ -0,0 +1,31 @@
+# Shared Redis clients for short, latency-sensitive calls (caches, replay logs).
+# Short timeouts: callers treat Redis as an accelerator and fall back on errors.
+
+import asyncio
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+
+_TIMEOUTS = {"socket_timeout": 0.5, "socket_connect_timeout": 0.5}
+
+_sync_client = None
+_async_clients = {}
+
+
+def get_client() -> redis.Redis:
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.Redis.from_url(settings.REDIS_URL, **_TIMEOUTS)
+    return _sync_client
+
+
+def get_async_client() -> aioredis.Redis:
+    # redis.asyncio connections belong to the event loop that created them.
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        _async_clients.clear()
+        client = aioredis.Redis.from_url(settings.REDIS_URL, **_TIMEOUTS)
+        _async_clients[loop] = client
+    return client
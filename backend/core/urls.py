@@ -7,4 +7,6 @@ urlpatterns = [
     path("analytics/summary/", views.analytics_summary, name="analytics_summary"),
     path("analytics/volume/", views.analytics_volume, name="analytics_volume"),
     path("analytics/resolution/", views.analytics_resolution, name="analytics_resolution"),
+    path("analytics/notifications/", views.analytics_notifications, name="analytics_notifications"),
+    path("analytics/realtime/", views.analytics_realtime, name="analytics_realtime"),
 ]
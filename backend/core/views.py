@@ -1,13 +1,15 @@
 from datetime import timedelta
 
-from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F
-from django.db.models.functions import TruncDate
+from django.conf import settings
+from django.utils import timezone
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
 from accounts.permissions import IsAdmin
+from core import analytics_cache, metrics
 from tickets.models import Ticket
+from tickets.rollup import daily_volume, resolution_totals, status_counts
 
 
 @api_view(["GET"])
@@ -19,17 +21,17 @@ def health(request):
 @api_view(["GET"])
 @permission_classes([IsAdmin])
 def analytics_summary(request):
-    qs = Ticket.objects.all()
-    by_status = dict(qs.values_list("status").annotate(c=Count("id")))
-    total = qs.count()
-    open_like = qs.exclude(status__in=[Ticket.Status.RESOLVED, Ticket.Status.CLOSED]).count()
-    return Response(
-        {
+    def compute():
+        by_status = status_counts()
+        total = sum(by_status.values())
+        open_like = sum(c for s, c in by_status.items() if s not in {Ticket.Status.RESOLVED, Ticket.Status.CLOSED})
+        return {
             "total": total,
             "open_like": open_like,
             "by_status": by_status,
         }
-    )
+
+    return Response(analytics_cache.cached("summary", {}, compute))
 
 
 @api_view(["GET"])
@@ -43,35 +45,65 @@ def analytics_volume(request):
     if days <= 0:
         return Response({"detail": "days must be > 0"}, status=400)
 
-    # use timezone-aware filtering via Django
-    from django.utils import timezone
-
-    start = timezone.now() - timedelta(days=days)
-    qs = (
-        Ticket.objects.filter(created_at__gte=start)
-        .annotate(day=TruncDate("created_at"))
-        .values("day")
-        .annotate(count=Count("id"))
-        .order_by("day")
-    )
+    def compute():
+        start = timezone.now() - timedelta(days=days)
+        series = [{"day": str(day), "count": count} for day, count in daily_volume(start)]
+        return {"days": days, "series": series}
 
-    series = [{"day": str(r["day"]), "count": r["count"]} for r in qs]
-    return Response({"days": days, "series": series})
+    return Response(analytics_cache.cached("volume", {"days": days}, compute))
 
 
 @api_view(["GET"])
 @permission_classes([IsAdmin])
 def analytics_resolution(request):
-    qs = Ticket.objects.filter(closed_at__isnull=False)
-    duration = ExpressionWrapper(F("closed_at") - F("created_at"), output_field=DurationField())
-    agg = qs.aggregate(avg_resolution=Avg(duration), resolved_count=Count("id"))
+    def compute():
+        resolved_count, total_seconds = resolution_totals()
+        avg_seconds = int(total_seconds / resolved_count) if resolved_count else None
+        return {
+            "resolved_count": resolved_count,
+            "avg_resolution_seconds": avg_seconds,
+        }
+
+    return Response(analytics_cache.cached("resolution", {}, compute))
+
+
+EMAIL_METRICS = ("email.events_sent_immediately", "email.events_buffered", "email.digest_events", "email.digest_emails")
+
 
-    avg = agg.get("avg_resolution")
-    avg_seconds = int(avg.total_seconds()) if avg else None
+@api_view(["GET"])
+@permission_classes([IsAdmin])
+def analytics_notifications(request):
+    counts = metrics.read(EMAIL_METRICS)
+    digest_events = counts["email.digest_events"]
+    digest_emails = counts["email.digest_emails"]
+    return Response(
+        {
+            "counters": counts,
+            "events_coalesced": max(0, digest_events - digest_emails),
+            "coalescing_ratio": round(digest_events / digest_emails, 2) if digest_emails else None,
+        }
+    )
 
+
+REALTIME_COUNTERS = (
+    "realtime.events",
+    "realtime.frames",
+    "ws.frames_sent",
+    "ws.frames_merged",
+    "ws.frames_dropped",
+    "ws.slow_client_disconnects",
+)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdmin])
+def analytics_realtime(request):
+    counts = metrics.read(REALTIME_COUNTERS + ("ws.send_buffer_depth_max",))
     return Response(
         {
-            "resolved_count": agg.get("resolved_count", 0),
-            "avg_resolution_seconds": avg_seconds,
+            "counters": {name: counts[name] for name in REALTIME_COUNTERS},
+            # Peak per-socket buffer depth reported by any process in the last few minutes.
+            "send_buffer_depth_max": counts["ws.send_buffer_depth_max"],
+            "send_buffer_size": int(getattr(settings, "WS_SEND_BUFFER", 100)),
         }
     )
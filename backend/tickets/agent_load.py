@@ -0,0 +1,35 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from accounts.models import UserProfile
+from tickets import agent_queue
+from tickets.models import ACTIVE_STATUSES
+
+
+def adjust_active_count(agent_id, delta: int) -> None:
+    if agent_id is None or not delta:
+        return
+    UserProfile.objects.filter(user_id=agent_id).update(active_count=Greatest(F("active_count") + delta, 0))
+    agent_queue.schedule_sync([agent_id])
+
+
+def record_transition(old_agent_id, old_status, new_agent_id, new_status) -> None:
+    """Move one unit of load between agents for a ticket status/assignment change.
+
+    Call inside the transaction that writes the ticket so the counter and the
+    ticket row commit together.
+    """
+    was_active = old_agent_id is not None and old_status in ACTIVE_STATUSES
+    is_active = new_agent_id is not None and new_status in ACTIVE_STATUSES
+
+    if was_active and is_active and old_agent_id == new_agent_id:
+        return
+    adjustments = []
+    if was_active:
+        adjustments.append((old_agent_id, -1))
+    if is_active:
+        adjustments.append((new_agent_id, 1))
+    # Ascending agent id: concurrent A->B and B->A reassignments lock the two
+    # profile rows in the same order instead of deadlocking.
+    for agent_id, delta in sorted(adjustments):
+        adjust_active_count(agent_id, delta)
@@ -0,0 +1,157 @@
+# Optional Redis-backed agent selection (TICKET_ASSIGNMENT_BACKEND=redis).
+# Available agents under capacity live in a sorted set scored by active load,
+# so the least-loaded agent is one O(log n) lookup. UserProfile.active_count
+# stays the source of truth; Redis mirrors it and callers fall back to the DB.
+
+import logging
+
+import redis
+from django.conf import settings
+from django.db import transaction
+
+from accounts.models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+LOAD_KEY = "tickets:agent_load"
+CAPACITY_KEY = "tickets:agent_capacity"
+READY_KEY = "tickets:agent_load:ready"
+
+# Take the least-loaded agent, count the reservation against it, and drop it
+# from the set once it reaches capacity. Runs atomically inside Redis.
+_RESERVE_SCRIPT = """
+local top = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if #top == 0 then
+  return false
+end
+local agent = top[1]
+local load = tonumber(top[2]) + 1
+local cap = tonumber(redis.call('HGET', KEYS[2], agent) or '0')
+if load >= cap then
+  redis.call('ZREM', KEYS[1], agent)
+else
+  redis.call('ZADD', KEYS[1], load, agent)
+end
+return agent
+"""
+
+# Hand back a reservation that was not used. An agent the reservation pushed
+# out of the set (at capacity) is left to the DB sync instead.
+_RELEASE_SCRIPT = """
+local load = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not load then
+  return 0
+end
+if tonumber(load) > 0 then
+  redis.call('ZINCRBY', KEYS[1], -1, ARGV[1])
+end
+return 1
+"""
+
+_client = None
+_reserve_script = None
+_release_script = None
+
+
+def enabled() -> bool:
+    return getattr(settings, "TICKET_ASSIGNMENT_BACKEND", "db") == "redis"
+
+
+def _get_client():
+    global _client, _reserve_script, _release_script
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=0.5,
+            socket_connect_timeout=0.5,
+        )
+        _reserve_script = _client.register_script(_RESERVE_SCRIPT)
+        _release_script = _client.register_script(_RELEASE_SCRIPT)
+    return _client
+
+
+def _is_eligible(role, is_available, capacity, active_count) -> bool:
+    return role == UserProfile.Role.AGENT and bool(is_available) and active_count < capacity
+
+
+def rebuild() -> int:
+    """Reload the whole sorted set from the database. Returns the number of queued agents."""
+    client = _get_client()
+    rows = UserProfile.objects.filter(role=UserProfile.Role.AGENT).values_list(
+        "user_id", "role", "is_available", "capacity", "active_count"
+    )
+
+    queued = 0
+    pipe = client.pipeline(transaction=True)
+    pipe.delete(LOAD_KEY, CAPACITY_KEY)
+    for user_id, role, is_available, capacity, active_count in rows:
+        pipe.hset(CAPACITY_KEY, user_id, capacity)
+        if _is_eligible(role, is_available, capacity, active_count):
+            pipe.zadd(LOAD_KEY, {user_id: active_count})
+            queued += 1
+    pipe.set(READY_KEY, 1)
+    pipe.execute()
+    return queued
+
+
+def sync_agents(agent_ids) -> None:
+    """Mirror the committed DB state of the given agents into Redis."""
+    agent_ids = [int(a) for a in agent_ids if a is not None]
+    if not enabled() or not agent_ids:
+        return
+
+    rows = UserProfile.objects.filter(user_id__in=agent_ids).values_list(
+        "user_id", "role", "is_available", "capacity", "active_count"
+    )
+    try:
+        client = _get_client()
+        pipe = client.pipeline(transaction=True)
+        for user_id, role, is_available, capacity, active_count in rows:
+            pipe.hset(CAPACITY_KEY, user_id, capacity)
+            if _is_eligible(role, is_available, capacity, active_count):
+                pipe.zadd(LOAD_KEY, {user_id: active_count})
+            else:
+                pipe.zrem(LOAD_KEY, user_id)
+        pipe.execute()
+    except redis.RedisError:
+        # The set is rebuilt lazily; a stale entry only costs a DB fallback.
+        logger.warning("Failed to sync agent load to Redis", exc_info=True)
+        try:
+            _get_client().delete(READY_KEY)
+        except redis.RedisError:
+            pass
+
+
+def schedule_sync(agent_ids) -> None:
+    """Sync the given agents once the current transaction commits."""
+    if not enabled():
+        return
+    agent_ids = list(agent_ids)
+    transaction.on_commit(lambda: sync_agents(agent_ids))
+
+
+def reserve_agent():
+    """Atomically pick and reserve the least-loaded agent.
+
+    Returns the agent's user id, or None when no agent has spare capacity.
+    Raises ``redis.RedisError`` if Redis is unreachable.
+    """
+    client = _get_client()
+    if not client.exists(READY_KEY):
+        rebuild()
+    agent_id = _reserve_script(keys=[LOAD_KEY, CAPACITY_KEY], client=client)
+    if agent_id is None:
+        return None
+    return int(agent_id)
+
+
+def release_agent(agent_id) -> None:
+    """Undo a ``reserve_agent`` whose assignment was rejected or rolled back."""
+    try:
+        client = _get_client()
+        if _release_script(keys=[LOAD_KEY], args=[int(agent_id)], client=client):
+            return
+    except redis.RedisError:
+        logger.warning("Failed to release agent reservation in Redis", exc_info=True)
+    # Dropped from the set (or Redis failed): mirror the committed DB state instead.
+    sync_agents([agent_id])
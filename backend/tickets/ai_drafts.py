@@ -0,0 +1,265 @@
+# AI draft jobs. The ai-draft endpoint only records a job and enqueues
+# tickets.tasks.generate_ai_draft, so no request thread waits on Gemini. The
+# worker pushes progress and the result to the requesting user's sockets as
+# ``ticket.ai_draft`` events; job state stays in the shared cache for
+# AI_DRAFT_JOB_TTL seconds for clients that poll instead.
+#
+# Finished drafts are cached under a hash of the redacted prompt, so asking
+# again on an unchanged ticket costs no API call. Any change to the subject,
+# description or public conversation changes the hash; a new public message
+# also drops the ticket's cached draft right away.
+
+import hashlib
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core import ai_client
+from tickets import realtime
+from tickets.models import Ticket, TicketMessage
+from tickets.redaction import redact_many
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+FINISHED = {DONE, FAILED}
+
+
+def build_prompt(ticket) -> tuple[str, str]:
+    """The redacted prompt for ``ticket`` and its content hash (the draft cache key)."""
+    msgs = list(
+        TicketMessage.objects.filter(ticket=ticket, is_internal=False)
+        .select_related("author")
+        .order_by("-created_at")[:10]
+    )
+    msgs.reverse()
+    subject, description, *bodies = redact_many([ticket.subject, ticket.description, *(m.body for m in msgs)])
+    history_lines = []
+    for m, body in zip(msgs, bodies):
+        author = getattr(m.author, "username", None) or "unknown"
+        history_lines.append(f"{author}: {body}")
+
+    prompt = "\n".join(
+        [
+            "You are a helpful customer support agent.",
+            "Write a short, friendly, and actionable reply.",
+            "Do not include private data. If you need more info, ask concise questions.",
+            "",
+            f"Ticket subject: {subject}",
+            f"Ticket description: {description}",
+            "",
+            "Conversation:",
+            *history_lines,
+            "",
+            "Draft reply:",
+        ]
+    )
+    # Message ids too: identical bodies at different points in the thread are different states.
+    material = f"{ticket.id}\0{','.join(str(m.id) for m in msgs)}\0{prompt}"
+    return prompt, hashlib.sha256(material.encode()).hexdigest()
+
+
+def _draft_key(digest: str) -> str:
+    return f"tickets:ai_draft:{digest}"
+
+
+def _ticket_draft_key(ticket_id: int) -> str:
+    return f"tickets:ai_draft:ticket:{int(ticket_id)}"
+
+
+def _lock_key(digest: str) -> str:
+    return f"tickets:ai_draft:lock:{digest}"
+
+
+def _cache_ttl() -> int:
+    return int(getattr(settings, "AI_DRAFT_CACHE_TTL", 86400))
+
+
+def cached_draft(digest: str) -> str | None:
+    if _cache_ttl() <= 0:
+        return None
+    try:
+        return cache.get(_draft_key(digest))
+    except Exception:
+        # A cache outage only costs a regeneration.
+        logger.warning("AI draft cache unavailable", exc_info=True)
+        return None
+
+
+def store_draft(ticket_id: int, digest: str, draft: str) -> None:
+    ttl = _cache_ttl()
+    if ttl <= 0 or not draft:
+        return
+    try:
+        cache.set_many({_draft_key(digest): draft, _ticket_draft_key(ticket_id): digest}, ttl)
+    except Exception:
+        logger.warning("Failed to cache AI draft for ticket %s", ticket_id, exc_info=True)
+
+
+def invalidate(ticket_id: int) -> None:
+    """Drop the ticket's cached draft (a new public message makes it stale)."""
+    # Runs as an on_commit hook after the message is saved, so it must not raise.
+    # A missed invalidation is harmless: the new message changes the prompt hash.
+    key = _ticket_draft_key(ticket_id)
+    try:
+        digest = cache.get(key)
+        keys = [key] + ([_draft_key(digest)] if digest else [])
+        cache.delete_many(keys)
+    except Exception:
+        logger.warning("Failed to invalidate cached AI draft for ticket %s", ticket_id, exc_info=True)
+
+
+def _key(job_id: str) -> str:
+    return f"tickets:ai_draft_job:{job_id}"
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "AI_DRAFT_JOB_TTL", 900))
+
+
+def _save(job: dict) -> dict:
+    cache.set(_key(job["job_id"]), job, _ttl())
+    return job
+
+
+def create_job(ticket_id: int, user_id: int, force: bool = False) -> dict:
+    return _save(
+        {
+            "job_id": uuid.uuid4().hex,
+            "ticket_id": int(ticket_id),
+            "requested_by": int(user_id),
+            "status": PENDING,
+            "draft": "",
+            "error": None,
+            "cached": False,
+            "force": bool(force),
+        }
+    )
+
+
+def finished_job(ticket_id: int, user_id: int, draft: str) -> dict:
+    """A job answered from the draft cache, without running anything."""
+    job = create_job(ticket_id, user_id)
+    job.update(status=DONE, draft=draft, cached=True)
+    return _save(job)
+
+
+def get_job(job_id: str) -> dict | None:
+    return cache.get(_key(job_id))
+
+
+def _event(job: dict, **extra) -> dict:
+    return {
+        "type": "ticket.ai_draft",
+        "ticket_id": job["ticket_id"],
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "draft": job["draft"],
+        "error": job["error"],
+        **extra,
+    }
+
+
+def _publish(job: dict, **extra) -> None:
+    # Best effort: clients that miss an event still get the result by polling.
+    try:
+        realtime.send_user_event(job["requested_by"], _event(job, **extra))
+    except Exception:
+        logger.warning("Failed to push AI draft event for job %s", job["job_id"], exc_info=True)
+
+
+def _stream_interval() -> float:
+    return float(getattr(settings, "AI_DRAFT_STREAM_INTERVAL", 0.25))
+
+
+def _generate(job: dict, prompt: str) -> str:
+    if not getattr(settings, "AI_DRAFT_STREAM", False):
+        return ai_client.generate(prompt)
+
+    # Progress events carry the whole draft so far, so a client that also polls
+    # (or drops an event) never duplicates text.
+    parts = []
+    pending = ""
+    last_flush = time.monotonic()
+    for chunk in ai_client.stream_generate(prompt):
+        parts.append(chunk)
+        pending += chunk
+        if time.monotonic() - last_flush >= _stream_interval():
+            job["draft"] = "".join(parts)
+            _save(job)
+            _publish(job, delta=pending)
+            pending = ""
+            last_flush = time.monotonic()
+    return "".join(parts).strip()
+
+
+def run_job(job: dict) -> dict:
+    """Generate the draft for ``job`` and publish the outcome."""
+    ticket = Ticket.objects.filter(pk=job["ticket_id"]).first()
+    if ticket is None:
+        job.update(status=FAILED, error="Ticket not found")
+        _publish(_save(job))
+        return job
+
+    prompt, digest = build_prompt(ticket)
+    # A speculative job may have filled the cache since the endpoint checked.
+    draft = None if job.get("force") else cached_draft(digest)
+    if draft is not None:
+        job.update(status=DONE, draft=draft, error=None, cached=True)
+        _publish(_save(job))
+        return job
+
+    job["status"] = RUNNING
+    _save(job)
+    _publish(job)
+    try:
+        draft = _generate(job, prompt)
+    except ai_client.AIClientError as exc:
+        job.update(status=FAILED, error=str(exc))
+    except Exception:
+        logger.exception("AI draft job %s failed", job["job_id"])
+        job.update(status=FAILED, error="Failed to generate draft")
+    else:
+        job.update(status=DONE, draft=draft, error=None)
+        store_draft(ticket.id, digest, draft)
+    _publish(_save(job))
+    return job
+
+
+def pregenerate(ticket_id: int) -> bool:
+    """Fill the draft cache for a ticket ahead of the agent asking. Returns True if a draft was generated."""
+    ticket = Ticket.objects.filter(pk=ticket_id, assigned_agent__isnull=False).first()
+    if ticket is None or not ai_client.is_configured():
+        return False
+    prompt, digest = build_prompt(ticket)
+    if cached_draft(digest) is not None:
+        return False
+    # Several customer messages in a row schedule several of these; one generation per state is enough.
+    if not cache.add(_lock_key(digest), 1, int(getattr(settings, "AI_REQUEST_TIMEOUT", 20)) * 3):
+        return False
+    try:
+        store_draft(ticket.id, digest, ai_client.generate(prompt))
+    except ai_client.AIClientError as exc:
+        logger.info("Speculative AI draft for ticket %s failed: %s", ticket.id, exc)
+        return False
+    finally:
+        cache.delete(_lock_key(digest))
+    return True
+
+
+def schedule_pregenerate(ticket_id: int) -> None:
+    """After commit, pre-generate the ticket's draft once the customer has paused (AI_DRAFT_SPECULATIVE_DELAY)."""
+    if not getattr(settings, "AI_DRAFT_SPECULATIVE", False) or not ai_client.is_configured():
+        return
+    from tickets.tasks import pregenerate_ai_draft
+
+    delay = float(getattr(settings, "AI_DRAFT_SPECULATIVE_DELAY", 30))
+    transaction.on_commit(lambda: pregenerate_ai_draft.apply_async((ticket_id,), countdown=delay))
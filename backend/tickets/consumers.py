@@ -1,16 +1,140 @@
+import asyncio
 import json
+import logging
+from collections import deque
+from urllib.parse import parse_qs
 
+import redis
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
-from django.db.models import Q
 
-from accounts.models import UserProfile
-from accounts.utils import get_user_role
-from tickets.models import Ticket
+from core.metrics import LocalCounters
+from tickets import event_log, ws_access
+from tickets.realtime import agent_queue_group, ticket_group, user_group
 
+# Close code for clients that fall too far behind; they should reconnect and refetch.
+SLOW_CLIENT_CLOSE_CODE = 4408
 
-class TicketConsumer(AsyncWebsocketConsumer):
+logger = logging.getLogger(__name__)
+
+_counters = LocalCounters()
+
+
+def _max_subscriptions() -> int:
+    return int(getattr(settings, "WS_MAX_SUBSCRIPTIONS", 200))
+
+
+def _send_buffer_size() -> int:
+    return max(1, int(getattr(settings, "WS_SEND_BUFFER", 100)))
+
+
+def _frame_events(payload: dict) -> list:
+    if payload.get("type") == "batch":
+        return payload.get("events") or []
+    return [payload]
+
+
+class BufferedSendMixin:
+    """Bounded per-socket send buffer drained by a writer task.
+
+    Channel-layer handlers only enqueue, so a slow client never stalls the
+    consumer's receive loop. A frame with a ``merge_key`` replaces the queued
+    frame with the same key (newer ticket state supersedes older). When the
+    buffer is full the oldest replaceable frame is dropped; if there is none the
+    client is disconnected so it resyncs instead of silently missing messages.
+    """
+
+    def _start_writer(self):
+        self._replayed = {}
+        self._frames = deque()
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def _stop_writer(self):
+        writer = getattr(self, "_writer", None)
+        if writer is not None:
+            writer.cancel()
+
+    async def _enqueue(self, text: str, merge_key: str | None = None):
+        if self._closing:
+            return
+        frames = self._frames
+        if merge_key is not None:
+            for entry in frames:
+                if entry[0] == merge_key:
+                    frames.remove(entry)
+                    _counters.incr("ws.frames_merged")
+                    break
+
+        if len(frames) >= _send_buffer_size():
+            stale = next((entry for entry in frames if entry[0] is not None), None)
+            if stale is None:
+                _counters.incr("ws.slow_client_disconnects")
+                self._closing = True
+                frames.clear()
+                self._stop_writer()
+                await self.close(code=SLOW_CLIENT_CLOSE_CODE)
+                return
+            frames.remove(stale)
+            _counters.incr("ws.frames_dropped")
+
+        frames.append((merge_key, text))
+        _counters.observe_max("ws.send_buffer_depth_max", len(frames))
+        self._wakeup.set()
+
+    async def _write_loop(self):
+        while True:
+            while not self._frames:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            _, text = self._frames.popleft()
+            await self.send(text_data=text)
+            _counters.incr("ws.frames_sent")
+            if _counters.due():
+                await sync_to_async(_counters.flush)()
+
+    async def _send_json(self, data):
+        await self._enqueue(json.dumps(data))
+
+    async def _enqueue_event(self, event):
+        max_seq = event.get("max_seq")
+        ticket_id = event.get("payload", {}).get("ticket_id")
+        if max_seq is not None and max_seq <= self._replayed.get(ticket_id, 0):
+            return
+        text = event.get("text")
+        if text is None:
+            text = json.dumps(event.get("payload", {}))
+        await self._enqueue(text, event.get("merge_key"))
+
+
+    async def _replay(self, ticket_id: int, since: int):
+        """Send what the client missed after ``since``, or tell it to resync."""
+        try:
+            events, last_seq = await event_log.since(ticket_id, since)
+        except redis.RedisError:
+            logger.warning("Replay failed for ticket %s", ticket_id, exc_info=True)
+            events, last_seq = None, None
+
+        if events is None:
+            await self._send_json({"type": "resync", "ticket_id": ticket_id, "seq": last_seq})
+            return
+        self._replayed[ticket_id] = last_seq
+        if events:
+            await self._send_json({"type": "batch", "ticket_id": ticket_id, "events": events, "replay": True})
+
+
+def _parse_since(value):
+    try:
+        since = int(value)
+    except (TypeError, ValueError):
+        return None
+    return since if since >= 0 else None
+
+
+class TicketConsumer(BufferedSendMixin, AsyncWebsocketConsumer):
     async def connect(self):
         user = self.scope.get("user")
         if not user or isinstance(user, AnonymousUser) or not user.is_authenticated:
@@ -28,42 +152,174 @@ class TicketConsumer(AsyncWebsocketConsumer):
             await self.close(code=4400)
             return
 
-        role = await self._get_role(user)
-
-        allowed = False
-        if role == UserProfile.Role.ADMIN:
-            allowed = True
-        elif role == UserProfile.Role.AGENT:
-            allowed = await self._ticket_exists(Q(id=ticket_id, assigned_agent_id=user.id))
-        else:
-            allowed = await self._ticket_exists(Q(id=ticket_id, customer_id=user.id))
-
-        if not allowed:
+        allowed = await ws_access.allowed_ticket_ids(user.id, [ticket_id])
+        if ticket_id not in allowed:
             await self.close(code=4403)
             return
 
         self.ticket_id = ticket_id
-        self.group_name = f"ticket_{ticket_id}"
+        self.group_name = ticket_group(ticket_id)
+        self.user_group = user_group(user.id)
 
         await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.channel_layer.group_add(self.user_group, self.channel_name)
         await self.accept()
+        self._start_writer()
+
+        # ?since=<seq>: replay events missed while disconnected.
+        query = parse_qs(self.scope.get("query_string", b"").decode("utf-8"))
+        since = _parse_since((query.get("since") or [None])[0])
+        if since is not None:
+            await self._replay(ticket_id, since)
 
     async def disconnect(self, close_code):
-        group = getattr(self, "group_name", None)
-        if group:
-            await self.channel_layer.group_discard(group, self.channel_name)
+        self._stop_writer()
+        for group in (getattr(self, "group_name", None), getattr(self, "user_group", None)):
+            if group:
+                await self.channel_layer.group_discard(group, self.channel_name)
 
     async def receive(self, text_data=None, bytes_data=None):
         # read-only socket for now
         return
 
     async def ticket_event(self, event):
-        await self.send(text_data=json.dumps(event.get("payload", {})))
+        await self._enqueue_event(event)
+
+    async def user_event(self, event):
+        # The user's other tickets have their own sockets.
+        if event.get("payload", {}).get("ticket_id") == self.ticket_id:
+            await self._enqueue(event["text"])
+
+
+class TicketStreamConsumer(BufferedSendMixin, AsyncWebsocketConsumer):
+    """One socket per user carrying events for any number of tickets.
+
+    Client messages (JSON):
+      {"action": "subscribe", "tickets": [1, 2, 3], "since": {"1": 40}}   since: optional replay, per ticket
+      {"action": "unsubscribe", "tickets": [2]}
+      {"action": "subscribe_queue"}    agents/admins: follow every ticket assigned to them
+      {"action": "unsubscribe_queue"}
+    Ticket events are forwarded unchanged (they carry ``ticket_id``), as are the
+    user's own events (``ticket.ai_draft``) whether or not the ticket is subscribed.
+    """
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if not user or isinstance(user, AnonymousUser) or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        # The token is checked without the database; a deactivated user's
+        # unexpired token must not get a socket.
+        if not await ws_access.user_is_active(user.id):
+            await self.close(code=4403)
+            return
+
+        self.user_id = int(user.id)
+        self.tickets = set()
+        self.queue_group = None
+        self.user_group = user_group(self.user_id)
+        await self.channel_layer.group_add(self.user_group, self.channel_name)
+        await self.accept()
+        self._start_writer()
+
+    async def disconnect(self, close_code):
+        self._stop_writer()
+        for ticket_id in getattr(self, "tickets", ()):
+            await self.channel_layer.group_discard(ticket_group(ticket_id), self.channel_name)
+        for group in (getattr(self, "queue_group", None), getattr(self, "user_group", None)):
+            if group:
+                await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            data = json.loads(text_data or "")
+            action = data.get("action")
+            ticket_ids = [int(t) for t in data.get("tickets") or []]
+        except (TypeError, ValueError, AttributeError):
+            await self._send_json({"type": "error", "detail": "invalid message"})
+            return
+
+        if action == "subscribe":
+            since = data.get("since") if isinstance(data.get("since"), dict) else {}
+            await self._subscribe(ticket_ids, since=since)
+        elif action == "unsubscribe":
+            await self._unsubscribe(ticket_ids)
+            await self._send_json({"type": "unsubscribed", "tickets": sorted(set(ticket_ids))})
+        elif action == "subscribe_queue":
+            await self._subscribe_queue()
+        elif action == "unsubscribe_queue":
+            await self._unsubscribe_queue()
+        else:
+            await self._send_json({"type": "error", "detail": "unknown action"})
+
+    async def _subscribe(self, ticket_ids, authorized=False, since=None):
+        requested = [t for t in dict.fromkeys(ticket_ids) if t not in self.tickets]
+        room = max(0, _max_subscriptions() - len(self.tickets))
+        over_limit = requested[room:]
+        requested = requested[:room]
+
+        allowed = set(requested) if authorized else await ws_access.allowed_ticket_ids(self.user_id, requested)
+        for ticket_id in requested:
+            if ticket_id in allowed:
+                await self.channel_layer.group_add(ticket_group(ticket_id), self.channel_name)
+                self.tickets.add(ticket_id)
+
+        await self._send_json(
+            {
+                "type": "subscribed",
+                "tickets": sorted(allowed),
+                "denied": sorted(set(requested) - allowed),
+                "over_limit": over_limit,
+            }
+        )
+
+        for key, value in (since or {}).items():
+            ticket_id, seq = _parse_since(key), _parse_since(value)
+            if ticket_id in allowed and seq is not None:
+                await self._replay(ticket_id, seq)
+
+    async def _unsubscribe(self, ticket_ids):
+        for ticket_id in set(ticket_ids) & self.tickets:
+            await self.channel_layer.group_discard(ticket_group(ticket_id), self.channel_name)
+            self.tickets.discard(ticket_id)
+
+    async def _subscribe_queue(self):
+        ticket_ids = await ws_access.queue_ticket_ids(self.user_id)
+        if ticket_ids is None:
+            await self._send_json({"type": "error", "detail": "only agents and admins have a queue"})
+            return
+        if self.queue_group is None:
+            self.queue_group = agent_queue_group(self.user_id)
+            await self.channel_layer.group_add(self.queue_group, self.channel_name)
+        # The queue query already checked assignment, so skip the per-ticket lookup.
+        await self._subscribe(ticket_ids, authorized=True)
+
+    async def _unsubscribe_queue(self):
+        if self.queue_group is not None:
+            await self.channel_layer.group_discard(self.queue_group, self.channel_name)
+            self.queue_group = None
+        await self._send_json({"type": "queue_unsubscribed"})
+
+    async def ticket_event(self, event):
+        payload = event.get("payload", {})
+        ticket_id = payload.get("ticket_id")
+        reassigned = any(e.get("type") == "ticket.assigned" for e in _frame_events(payload))
+        if reassigned and ticket_id in self.tickets:
+            # Reassignment may revoke access; the cached decision was invalidated on commit.
+            if ticket_id not in await ws_access.allowed_ticket_ids(self.user_id, [ticket_id]):
+                await self._unsubscribe([ticket_id])
+                await self._send_json({"type": "unsubscribed", "tickets": [ticket_id], "reason": "forbidden"})
+                return
+        await self._enqueue_event(event)
 
-    @database_sync_to_async
-    def _get_role(self, user):
-        return get_user_role(user)
+    async def queue_event(self, event):
+        payload = event.get("payload", {})
+        ticket_id = payload.get("ticket_id")
+        # Tickets leaving the queue are handled by ticket_event, which re-checks access.
+        if payload.get("assigned_agent") == self.user_id and ticket_id not in self.tickets:
+            await self._subscribe([ticket_id], authorized=True)
+            # We were not in the ticket's group when this event was sent, so forward it here.
+            await self._enqueue_event(event)
 
-    @database_sync_to_async
-    def _ticket_exists(self, q):
-        return Ticket.objects.filter(q).exists()
+    async def user_event(self, event):
+        await self._enqueue(event["text"])
@@ -0,0 +1,99 @@
+# Per-ticket replay log for WebSocket subscribers. The relay stamps every
+# broadcast payload with a per-ticket sequence number and appends it to a
+# capped Redis stream whose entry ids are "<seq>-0", so a reconnecting client
+# can ask for everything after the last seq it saw. If that range has been
+# trimmed away the client is told to resync (refetch) instead. A payload that
+# already carries a seq (an outbox retry) is in the log already and keeps it.
+
+import json
+import logging
+
+import redis
+from django.conf import settings
+
+from core.redis_clients import get_async_client, get_client
+
+logger = logging.getLogger(__name__)
+
+
+def _stream_key(ticket_id) -> str:
+    return f"tickets:events:{int(ticket_id)}"
+
+
+def _seq_key(ticket_id) -> str:
+    return f"tickets:events:{int(ticket_id)}:seq"
+
+
+def _max_len() -> int:
+    return int(getattr(settings, "REALTIME_REPLAY_MAXLEN", 200))
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "REALTIME_REPLAY_TTL", 86400))
+
+
+def append(batches: dict) -> None:
+    """Stamp ``seq`` onto every payload in ``{ticket_id: [payload, ...]}`` and log it.
+
+    Payloads are modified in place; ones already stamped are skipped. On Redis
+    errors they are left unstamped and subscribers simply cannot replay them.
+    """
+    batches = {t: [p for p in payloads if "seq" not in p] for t, payloads in batches.items()}
+    batches = {t: p for t, p in batches.items() if p}
+    if not batches or _max_len() <= 0:
+        return
+    try:
+        client = get_client()
+        pipe = client.pipeline(transaction=False)
+        for ticket_id, payloads in batches.items():
+            pipe.incrby(_seq_key(ticket_id), len(payloads))
+        last_seqs = pipe.execute()
+
+        pipe = client.pipeline(transaction=False)
+        for (ticket_id, payloads), last in zip(batches.items(), last_seqs):
+            key = _stream_key(ticket_id)
+            for offset, payload in enumerate(payloads):
+                seq = last - len(payloads) + 1 + offset
+                pipe.xadd(key, {"e": json.dumps(payload)}, id=f"{seq}-0", maxlen=_max_len(), approximate=True)
+                payload["seq"] = seq
+            pipe.expire(key, _ttl())
+            pipe.expire(_seq_key(ticket_id), _ttl())
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning("Failed to append ticket events to the replay log", exc_info=True)
+        for payloads in batches.values():
+            for payload in payloads:
+                payload.pop("seq", None)
+
+
+async def since(ticket_id: int, seq: int):
+    """Events after ``seq`` for a reconnecting subscriber.
+
+    Returns ``(events, last_seq)``, or ``(None, last_seq)`` when some of the
+    missed events were already trimmed and the client must resync.
+    """
+    client = get_async_client()
+    pipe = client.pipeline(transaction=False)
+    pipe.get(_seq_key(ticket_id))
+    pipe.xrange(_stream_key(ticket_id), min=f"{seq + 1}-0", max="+")
+    raw_last, entries = await pipe.execute()
+
+    last_seq = int(raw_last or 0)
+    if seq > last_seq:
+        # The client is ahead of the counter: the log expired and restarted.
+        return None, last_seq
+    if seq == last_seq:
+        return [], last_seq
+    if not entries or _entry_seq(entries[0][0]) != seq + 1:
+        return None, last_seq
+
+    events = []
+    for entry_id, fields in entries:
+        event = json.loads(fields[b"e"])
+        event["seq"] = _entry_seq(entry_id)
+        events.append(event)
+    return events, last_seq
+
+
+def _entry_seq(entry_id) -> int:
+    return int(entry_id.split(b"-")[0])
@@ -0,0 +1,219 @@
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import requests
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from core import ai_client
+
+STUB_MODELS = ["gemini-1.5-flash", "gemini-1.5-pro"]
+
+
+class _StubGeminiHandler(BaseHTTPRequestHandler):
+    """Just enough of the Gemini REST API for drafts (models, generateContent, streamGenerateContent).
+
+    Sleeps on connect to stand in for TCP + TLS setup. Records every call and
+    answers with ``server.statuses[model]`` when set, for tests.
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.count_connection()
+
+    def log_message(self, format, *args):
+        return
+
+    def do_GET(self):
+        if urlsplit(self.path).path.rstrip("/").endswith("/models"):
+            self.server.record("GET", "models")
+            time.sleep(self.server.latency_seconds)
+            models = [
+                {"name": f"models/{m}", "supportedGenerationMethods": ["generateContent"]}
+                for m in self.server.models
+            ]
+            self._reply(200, {"models": models})
+        else:
+            self._reply(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        path = urlsplit(self.path).path
+        model = path.rsplit("/", 1)[-1].split(":", 1)[0]
+        method = path.rsplit(":", 1)[-1]
+        self.server.record("POST", model)
+        if model in self.server.statuses:
+            self._reply(self.server.statuses[model], {"error": {"message": f"model {model} rejected"}})
+            return
+        if method not in ("generateContent", "streamGenerateContent") or model not in self.server.models:
+            self._reply(404, {"error": {"message": f"model {model} not found"}})
+            return
+        time.sleep(self.server.latency_seconds)
+        prompt = ((body.get("contents") or [{}])[0].get("parts") or [{}])[0].get("text", "")
+        text = f"[{model}] Thanks for reaching out, we are looking into it. ({len(prompt)} chars of context)"
+        if method == "generateContent":
+            self._reply(200, {"candidates": [{"content": {"parts": [{"text": text}]}}]})
+            return
+
+        # Server-sent events, one word per event, over chunked transfer encoding.
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for word in text.split(" "):
+            event = {"candidates": [{"content": {"parts": [{"text": word + " "}]}}]}
+            self._write_chunk(f"data: {json.dumps(event)}\r\n\r\n".encode())
+            time.sleep(self.server.latency_seconds / 10)
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    def _reply(self, code, data):
+        payload = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class StubGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=0, handshake_seconds=0.0, latency_seconds=0.0, models=None):
+        super().__init__(("127.0.0.1", port), _StubGeminiHandler)
+        self.handshake_seconds = handshake_seconds
+        self.latency_seconds = latency_seconds
+        self.models = list(models or STUB_MODELS)
+        self.statuses = {}
+        self.calls = []
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1beta"
+
+    def record(self, verb: str, target: str):
+        with self._lock:
+            self.calls.append((verb, target))
+
+    def count_connection(self):
+        with self._lock:
+            self.connections += 1
+        time.sleep(self.handshake_seconds)
+
+
+def _uncached_generate(base, api_key, prompt):
+    """The previous draft path: list models, then generate, each on a fresh connection."""
+    res = requests.get(f"{base}/models", params={"key": api_key}, timeout=20)
+    models = [m["name"][len("models/") :] for m in res.json().get("models", [])]
+    candidates = [m for m in ai_client.PREFERRED_MODELS if m in models] or models
+    for model in candidates:
+        res = requests.post(
+            f"{base}/models/{model}:generateContent",
+            params={"key": api_key},
+            json={"contents": [{"role": "user", "parts": [{"text": prompt}]}]},
+            timeout=20,
+        )
+        if res.ok:
+            return res.json()
+    raise RuntimeError(f"HTTP {res.status_code}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare AI draft latency for the previous path (model discovery + generate on fresh connections "
+        "every call) against core.ai_client (keep-alive session, cached models), using a local Gemini stub. "
+        "With --serve, just run the stub so GEMINI_API_BASE can point at it during development."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--drafts", type=int, default=100)
+        parser.add_argument("--threads", type=int, default=4, help="Concurrent callers (like request threads).")
+        parser.add_argument(
+            "--handshake-ms",
+            type=float,
+            default=50.0,
+            help="Delay per new connection, standing in for TCP + TLS setup to the real API.",
+        )
+        parser.add_argument("--latency-ms", type=float, default=20.0, help="Server time per API call.")
+        parser.add_argument("--serve", action="store_true", help="Run the stub in the foreground and exit on Ctrl+C.")
+        parser.add_argument("--port", type=int, default=0)
+
+    def handle(self, *args, **options):
+        server = StubGeminiServer(
+            port=options["port"],
+            handshake_seconds=options["handshake_ms"] / 1000,
+            latency_seconds=options["latency_ms"] / 1000,
+        )
+        if options["serve"]:
+            self.stdout.write(f"Gemini stub listening; set GEMINI_API_BASE={server.base_url} and any GEMINI_API_KEY")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                server.server_close()
+            return
+
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base, api_key = server.base_url, "bench"
+        prompt = "Ticket subject: Cannot log in\nConversation:\ncustomer: I get an error\n\nDraft reply:"
+        try:
+            with override_settings(GEMINI_API_BASE=base, GEMINI_API_KEY=api_key):
+                ai_client.close_session()
+                ai_client.reset_model_cache()
+                runs = (
+                    ("uncached", lambda: _uncached_generate(base, api_key, prompt)),
+                    ("ai_client", lambda: ai_client.generate(prompt)),
+                )
+                for name, call in runs:
+                    before = server.connections
+                    latencies, elapsed = self._run(call, options["drafts"], options["threads"])
+                    ms = sorted(x * 1000 for x in latencies)
+                    self.stdout.write(
+                        f"{name:>10}: {len(ms)} drafts in {elapsed:.2f}s  p50 {statistics.median(ms):.1f} ms  "
+                        f"p95 {ms[int(len(ms) * 0.95)]:.1f} ms  connections {server.connections - before}"
+                    )
+                ai_client.close_session()
+                ai_client.reset_model_cache()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def _run(self, call, total, threads):
+        counter = iter(range(max(1, total)))
+        lock = threading.Lock()
+        latencies = []
+
+        def worker():
+            while True:
+                with lock:
+                    i = next(counter, None)
+                if i is None:
+                    return
+                started = time.perf_counter()
+                call()
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+
+        workers = [threading.Thread(target=worker) for _ in range(max(1, threads))]
+        started = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        return latencies, time.perf_counter() - started
@@ -0,0 +1,126 @@
+import socketserver
+import threading
+import time
+
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+
+from core.mail_pool import ConnectionPool
+
+SMTP_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+
+
+class _FakeSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept mail. Sleeps on connect to stand in for TCP + TLS setup."""
+
+    def handle(self):
+        time.sleep(self.server.handshake_seconds)
+        self._reply("220 bench ESMTP")
+        in_data = False
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if in_data:
+                if line in (b".\r\n", b".\n"):
+                    in_data = False
+                    self.server.count_message()
+                    self._reply("250 OK queued")
+                continue
+            command = line[:4].upper()
+            if command == b"EHLO":
+                self._reply("250-bench\r\n250 8BITMIME")
+            elif command == b"DATA":
+                in_data = True
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+            elif command == b"QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("250 OK")
+
+    def _reply(self, text):
+        self.wfile.write(text.encode() + b"\r\n")
+        self.wfile.flush()
+
+
+class _FakeSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake_seconds):
+        super().__init__(("127.0.0.1", 0), _FakeSMTPHandler)
+        self.handshake_seconds = handshake_seconds
+        self.received = 0
+        self._lock = threading.Lock()
+
+    def count_message(self):
+        with self._lock:
+            self.received += 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare messages/sec for a fresh SMTP connection per email (send_mail) against the pooled "
+        "connections used by the email tasks, against a local fake SMTP server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=500)
+        parser.add_argument("--threads", type=int, default=4, help="Concurrent senders (like worker threads).")
+        parser.add_argument("--pool-size", type=int, default=4)
+        parser.add_argument(
+            "--handshake-ms",
+            type=float,
+            default=30.0,
+            help="Delay per new connection, standing in for TCP + TLS setup to a real relay.",
+        )
+
+    def handle(self, *args, **options):
+        server = _FakeSMTPServer(options["handshake_ms"] / 1000)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+        backend_kwargs = {"host": host, "port": port, "use_tls": False, "use_ssl": False, "username": "", "password": ""}
+
+        try:
+
+            def fresh(message):
+                with get_connection(SMTP_BACKEND, fail_silently=False, **backend_kwargs) as conn:
+                    conn.send_messages([message])
+
+            pool = ConnectionPool(options["pool_size"], backend=SMTP_BACKEND, **backend_kwargs)
+
+            def pooled(message):
+                pool.send_messages([message])
+
+            for name, send in (("fresh connection", fresh), ("pooled", pooled)):
+                before = server.received
+                elapsed = self._run(send, options["messages"], options["threads"])
+                delivered = server.received - before
+                self.stdout.write(
+                    f"{name:>16}: {delivered} messages in {elapsed:.2f}s ({delivered / elapsed:.1f} msg/s)"
+                )
+            pool.close_all()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def _run(self, send, total, threads):
+        counter = iter(range(total))
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                with lock:
+                    i = next(counter, None)
+                if i is None:
+                    return
+                send(EmailMessage(f"Bench {i}", "Benchmark message body", "bench@example.com", ["to@example.com"]))
+
+        workers = [threading.Thread(target=worker) for _ in range(max(1, threads))]
+        started = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        return time.perf_counter() - started
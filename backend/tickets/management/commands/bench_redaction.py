@@ -0,0 +1,93 @@
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand
+
+from tickets.redaction import redact, redact_many
+
+_WORDS = (
+    "hello team my order has not arrived yet and the tracking page shows an error when I try to log in "
+    "please refund or resend the package as soon as possible thanks for the quick help"
+).split()
+
+_PII = [
+    "jane.doe{n}@example.com",
+    "+1 (555) 01{n:02d}-2233",
+    "4111 1111 1111 1111",
+    "DE89 3704 0044 0532 0130 00",
+    "Bearer abcdefghijklmnopqrstuvwxyz{n:06d}",
+    "order #{n}",
+]
+
+
+def _legacy_redact(text: str) -> str:
+    """The previous per-field redaction in the AI draft view."""
+    if not text:
+        return text
+    text = re.sub(r"[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}", "[redacted-email]", text, flags=re.IGNORECASE)
+    text = re.sub(r"\b\+?\d[\d\s\-()]{7,}\b", "[redacted-phone]", text)
+    return text
+
+
+def _body(rng: random.Random, size: int) -> str:
+    out = []
+    length = 0
+    while length < size:
+        if rng.random() < 0.05:
+            token = rng.choice(_PII).format(n=rng.randrange(100))
+        else:
+            token = rng.choice(_WORDS)
+        out.append(token)
+        length += len(token) + 1
+    return " ".join(out)
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark tickets.redaction against the previous two-regex redaction on synthetic message "
+        "bodies, plus near-miss inputs that make the old email pattern backtrack quadratically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=2000)
+        parser.add_argument("--body-bytes", type=int, default=2000, help="Approximate size of each body.")
+        parser.add_argument(
+            "--pathological-bytes",
+            type=int,
+            default=8000,
+            help="Size of the adversarial inputs (the old pattern is quadratic, keep this modest).",
+        )
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        bodies = [_body(rng, options["body_bytes"]) for _ in range(max(1, options["messages"]))]
+        total_mb = sum(len(b) for b in bodies) / 1e6
+        self.stdout.write(f"Corpus: {len(bodies)} bodies, {total_mb:.1f} MB")
+
+        runs = (
+            ("legacy per text", lambda: [_legacy_redact(b) for b in bodies]),
+            ("redact per text", lambda: [redact(b) for b in bodies]),
+            ("redact_many", lambda: redact_many(bodies)),
+        )
+        for name, run in runs:
+            elapsed = self._time(run)
+            self.stdout.write(f"{name:>18}: {elapsed * 1000:8.1f} ms  ({total_mb / elapsed:.1f} MB/s)")
+
+        size = max(10, options["pathological_bytes"])
+        self.stdout.write(f"Adversarial inputs ({size} bytes):")
+        for name, text in (
+            ("long local part", "a" * size + "@"),
+            ("dotted run", "a." * (size // 2)),
+            ("digit run", "1 " * (size // 2)),
+        ):
+            legacy = self._time(lambda: _legacy_redact(text))
+            current = self._time(lambda: redact(text))
+            self.stdout.write(f"{name:>18}: legacy {legacy * 1000:9.1f} ms   redact {current * 1000:7.2f} ms")
+
+    @staticmethod
+    def _time(fn) -> float:
+        started = time.perf_counter()
+        fn()
+        return time.perf_counter() - started
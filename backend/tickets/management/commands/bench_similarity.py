@@ -0,0 +1,61 @@
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from tickets.similarity import SimilarityIndex, vectorize
+
+_SAMPLE = (
+    "Cannot log in after password reset, the page shows an error and the reset email link has expired. "
+    "Please help me get back into my account before the invoice is due."
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Build a synthetic similar-tickets index with N random rows in a temporary directory (memory-mapped, "
+        "like production) and report top-k query latency. No database needed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--dim", type=int, default=256)
+        parser.add_argument("--queries", type=int, default=50)
+        parser.add_argument("-k", type=int, default=10)
+        parser.add_argument("--chunk", type=int, default=100_000, help="Rows written per upsert.")
+
+    def handle(self, *args, **options):
+        rows, dim = max(1, options["rows"]), options["dim"]
+        rng = np.random.default_rng(1)
+        with tempfile.TemporaryDirectory() as path:
+            started = time.perf_counter()
+            writer = SimilarityIndex(path, dim, writable=True)
+            for start in range(0, rows, options["chunk"]):
+                n = min(options["chunk"], rows - start)
+                vectors = rng.standard_normal((n, dim), dtype=np.float32)
+                vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                writer.upsert(np.arange(start + 1, start + n + 1), vectors)
+            writer.flush()
+            writer.save_meta()
+            self.stdout.write(
+                f"Built {rows} x {dim} index ({rows * dim * 4 / 1e6:.0f} MB) in {time.perf_counter() - started:.1f}s"
+            )
+
+            reader = SimilarityIndex(path, dim)
+            started = time.perf_counter()
+            query = vectorize([_SAMPLE], dim)[0]
+            self.stdout.write(f"Vectorize one ticket: {(time.perf_counter() - started) * 1000:.2f} ms")
+
+            reader.search(query, options["k"])  # fault the pages in, as a warm server would have them
+            latencies = []
+            for _ in range(max(1, options["queries"])):
+                started = time.perf_counter()
+                reader.search(query, options["k"])
+                latencies.append((time.perf_counter() - started) * 1000)
+            latencies.sort()
+            self.stdout.write(
+                f"top-{options['k']} search: p50 {statistics.median(latencies):.1f} ms  "
+                f"p95 {latencies[int(len(latencies) * 0.95)]:.1f} ms  max {latencies[-1]:.1f} ms"
+            )
@@ -0,0 +1,156 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from tickets.models import ACTIVE_STATUSES, Ticket, TicketMessage
+
+User = get_user_model()
+
+BENCH_PREFIX = "bench_"
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic dataset and print EXPLAIN ANALYZE plans for the hot ticket query shapes. "
+        "Run before and after migrating to compare plans. Use a scratch database: seeding bypasses "
+        "signals, so run reconcile_agent_load and rebuild_search_vectors afterwards if you keep the data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Number of synthetic tickets to create first.")
+        parser.add_argument("--agents", type=int, default=50)
+        parser.add_argument("--customers", type=int, default=2000)
+        parser.add_argument("--messages-per-ticket", type=int, default=5)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--verbose-plans", action="store_true", help="Print full plans, not just the summary.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            self.stderr.write("This benchmark requires PostgreSQL.")
+            return
+
+        if options["seed"]:
+            self._seed(options)
+
+        agent = User.objects.filter(username__startswith=f"{BENCH_PREFIX}agent").order_by("id").first()
+        customer = User.objects.filter(username__startswith=f"{BENCH_PREFIX}customer").order_by("id").first()
+        ticket = Ticket.objects.order_by("-id").first()
+        if agent is None or customer is None or ticket is None:
+            self.stderr.write("No benchmark data found; run with --seed N first.")
+            return
+
+        now = timezone.now()
+        week_ago = now - timedelta(days=7)
+
+        shapes = {
+            "agent active load": Ticket.objects.filter(assigned_agent=agent, status__in=ACTIVE_STATUSES).values("id"),
+            "agent ticket list": Ticket.objects.filter(assigned_agent=agent).order_by("-created_at", "-id").values("id")[:50],
+            "customer ticket list": Ticket.objects.filter(customer=customer).order_by("-created_at", "-id").values("id")[:50],
+            "unassigned backlog": Ticket.objects.filter(status=Ticket.Status.OPEN, assigned_agent__isnull=True)
+            .order_by("created_at", "id")
+            .values("id")[:50],
+            "created_at range (sargable)": Ticket.objects.filter(created_at__gte=week_ago, created_at__lt=now).values("id"),
+            "created_at range (__date)": Ticket.objects.filter(
+                created_at__date__gte=week_ago.date(), created_at__date__lte=now.date()
+            ).values("id"),
+            "message thread": TicketMessage.objects.filter(ticket=ticket).order_by("created_at", "id").values("id"),
+            "public message thread": TicketMessage.objects.filter(ticket=ticket, is_internal=False)
+            .order_by("created_at")
+            .values("id"),
+        }
+
+        for name, qs in shapes.items():
+            self._explain(name, qs, options["verbose_plans"])
+
+    def _explain(self, name, qs, verbose):
+        sql, params = qs.query.sql_with_params()
+        with connection.cursor() as cursor:
+            started = time.perf_counter()
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", params)
+            rows = [r[0] for r in cursor.fetchall()]
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+        scans = [line.strip() for line in rows if "Scan" in line]
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{name}  ({elapsed_ms:.1f} ms)"))
+        for line in (rows if verbose else scans[:3]):
+            self.stdout.write(f"  {line}")
+        execution = [line for line in rows if line.startswith("Execution Time")]
+        if execution and not verbose:
+            self.stdout.write(f"  {execution[0]}")
+
+    def _seed(self, options):
+        rng = random.Random(42)
+        batch_size = max(1, options["batch_size"])
+
+        agents = self._ensure_users("agent", options["agents"], UserProfile.Role.AGENT)
+        customers = self._ensure_users("customer", options["customers"], UserProfile.Role.CUSTOMER)
+
+        statuses = [c[0] for c in Ticket.Status.choices]
+        priorities = [c[0] for c in Ticket.Priority.choices]
+        now = timezone.now()
+
+        remaining = options["seed"]
+        created = 0
+        while remaining > 0:
+            size = min(batch_size, remaining)
+            tickets = []
+            for _ in range(size):
+                status = rng.choice(statuses)
+                tickets.append(
+                    Ticket(
+                        customer_id=rng.choice(customers),
+                        assigned_agent_id=None if status == Ticket.Status.OPEN and rng.random() < 0.5 else rng.choice(agents),
+                        subject=f"Synthetic ticket {created}",
+                        description="Generated by bench_ticket_queries",
+                        status=status,
+                        priority=rng.choice(priorities),
+                    )
+                )
+                created += 1
+            tickets = Ticket.objects.bulk_create(tickets, batch_size=batch_size)
+
+            # auto_now_add ignores explicit values on create, so spread created_at afterwards.
+            for t in tickets:
+                t.created_at = now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+            Ticket.objects.bulk_update(tickets, ["created_at"], batch_size=batch_size)
+
+            messages = []
+            for t in tickets:
+                for i in range(options["messages_per_ticket"]):
+                    messages.append(
+                        TicketMessage(
+                            ticket_id=t.id,
+                            author_id=t.customer_id,
+                            body=f"Synthetic message {i}",
+                            is_internal=rng.random() < 0.2,
+                        )
+                    )
+            TicketMessage.objects.bulk_create(messages, batch_size=batch_size)
+
+            remaining -= size
+            self.stdout.write(f"Seeded {created} tickets")
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE tickets_ticket")
+            cursor.execute("ANALYZE tickets_ticketmessage")
+
+    def _ensure_users(self, kind, count, role):
+        existing = list(
+            User.objects.filter(username__startswith=f"{BENCH_PREFIX}{kind}").order_by("id").values_list("id", flat=True)
+        )
+        missing = count - len(existing)
+        if missing > 0:
+            start = len(existing)
+            new_users = User.objects.bulk_create(
+                [User(username=f"{BENCH_PREFIX}{kind}{start + i}") for i in range(missing)]
+            )
+            # bulk_create skips the post_save signal that normally creates profiles.
+            UserProfile.objects.bulk_create([UserProfile(user_id=u.id, role=role) for u in new_users])
+            existing += [u.id for u in new_users]
+        return existing[:count]
@@ -0,0 +1,156 @@
+import asyncio
+import statistics
+import time
+
+from channels.layers import InMemoryChannelLayer, channel_layers
+from asgiref.testing import ApplicationCommunicator
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from rest_framework_simplejwt.tokens import AccessToken
+
+from tickets.management.commands.bench_ticket_queries import BENCH_PREFIX
+from tickets.models import Ticket
+
+
+class Command(BaseCommand):
+    help = (
+        "Open many concurrent ticket WebSocket connections in-process (JWT auth, role lookup, ticket "
+        "permission check) and report connect latency and database connection churn. Compare runs "
+        "with DB_POOL=0 and DB_POOL=1. --http sends GET /api/tickets/ through the ASGI app instead. "
+        "Uses the customers seeded by bench_ticket_queries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=1000)
+        parser.add_argument("--concurrency", type=int, default=100)
+        parser.add_argument("--redis-layer", action="store_true", help="Use the configured channel layer, not in-memory.")
+        parser.add_argument(
+            "--http",
+            action="store_true",
+            help="Benchmark ticket list requests instead (each ASGI request runs in its own worker thread).",
+        )
+
+    def handle(self, *args, **options):
+        targets = list(
+            Ticket.objects.filter(customer__username__startswith=f"{BENCH_PREFIX}customer")
+            .order_by("customer_id", "id")
+            .distinct("customer_id")
+            .select_related("customer")[:500]
+        )
+        if not targets:
+            self.stderr.write("No benchmark data found; run bench_ticket_queries --seed N first.")
+            return
+        tokens = [str(AccessToken.for_user(t.customer)) for t in targets]
+        if options["http"]:
+            targets = [("http", token) for token in tokens]
+        else:
+            targets = [("ws", f"/ws/tickets/{t.id}/?token={token}") for t, token in zip(targets, tokens)]
+
+        if not options["redis_layer"]:
+            channel_layers.backends["default"] = InMemoryChannelLayer()
+
+        from config.asgi import application
+
+        created = []
+
+        def count_connection(sender, connection, **kwargs):
+            created.append(connection.alias)
+
+        connection_created.connect(count_connection)
+        try:
+            latencies, failures, elapsed = asyncio.run(
+                self._run(application, targets, options["connections"], max(1, options["concurrency"]))
+            )
+        finally:
+            connection_created.disconnect(count_connection)
+
+        mode = "pool" if settings.DATABASES["default"].get("OPTIONS", {}).get("pool") else "persistent"
+        self.stdout.write(f"DB mode: {mode} (CONN_MAX_AGE={settings.DATABASES['default'].get('CONN_MAX_AGE')})")
+        noun = "Requests" if options["http"] else "Connections"
+        self.stdout.write(f"{noun}: {len(latencies)} ok, {failures} failed in {elapsed:.2f}s")
+        if latencies:
+            ms = sorted(x * 1000 for x in latencies)
+            p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+            self.stdout.write(
+                f"Latency ms: p50 {statistics.median(ms):.1f}  p95 {ms[int(len(ms) * 0.95)]:.1f}  "
+                f"p99 {p99:.1f}  max {ms[-1]:.1f}"
+            )
+        # With a pool, connection_created fires on every checkout; the pool stats below count real connections.
+        self.stdout.write(f"Django connection_created signals: {len(created)}")
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()")
+            self.stdout.write(f"Postgres backends open afterwards: {cursor.fetchone()[0]}")
+        pool = getattr(connection, "pool", None)
+        if pool is not None:
+            stats = pool.get_stats()
+            self.stdout.write(
+                f"Pool: {stats.get('connections_num', 0)} connections opened, "
+                f"{stats.get('requests_waiting', 0)} waiting, {stats.get('requests_wait_ms', 0)} ms total wait"
+            )
+
+    async def _request(self, application, token) -> bool:
+        communicator = ApplicationCommunicator(
+            application,
+            {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": "/api/tickets/",
+                "raw_path": b"/api/tickets/",
+                "query_string": b"",
+                "root_path": "",
+                "headers": [(b"host", b"localhost"), (b"authorization", f"Bearer {token}".encode())],
+                "server": ("localhost", 80),
+                "client": ("127.0.0.1", 0),
+            },
+        )
+        await communicator.send_input({"type": "http.request", "body": b""})
+        start = await communicator.receive_output(timeout=30)
+        while (await communicator.receive_output(timeout=30)).get("more_body"):
+            pass
+        # Let the handler finish (response.close() sends request_finished, which releases the connection).
+        await communicator.wait(timeout=30)
+        return start["status"] == 200
+
+    async def _run(self, application, targets, total, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        failures = 0
+
+        async def one(i):
+            nonlocal failures
+            async with semaphore:
+                kind, target = targets[i % len(targets)]
+                started = time.perf_counter()
+                if kind == "http":
+                    try:
+                        ok = await self._request(application, target)
+                    except Exception:
+                        ok = False
+                    if ok:
+                        latencies.append(time.perf_counter() - started)
+                    else:
+                        failures += 1
+                    return
+                communicator = WebsocketCommunicator(application, target)
+                try:
+                    connected, _ = await communicator.connect(timeout=30)
+                except Exception:
+                    connected = False
+                if connected:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    failures += 1
+                try:
+                    await communicator.disconnect()
+                except Exception:
+                    pass
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return latencies, failures, time.perf_counter() - started
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from tickets.models import Ticket
+from tickets.search import rebuild_search_vectors
+
+
+class Command(BaseCommand):
+    help = "Rebuild the stored full-text search documents for tickets in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--missing-only",
+            action="store_true",
+            help="Only rebuild tickets that have never been indexed.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, int(options["batch_size"]))
+
+        qs = Ticket.objects.order_by("id")
+        if options["missing_only"]:
+            qs = qs.filter(search_vector_internal__isnull=True)
+
+        last_id = 0
+        total = 0
+        while True:
+            ids = list(qs.filter(id__gt=last_id).values_list("id", flat=True)[:batch_size])
+            if not ids:
+                break
+            total += rebuild_search_vectors(ids)
+            last_id = ids[-1]
+            self.stdout.write(f"Indexed {total} tickets (last id {last_id})")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt search vectors for {total} tickets"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tickets.similarity import index_dir, update_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Bring the similar-tickets index up to date (what the update_similarity_index beat task does). "
+        "With --full, rebuild it from scratch, dropping tombstoned rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--full", action="store_true", help="Discard the index and re-index every ticket.")
+
+    def handle(self, *args, **options):
+        total = update_index(max(1, int(options["batch_size"])), rebuild=options["full"])
+        if total is None:
+            raise CommandError("Another index update is running; try again when it finishes.")
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} tickets into {index_dir()}"))
@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+from django.utils import timezone
+
+from tickets.models import Ticket
+from tickets.rollup import rebuild_days
+
+
+class Command(BaseCommand):
+    help = "Rebuild the TicketDailyStats analytics rollup for complete days, one chunk of days at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=0,
+            help="Only rebuild the last N complete days (default: everything since the first ticket).",
+        )
+        parser.add_argument("--chunk-days", type=int, default=31)
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        if options["days"] > 0:
+            start = today - timedelta(days=options["days"])
+        else:
+            first = Ticket.objects.aggregate(first=Min("created_at"))["first"]
+            if first is None:
+                self.stdout.write("No tickets; nothing to roll up.")
+                return
+            start = timezone.localdate(first)
+
+        chunk = timedelta(days=max(1, options["chunk_days"]))
+        rows = 0
+        cursor = start
+        while cursor < today:
+            end = min(cursor + chunk, today)
+            rows += rebuild_days(cursor, end)
+            self.stdout.write(f"Rolled up {cursor} .. {end - timedelta(days=1)}")
+            cursor = end
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} rollup rows"))
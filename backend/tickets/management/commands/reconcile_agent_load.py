@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+
+from accounts.models import UserProfile
+from tickets import agent_queue
+from tickets.models import ACTIVE_STATUSES, Ticket
+
+
+class Command(BaseCommand):
+    help = "Recount active assigned tickets per agent and repair drifted UserProfile.active_count values."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report drift without writing.")
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        repaired = 0
+
+        with transaction.atomic():
+            # Lock first, then count: in-flight transitions block on the profile
+            # row and apply their delta on top of the repaired value.
+            lock_filter = Q(role__in=[UserProfile.Role.AGENT, UserProfile.Role.ADMIN]) | Q(active_count__gt=0)
+            profiles = list(UserProfile.objects.select_for_update().filter(lock_filter).order_by("user_id"))
+
+            actual = dict(
+                Ticket.objects.filter(assigned_agent__isnull=False, status__in=ACTIVE_STATUSES)
+                .values("assigned_agent_id")
+                .annotate(c=Count("id"))
+                .values_list("assigned_agent_id", "c")
+            )
+
+            locked_ids = {p.user_id for p in profiles}
+            stray_ids = [uid for uid in actual if uid not in locked_ids]
+            if stray_ids:
+                profiles += list(UserProfile.objects.select_for_update().filter(user_id__in=stray_ids))
+
+            drifted = []
+            for prof in profiles:
+                expected = int(actual.get(prof.user_id, 0))
+                if prof.active_count != expected:
+                    self.stdout.write(f"user {prof.user_id}: stored {prof.active_count}, actual {expected}")
+                    prof.active_count = expected
+                    drifted.append(prof)
+
+            if drifted and not dry_run:
+                UserProfile.objects.bulk_update(drifted, ["active_count"])
+            repaired = len(drifted)
+
+        if not dry_run and agent_queue.enabled():
+            queued = agent_queue.rebuild()
+            self.stdout.write(f"Rebuilt Redis agent queue with {queued} available agents")
+
+        verb = "Found" if dry_run else "Repaired"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {repaired} drifted agent counters"))
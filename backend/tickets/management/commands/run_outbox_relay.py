@@ -0,0 +1,71 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from tickets import outbox
+
+
+class Command(BaseCommand):
+    help = "Continuously drain the ticket outbox to the channel layer and Celery."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="Max seconds to wait for a NOTIFY before checking the outbox again.",
+        )
+        parser.add_argument(
+            "--coalesce-ms",
+            type=float,
+            default=None,
+            help="After a wake-up, wait this long so a burst is delivered as one frame per ticket "
+            "(default: REALTIME_COALESCE_MS).",
+        )
+        parser.add_argument("--retention-hours", type=int, default=24, help="Delete delivered events older than this.")
+        parser.add_argument("--once", action="store_true", help="Drain until empty and exit.")
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+        poll_interval = max(0.1, options["poll_interval"])
+        retention = timedelta(hours=max(1, options["retention_hours"]))
+        coalesce_ms = options["coalesce_ms"]
+        if coalesce_ms is None:
+            coalesce_ms = float(getattr(settings, "REALTIME_COALESCE_MS", 50))
+        coalesce = max(0.0, coalesce_ms / 1000)
+        next_purge = 0.0
+
+        while True:
+            close_old_connections()
+
+            while outbox.drain(batch_size) >= batch_size:
+                pass
+            if options["once"]:
+                return
+
+            if time.monotonic() >= next_purge:
+                purged = outbox.purge_processed(timezone.now() - retention)
+                if purged:
+                    self.stdout.write(f"Purged {purged} delivered outbox events")
+                next_purge = time.monotonic() + 3600
+
+            if self._wait(poll_interval) and coalesce:
+                time.sleep(coalesce)
+
+    def _wait(self, timeout) -> bool:
+        """Block until a NOTIFY arrives or ``timeout`` passes; returns True if notified."""
+        if connection.vendor != "postgresql":
+            time.sleep(timeout)
+            return False
+        connection.ensure_connection()
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {outbox.NOTIFY_CHANNEL}")
+        notified = False
+        for _ in connection.connection.notifies(timeout=timeout, stop_after=1):
+            notified = True
+        return notified
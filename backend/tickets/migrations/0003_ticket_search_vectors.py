@@ -0,0 +1,35 @@
+# Generated by Django 5.0.8 on 2026-10-18 20:05
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0002_attachment'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='search_vector_internal',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='search_vector_public',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector_public'], name='ticket_search_public_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector_internal'], name='ticket_search_internal_gin'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.8 on 2026-10-18 20:14
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Build indexes without blocking writes on large tables.
+    atomic = False
+
+    dependencies = [
+        ('tickets', '0003_ticket_search_vectors'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='ticket',
+            index=models.Index(fields=['created_at', 'id'], name='ticket_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='ticket',
+            index=models.Index(fields=['customer', 'created_at'], name='ticket_customer_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='ticket',
+            index=models.Index(fields=['assigned_agent', 'created_at'], name='ticket_agent_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='ticket',
+            index=models.Index(fields=['assigned_agent', 'status'], name='ticket_agent_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('assigned_agent__isnull', True), ('status', 'OPEN')), fields=['created_at', 'id'], name='ticket_unassigned_backlog_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='ticketmessage',
+            index=models.Index(fields=['ticket', 'created_at', 'id'], name='ticketmessage_thread_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='ticketmessage',
+            index=models.Index(fields=['ticket', 'is_internal', 'created_at'], name='ticketmessage_visible_idx'),
+        ),
+    ]
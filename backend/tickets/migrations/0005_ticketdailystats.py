@@ -0,0 +1,29 @@
+# Generated by Django 5.0.8 on 2026-10-18 20:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0004_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('OPEN', 'Open'), ('ASSIGNED', 'Assigned'), ('IN_PROGRESS', 'In Progress'), ('WAITING_ON_CUSTOMER', 'Waiting on Customer'), ('RESOLVED', 'Resolved'), ('CLOSED', 'Closed')], max_length=32)),
+                ('priority', models.CharField(choices=[('LOW', 'Low'), ('MEDIUM', 'Medium'), ('HIGH', 'High'), ('URGENT', 'Urgent')], max_length=16)),
+                ('created_count', models.IntegerField(default=0)),
+                ('closed_count', models.IntegerField(default=0)),
+                ('resolution_seconds', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ticketdailystats',
+            constraint=models.UniqueConstraint(fields=('day', 'status', 'priority'), name='ticket_daily_stats_unique'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.8 on 2026-10-18 20:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0006_outboxevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.EmailField(max_length=254)),
+                ('event_type', models.CharField(max_length=64)),
+                ('new_status', models.CharField(blank=True, max_length=32)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tickets.ticketmessage')),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_notifications', to='tickets.ticket')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['recipient', 'ticket', 'created_at'], name='pending_notification_group_idx')],
+            },
+        ),
+    ]
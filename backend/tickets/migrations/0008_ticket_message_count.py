@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-18 21:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_message_count(apps, schema_editor):
+    Ticket = apps.get_model("tickets", "Ticket")
+    TicketMessage = apps.get_model("tickets", "TicketMessage")
+
+    counts = (
+        TicketMessage.objects.filter(ticket_id=OuterRef("pk"))
+        .order_by()
+        .values("ticket_id")
+        .annotate(c=Count("id"))
+        .values("c")
+    )
+    Ticket.objects.update(message_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0007_pendingnotification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_message_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0008_ticket_message_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['updated_at', 'id'], name='ticket_updated_idx'),
+        ),
+    ]
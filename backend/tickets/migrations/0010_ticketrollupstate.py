@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-18 20:59
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_rollup_state(apps, schema_editor):
+    # Trust the rollup as far as it has rows: days after the newest row are read
+    # live until rollup_ticket_daily_stats (or rebuild_ticket_daily_stats) covers them.
+    TicketDailyStats = apps.get_model("tickets", "TicketDailyStats")
+    TicketRollupState = apps.get_model("tickets", "TicketRollupState")
+    newest = TicketDailyStats.objects.aggregate(newest=Max("day"))["newest"]
+    TicketRollupState.objects.create(pk=1, rolled_up_through=newest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0009_ticket_updated_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketRollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rolled_up_through', models.DateField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(seed_rollup_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, transaction
+from django.db.models import OuterRef, Q, Subquery, TextField
+
+BATCH_SIZE = 500
+
+
+def backfill_search_vectors(apps, schema_editor):
+    # 0003 added the columns empty; without this, search finds no ticket written
+    # before it until rebuild_search_vectors is run by hand. Mirrors
+    # tickets.search._document, which cannot be imported against historical models.
+    Ticket = apps.get_model("tickets", "Ticket")
+    TicketMessage = apps.get_model("tickets", "TicketMessage")
+
+    def document(include_internal):
+        messages = TicketMessage.objects.filter(ticket_id=OuterRef("pk"))
+        if not include_internal:
+            messages = messages.filter(is_internal=False)
+        text = (
+            messages.order_by()
+            .values("ticket_id")
+            .annotate(text=StringAgg("body", delimiter=" ", output_field=TextField()))
+            .values("text")
+        )
+        return (
+            SearchVector("subject", weight="A")
+            + SearchVector("description", weight="B")
+            + SearchVector(Subquery(text, output_field=TextField()), weight="C")
+        )
+
+    missing = Ticket.objects.filter(Q(search_vector_public__isnull=True) | Q(search_vector_internal__isnull=True))
+    last_id = 0
+    while True:
+        ids = list(missing.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:BATCH_SIZE])
+        if not ids:
+            break
+        # One short transaction per batch instead of locking every ticket row for the whole backfill.
+        with transaction.atomic():
+            Ticket.objects.filter(id__in=ids).update(
+                search_vector_public=document(include_internal=False),
+                search_vector_internal=document(include_internal=True),
+            )
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('tickets', '0010_ticketrollupstate'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+    ]
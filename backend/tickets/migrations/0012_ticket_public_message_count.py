@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:10
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_public_thread(apps, schema_editor):
+    Ticket = apps.get_model("tickets", "Ticket")
+    TicketMessage = apps.get_model("tickets", "TicketMessage")
+
+    public = TicketMessage.objects.filter(ticket_id=OuterRef("pk"), is_internal=False).order_by().values("ticket_id")
+    Ticket.objects.update(
+        public_message_count=Coalesce(Subquery(public.annotate(c=Count("id")).values("c")), 0),
+        last_public_message_at=Subquery(public.annotate(last=Max("created_at")).values("last")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0011_backfill_search_vectors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='last_public_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='public_message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_public_thread, migrations.RunPython.noop),
+    ]
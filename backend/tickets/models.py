@@ -1,4 +1,6 @@
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 
@@ -41,12 +43,53 @@ class Ticket(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     last_message_at = models.DateTimeField(null=True, blank=True)
+    # Bumped with last_message_at on every new message; together they form the
+    # thread ETag, so an unchanged thread is answered from the ticket row alone.
+    message_count = models.PositiveIntegerField(default=0)
+    # The same pair for the customer-visible thread: internal notes move neither,
+    # so customers can neither count them nor see their ETag change.
+    last_public_message_at = models.DateTimeField(null=True, blank=True)
+    public_message_count = models.PositiveIntegerField(default=0)
     closed_at = models.DateTimeField(null=True, blank=True)
 
+    # Weighted full-text documents (subject A, description B, messages C) kept
+    # up to date by tickets.search. The public variant skips internal notes.
+    search_vector_public = SearchVectorField(null=True, editable=False)
+    search_vector_internal = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector_public"], name="ticket_search_public_gin"),
+            GinIndex(fields=["search_vector_internal"], name="ticket_search_internal_gin"),
+            # Ticket list ordering/keyset pagination and created_at range filters.
+            models.Index(fields=["created_at", "id"], name="ticket_created_idx"),
+            models.Index(fields=["customer", "created_at"], name="ticket_customer_created_idx"),
+            models.Index(fields=["assigned_agent", "created_at"], name="ticket_agent_created_idx"),
+            # Incremental similar-tickets index updates (tickets.similarity watermark).
+            models.Index(fields=["updated_at", "id"], name="ticket_updated_idx"),
+            # Agent load and per-agent status filters.
+            models.Index(fields=["assigned_agent", "status"], name="ticket_agent_status_idx"),
+            # Unassigned OPEN backlog picked up by auto-assignment, oldest first.
+            models.Index(
+                fields=["created_at", "id"],
+                name="ticket_unassigned_backlog_idx",
+                condition=models.Q(status="OPEN", assigned_agent__isnull=True),
+            ),
+        ]
+
     def __str__(self) -> str:
         return f"#{self.id} {self.subject}"
 
 
+# Statuses that count against an agent's capacity.
+ACTIVE_STATUSES = (
+    Ticket.Status.OPEN,
+    Ticket.Status.ASSIGNED,
+    Ticket.Status.IN_PROGRESS,
+    Ticket.Status.WAITING_ON_CUSTOMER,
+)
+
+
 class TicketMessage(models.Model):
     ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name="messages")
     author = models.ForeignKey(
@@ -62,6 +105,12 @@ class TicketMessage(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["ticket", "created_at", "id"], name="ticketmessage_thread_idx"),
+            models.Index(fields=["ticket", "is_internal", "created_at"], name="ticketmessage_visible_idx"),
+        ]
+
     def __str__(self) -> str:
         return f"TicketMessage(ticket_id={self.ticket_id}, id={self.id})"
 
@@ -88,3 +137,87 @@ class Attachment(models.Model):
     content_type = models.CharField(max_length=120, blank=True)
     size = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+
+
+class TicketDailyStats(models.Model):
+    """Rollup of tickets per day x current status x priority for the analytics endpoints.
+
+    ``created_count`` counts tickets created on ``day``; ``closed_count`` and
+    ``resolution_seconds`` count tickets whose ``closed_at`` falls on ``day``.
+    Rows are authoritative only up to ``TicketRollupState.rolled_up_through``;
+    later days (at least the current one) are always computed live.
+    """
+
+    day = models.DateField()
+    status = models.CharField(max_length=32, choices=Ticket.Status.choices)
+    priority = models.CharField(max_length=16, choices=Ticket.Priority.choices)
+
+    created_count = models.IntegerField(default=0)
+    closed_count = models.IntegerField(default=0)
+    resolution_seconds = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "status", "priority"], name="ticket_daily_stats_unique"),
+        ]
+
+    def __str__(self) -> str:
+        return f"TicketDailyStats({self.day}, {self.status}, {self.priority})"
+
+
+class TicketRollupState(models.Model):
+    """Single row (pk=1): the last day the TicketDailyStats rollup is complete for (null = none)."""
+
+    rolled_up_through = models.DateField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"TicketRollupState(rolled_up_through={self.rolled_up_through})"
+
+
+class OutboxEvent(models.Model):
+    """Side effect (WebSocket broadcast or email task) recorded in the writing transaction.
+
+    Drained in id order by ``tickets.outbox.drain`` so delivery is at-least-once
+    and ordered per ticket, and never happens for rolled-back writes.
+    """
+
+    class Kind(models.TextChoices):
+        BROADCAST = "broadcast", "Broadcast"
+        EMAIL = "email", "Email"
+
+    ticket_id = models.BigIntegerField()
+    kind = models.CharField(max_length=16, choices=Kind.choices)
+    payload = models.JSONField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["id"], name="outbox_pending_idx", condition=models.Q(processed_at__isnull=True)),
+        ]
+
+    def __str__(self) -> str:
+        return f"OutboxEvent(id={self.id}, ticket_id={self.ticket_id}, kind={self.kind})"
+
+
+class PendingNotification(models.Model):
+    """A ticket email event buffered for one recipient until the digest window closes."""
+
+    recipient = models.EmailField()
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name="pending_notifications")
+    message = models.ForeignKey(TicketMessage, null=True, blank=True, on_delete=models.CASCADE, related_name="+")
+    event_type = models.CharField(max_length=64)
+    new_status = models.CharField(max_length=32, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["recipient", "ticket", "created_at"], name="pending_notification_group_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"PendingNotification({self.recipient}, ticket_id={self.ticket_id}, {self.event_type})"
@@ -0,0 +1,141 @@
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from tickets.models import OutboxEvent
+from tickets.realtime import broadcast_ticket_events
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "ticket_outbox"
+# Arbitrary constant for pg_try_advisory_xact_lock: one drainer at a time keeps per-ticket order.
+_DRAIN_LOCK_ID = 7305_0001
+
+
+def _notify_relay():
+    # NOTIFY is delivered at commit (and dropped on rollback), so the relay
+    # wakes up without a Redis round-trip on the request path.
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(f"NOTIFY {NOTIFY_CHANNEL}")
+
+
+def enqueue_broadcast(ticket_id: int, payload: dict) -> OutboxEvent:
+    event = OutboxEvent.objects.create(ticket_id=ticket_id, kind=OutboxEvent.Kind.BROADCAST, payload=payload)
+    _notify_relay()
+    return event
+
+
+def enqueue_ticket_email(event_type: str, ticket_id: int, message_id: int | None = None, new_status: str | None = None):
+    event = OutboxEvent.objects.create(
+        ticket_id=ticket_id,
+        kind=OutboxEvent.Kind.EMAIL,
+        payload={
+            "event_type": event_type,
+            "ticket_id": ticket_id,
+            "message_id": message_id,
+            "new_status": new_status,
+        },
+    )
+    _notify_relay()
+    return event
+
+
+def enqueue_many(events) -> None:
+    """Bulk-insert unsaved ``OutboxEvent`` instances (e.g. for a batch assignment)."""
+    events = list(events)
+    if not events:
+        return
+    OutboxEvent.objects.bulk_create(events)
+    _notify_relay()
+
+
+def _dispatch(event: OutboxEvent) -> None:
+    # Broadcasts never come through here: drain() sends them grouped per ticket.
+    if event.kind == OutboxEvent.Kind.EMAIL:
+        from tickets.tasks import send_ticket_email  # tasks enqueues through this module
+
+        p = event.payload
+        send_ticket_email.delay(p["event_type"], p["ticket_id"], p.get("message_id"), p.get("new_status"))
+    else:
+        raise ValueError(f"Unknown outbox event kind: {event.kind}")
+
+
+def _record_failure(event: OutboxEvent, exc: Exception, max_attempts: int, save_payload: bool = False) -> bool:
+    """Count a failed attempt; returns True if the event was parked for good."""
+    logger.warning("Outbox event %s failed", event.id, exc_info=exc)
+    give_up = event.attempts + 1 >= max_attempts
+    updates = {}
+    if save_payload:
+        updates["payload"] = event.payload
+    OutboxEvent.objects.filter(id=event.id).update(
+        attempts=F("attempts") + 1,
+        last_error=str(exc)[:1000],
+        processed_at=timezone.now() if give_up else None,
+        **updates,
+    )
+    return give_up
+
+
+def drain(batch_size: int = 100) -> int:
+    """Deliver one batch of pending events in id order. Returns the number delivered.
+
+    Broadcasts in the batch are grouped per ticket and sent as one frame per
+    ticket group. A failed event blocks only the later events of the same
+    ticket until it succeeds or exhausts ``OUTBOX_MAX_ATTEMPTS``, after which it
+    is parked with its error so the ticket's stream can move on.
+    """
+    max_attempts = int(getattr(settings, "OUTBOX_MAX_ATTEMPTS", 10))
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", [_DRAIN_LOCK_ID])
+            if not cursor.fetchone()[0]:
+                return 0
+
+        events = list(OutboxEvent.objects.filter(processed_at__isnull=True).order_by("id")[:batch_size])
+        delivered = []
+        blocked_tickets = set()
+        broadcasts = defaultdict(list)
+        for event in events:
+            if event.ticket_id in blocked_tickets:
+                continue
+            if event.kind == OutboxEvent.Kind.BROADCAST:
+                broadcasts[event.ticket_id].append(event)
+                continue
+            try:
+                _dispatch(event)
+            except Exception as exc:
+                if not _record_failure(event, exc, max_attempts):
+                    blocked_tickets.add(event.ticket_id)
+                continue
+            delivered.append(event.id)
+
+        if broadcasts:
+            # The payloads are stamped with their replay seq in place. A failed
+            # send keeps the stamped payload, so the retry reuses that seq
+            # instead of appending the event to the replay log a second time.
+            failures = broadcast_ticket_events(
+                {ticket_id: [e.payload for e in batch] for ticket_id, batch in broadcasts.items()}
+            )
+            for ticket_id, batch in broadcasts.items():
+                exc = failures.get(ticket_id)
+                if exc is None:
+                    delivered += [e.id for e in batch]
+                else:
+                    for event in batch:
+                        _record_failure(event, exc, max_attempts, save_payload="seq" in event.payload)
+
+        if delivered:
+            OutboxEvent.objects.filter(id__in=delivered).update(processed_at=timezone.now())
+
+    return len(delivered)
+
+
+def purge_processed(older_than) -> int:
+    deleted, _ = OutboxEvent.objects.filter(processed_at__lt=older_than).delete()
+    return deleted
@@ -0,0 +1,114 @@
+import base64
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Keyset pagination over ``(created_at, id)``.
+
+    Opt-in: only applied when the client sends ``cursor`` or ``page_size``, so
+    existing callers keep receiving a plain list. Each page is a bounded index
+    range scan regardless of how deep the client has paged.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = 50
+    max_page_size = 200
+    descending = True
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+
+        if self.descending:
+            queryset = queryset.order_by("-created_at", "-id")
+        else:
+            queryset = queryset.order_by("created_at", "id")
+
+        position = self.decode_cursor(params.get(self.cursor_query_param))
+        if position is not None:
+            created_at, pk = position
+            if self.descending:
+                queryset = queryset.filter(
+                    Q(created_at__lte=created_at),
+                    Q(created_at__lt=created_at) | Q(id__lt=pk),
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__gte=created_at),
+                    Q(created_at__gt=created_at) | Q(id__gt=pk),
+                )
+
+        rows = list(queryset[: page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_position = (rows[-1].created_at, rows[-1].id) if self.has_next else None
+        return rows
+
+    def get_page_size(self, request):
+        raw = request.query_params.get(self.page_size_query_param)
+        try:
+            size = int(raw)
+        except (TypeError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def encode_cursor(self, position) -> str:
+        created_at, pk = position
+        raw = f"{created_at.isoformat()}|{pk}"
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+            ts, pk = raw.rsplit("|", 1)
+            created_at = parse_datetime(ts)
+            pk = int(pk)
+        except (ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class TicketPagination(KeysetPagination):
+    descending = True
+
+
+class TicketMessagePagination(KeysetPagination):
+    descending = False
+    page_size = 100
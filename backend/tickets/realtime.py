@@ -1,13 +1,119 @@
+import json
+
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 
+from core import analytics_cache, metrics
+from tickets import event_log
+
+# Events that change what the admin analytics endpoints report.
+ANALYTICS_EVENTS = {"ticket.status_changed", "ticket.assigned"}
+
+# Events that describe current state rather than history: only the latest one
+# per ticket matters, so older ones can be dropped in a burst or a slow client's buffer.
+STATE_EVENTS = {"ticket.status_changed", "ticket.assigned"}
+
+
+def ticket_group(ticket_id: int) -> str:
+    return f"ticket_{ticket_id}"
+
+
+def agent_queue_group(user_id: int) -> str:
+    """Per-agent "my queue" feed: tickets entering or leaving the agent's assignments."""
+    return f"agent_queue_{user_id}"
+
+
+def user_group(user_id: int) -> str:
+    """Every socket of one user, for events meant only for them (e.g. their AI drafts)."""
+    return f"user_{user_id}"
+
+
+def _collapse(payloads):
+    """Drop state events superseded by a later event of the same type in this burst."""
+    last_index = {}
+    for i, payload in enumerate(payloads):
+        if payload.get("type") in STATE_EVENTS:
+            last_index[payload["type"]] = i
+    return [
+        p for i, p in enumerate(payloads) if p.get("type") not in STATE_EVENTS or last_index[p["type"]] == i
+    ]
+
+
+def build_frame(ticket_id: int, payloads) -> dict:
+    """Channel-layer message for a burst of events on one ticket, serialized once for all receivers.
 
-def broadcast_ticket_event(ticket_id: int, payload: dict):
+    A single event is sent as-is; several become ``{"type": "batch", "events": [...]}``.
+    ``merge_key`` marks frames a slow consumer may replace with a newer frame of the same key.
+    """
+    payloads = _collapse(payloads)
+    if len(payloads) == 1:
+        frame = payloads[0]
+    else:
+        frame = {"type": "batch", "ticket_id": ticket_id, "events": payloads}
+
+    types = {p.get("type") for p in payloads}
+    merge_key = None
+    if len(types) == 1 and types <= STATE_EVENTS:
+        merge_key = f"{types.pop()}:{ticket_id}"
+
+    seqs = [p["seq"] for p in payloads if "seq" in p]
+    return {
+        "type": "ticket.event",
+        "payload": frame,
+        "text": json.dumps(frame),
+        "merge_key": merge_key,
+        # Lets a subscriber that just replayed up to some seq skip frames it already sent.
+        "max_seq": max(seqs) if seqs else None,
+    }
+
+
+async def _send_all(messages):
     channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        f"ticket_{ticket_id}",
-        {
-            "type": "ticket.event",
-            "payload": payload,
-        },
-    )
+    failures = {}
+    for ticket_id, group, message in messages:
+        try:
+            await channel_layer.group_send(group, message)
+        except Exception as exc:
+            failures.setdefault(ticket_id, exc)
+    return failures
+
+
+def broadcast_ticket_events(batches: dict) -> dict:
+    """Send ``{ticket_id: [payload, ...]}`` as one frame per ticket group, over one event-loop bridge.
+
+    Returns ``{ticket_id: exception}`` for tickets whose send failed.
+    """
+    event_log.append(batches)
+
+    messages = []
+    event_count = 0
+    for ticket_id, payloads in batches.items():
+        if not payloads:
+            continue
+        event_count += len(payloads)
+        if any(p.get("type") in ANALYTICS_EVENTS for p in payloads):
+            analytics_cache.invalidate()
+
+        message = build_frame(ticket_id, payloads)
+        messages.append((ticket_id, ticket_group(ticket_id), message))
+
+        for payload in payloads:
+            if payload.get("type") != "ticket.assigned":
+                continue
+            queue_message = {"type": "queue.event", "payload": payload, "text": json.dumps(payload)}
+            for agent_id in {payload.get("assigned_agent"), payload.get("previous_agent")}:
+                if agent_id is not None:
+                    messages.append((ticket_id, agent_queue_group(agent_id), queue_message))
+
+    if not messages:
+        return {}
+    failures = async_to_sync(_send_all)(messages)
+    metrics.incr("realtime.events", event_count)
+    metrics.incr("realtime.frames", sum(1 for _, group, _ in messages if group.startswith("ticket_")))
+    return failures
+
+
+def send_user_event(user_id: int, payload: dict) -> None:
+    """Push ``payload`` to every socket of one user. Not logged for replay."""
+    message = {"type": "user.event", "payload": payload, "text": json.dumps(payload)}
+    async_to_sync(get_channel_layer().group_send)(user_group(user_id), message)
@@ -0,0 +1,243 @@
+from collections import defaultdict, namedtuple
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, FloatField, Min, Sum
+from django.db.models.functions import Extract, TruncDate
+from django.utils import timezone
+
+from tickets.models import Ticket, TicketDailyStats, TicketRollupState
+
+TicketState = namedtuple("TicketState", ["created_at", "closed_at", "status", "priority"])
+
+# Arbitrary constant for pg_advisory_xact_lock: ticket writers hold it shared while
+# applying deltas, rebuild_days holds it exclusively while re-deriving days.
+_ROLLUP_LOCK_ID = 7305_0003
+
+
+def _lock_rollup(exclusive: bool = False) -> None:
+    function = "pg_advisory_xact_lock" if exclusive else "pg_advisory_xact_lock_shared"
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT {function}(%s)", [_ROLLUP_LOCK_ID])
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def rolled_up_through():
+    """Last day the rollup is complete for, or None if no day is."""
+    return TicketRollupState.objects.filter(pk=1).values_list("rolled_up_through", flat=True).first()
+
+
+def _boundary(through):
+    return day_start(through + timedelta(days=1)) if through is not None else None
+
+
+def rollup_boundary():
+    """Start of the first day not covered by the rollup (None: read everything live).
+
+    Everything before it is read from TicketDailyStats, everything from it on
+    from the tickets table, so a day is never missing while the beat rollup
+    catches up after midnight (or while beat is down).
+    """
+    return _boundary(rolled_up_through())
+
+
+def snapshot(ticket):
+    if ticket is None:
+        return None
+    return TicketState(ticket.created_at, ticket.closed_at, ticket.status, ticket.priority)
+
+
+def _contributions(state, boundary):
+    if state is None or boundary is None:
+        return
+    if state.created_at is not None and state.created_at < boundary:
+        day = timezone.localdate(state.created_at)
+        yield (day, state.status, state.priority), {"created_count": 1}
+    if state.closed_at is not None and state.closed_at < boundary:
+        day = timezone.localdate(state.closed_at)
+        seconds = int((state.closed_at - state.created_at).total_seconds()) if state.created_at else 0
+        yield (day, state.status, state.priority), {"closed_count": 1, "resolution_seconds": seconds}
+
+
+def apply_changes(changes) -> None:
+    """Move rollup counts for tickets that changed state.
+
+    ``changes`` is an iterable of ``(before, after)`` snapshots (either may be
+    None for create/delete). Only rolled-up days are touched; later days are
+    read live. Call inside the transaction that writes the tickets.
+    """
+    changes = [(before, after) for before, after in changes if before != after]
+    if not changes:
+        return
+    # Shared: writers do not wait for each other, only for a running rebuild
+    # (and a rebuild waits for them to commit, so it sees their tickets).
+    _lock_rollup()
+    boundary = rollup_boundary()
+    deltas = defaultdict(lambda: defaultdict(int))
+    for before, after in changes:
+        for key, values in _contributions(before, boundary):
+            for field, value in values.items():
+                deltas[key][field] -= value
+        for key, values in _contributions(after, boundary):
+            for field, value in values.items():
+                deltas[key][field] += value
+
+    # One global lock order, so concurrent opposite transitions cannot deadlock.
+    for (day, status, priority), fields in sorted(deltas.items()):
+        fields = {k: v for k, v in fields.items() if v}
+        if not fields:
+            continue
+        TicketDailyStats.objects.get_or_create(day=day, status=status, priority=priority)
+        TicketDailyStats.objects.filter(day=day, status=status, priority=priority).update(
+            **{field: F(field) + value for field, value in fields.items()}
+        )
+
+
+def _resolution_seconds():
+    duration = ExpressionWrapper(F("closed_at") - F("created_at"), output_field=DurationField())
+    return Sum(Extract(duration, "epoch"), output_field=FloatField())
+
+
+def rebuild_days(start_day, end_day) -> int:
+    """Recompute rollup rows for days in ``[start_day, end_day)`` from the tickets table.
+
+    Ticket writers' deltas wait while this runs, so keep ranges short (the
+    management command rebuilds a chunk of days per call).
+    """
+    end_day = min(end_day, timezone.localdate())
+    if start_day >= end_day:
+        return 0
+
+    with transaction.atomic():
+        # Exclusive, and taken before reading: a delta committed between the read
+        # and the delete below would otherwise be overwritten and lost.
+        _lock_rollup(exclusive=True)
+        rows = _derive_rows(day_start(start_day), day_start(end_day))
+        first = Ticket.objects.aggregate(first=Min("created_at"))["first"]
+        TicketDailyStats.objects.filter(day__gte=start_day, day__lt=end_day).delete()
+        TicketDailyStats.objects.bulk_create(
+            [
+                TicketDailyStats(day=day, status=status, priority=priority, **values)
+                for (day, status, priority), values in rows.items()
+            ]
+        )
+        # Advance the watermark only over a contiguous range, so no day in between is skipped.
+        state, _ = TicketRollupState.objects.select_for_update().get_or_create(pk=1)
+        through = state.rolled_up_through
+        if through is None:
+            contiguous = first is None or start_day <= timezone.localdate(first)
+        else:
+            contiguous = start_day <= through + timedelta(days=1)
+        last_day = end_day - timedelta(days=1)
+        if contiguous and (through is None or last_day > through):
+            state.rolled_up_through = last_day
+            state.save(update_fields=["rolled_up_through"])
+    return len(rows)
+
+
+def _derive_rows(start, end) -> dict:
+    rows = defaultdict(dict)
+
+    created = (
+        Ticket.objects.filter(created_at__gte=start, created_at__lt=end)
+        .annotate(day=TruncDate("created_at"))
+        .values("day", "status", "priority")
+        .annotate(c=Count("id"))
+        .order_by()
+    )
+    for r in created:
+        rows[(r["day"], r["status"], r["priority"])]["created_count"] = r["c"]
+
+    closed = (
+        Ticket.objects.filter(closed_at__gte=start, closed_at__lt=end)
+        .annotate(day=TruncDate("closed_at"))
+        .values("day", "status", "priority")
+        .annotate(c=Count("id"), secs=_resolution_seconds())
+        .order_by()
+    )
+    for r in closed:
+        key = (r["day"], r["status"], r["priority"])
+        rows[key]["closed_count"] = r["c"]
+        rows[key]["resolution_seconds"] = int(r["secs"] or 0)
+    return rows
+
+
+def _rolled_up_rows(through):
+    # Rows past the watermark (e.g. from a partial --days rebuild) are not trusted yet.
+    if through is None:
+        return TicketDailyStats.objects.none()
+    return TicketDailyStats.objects.filter(day__lte=through)
+
+
+def _live_tickets(field, boundary):
+    if boundary is None:
+        return Ticket.objects.all()
+    return Ticket.objects.filter(**{f"{field}__gte": boundary})
+
+
+def status_counts() -> dict:
+    through = rolled_up_through()
+    counts = defaultdict(int)
+    for status, c in (
+        _rolled_up_rows(through).values("status").annotate(c=Sum("created_count")).values_list("status", "c")
+    ):
+        counts[status] += int(c or 0)
+    live = _live_tickets("created_at", _boundary(through))
+    for status, c in live.values("status").annotate(c=Count("id")).values_list("status", "c"):
+        counts[status] += int(c)
+    return {k: v for k, v in counts.items() if v}
+
+
+def daily_volume(start) -> list:
+    """Tickets created per day since ``start`` (a datetime), oldest first."""
+    through = rolled_up_through()
+    boundary = _boundary(through)
+    counts = defaultdict(int)
+    rows = (
+        _rolled_up_rows(through)
+        .filter(day__gte=timezone.localdate(start))
+        .values("day")
+        .annotate(c=Sum("created_count"))
+        .values_list("day", "c")
+    )
+    for day, c in rows:
+        if c:
+            counts[day] += int(c)
+
+    live = (
+        Ticket.objects.filter(created_at__gte=max(start, boundary) if boundary is not None else start)
+        .annotate(day=TruncDate("created_at"))
+        .values("day")
+        .annotate(c=Count("id"))
+        .values_list("day", "c")
+    )
+    for day, c in live:
+        counts[day] += int(c)
+    return sorted(counts.items())
+
+
+def resolution_totals() -> tuple[int, int]:
+    """Returns ``(closed_count, total_resolution_seconds)`` across all time."""
+    through = rolled_up_through()
+    agg = _rolled_up_rows(through).aggregate(c=Sum("closed_count"), secs=Sum("resolution_seconds"))
+    live = (
+        _live_tickets("closed_at", _boundary(through))
+        .filter(closed_at__isnull=False)
+        .aggregate(c=Count("id"), secs=_resolution_seconds())
+    )
+    count = int(agg["c"] or 0) + int(live["c"] or 0)
+    seconds = int(agg["secs"] or 0) + int(live["secs"] or 0)
+    return count, seconds
+
+
+def rollup_recent(days: int = 2) -> int:
+    """Re-derive the last ``days`` complete days, plus any days the watermark has fallen behind on."""
+    today = timezone.localdate()
+    start = today - timedelta(days=days)
+    through = rolled_up_through()
+    if through is not None:
+        start = min(start, through + timedelta(days=1))
+    return rebuild_days(start, today)
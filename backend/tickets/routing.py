@@ -1,7 +1,8 @@
 from django.urls import re_path
 
-from tickets.consumers import TicketConsumer
+from tickets.consumers import TicketConsumer, TicketStreamConsumer
 
 websocket_urlpatterns = [
     re_path(r"^ws/tickets/(?P<ticket_id>\d+)/$", TicketConsumer.as_asgi()),
+    re_path(r"^ws/stream/$", TicketStreamConsumer.as_asgi()),
 ]
@@ -0,0 +1,68 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import CombinedSearchVector, SearchVector, SearchVectorField
+from django.db.models import F, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Cast, Coalesce
+
+from accounts.models import UserProfile
+from tickets.models import Ticket, TicketMessage
+
+PUBLIC_FIELD = "search_vector_public"
+INTERNAL_FIELD = "search_vector_internal"
+SEARCH_VECTOR_FIELDS = (PUBLIC_FIELD, INTERNAL_FIELD)
+
+
+def _messages_text(include_internal: bool):
+    qs = TicketMessage.objects.filter(ticket_id=OuterRef("pk"))
+    if not include_internal:
+        qs = qs.filter(is_internal=False)
+    qs = (
+        qs.order_by()
+        .values("ticket_id")
+        .annotate(text=StringAgg("body", delimiter=" ", output_field=TextField()))
+        .values("text")
+    )
+    return Subquery(qs, output_field=TextField())
+
+
+def _document(include_internal: bool):
+    return (
+        SearchVector("subject", weight="A")
+        + SearchVector("description", weight="B")
+        + SearchVector(_messages_text(include_internal), weight="C")
+    )
+
+
+def rebuild_search_vectors(ticket_ids) -> int:
+    """Recompute both search documents for the given tickets from scratch."""
+    return Ticket.objects.filter(id__in=list(ticket_ids)).update(
+        search_vector_public=_document(include_internal=False),
+        search_vector_internal=_document(include_internal=True),
+    )
+
+
+def _append(field: str, body: str):
+    current = Coalesce(F(field), Cast(Value(""), output_field=SearchVectorField()))
+    return CombinedSearchVector(
+        current,
+        SearchVector.ADD,
+        SearchVector(Value(body, output_field=TextField()), weight="C"),
+        None,
+    )
+
+
+def append_message(message: TicketMessage) -> int:
+    """Fold a newly written message into its ticket's documents without re-reading the thread."""
+    body = message.body or ""
+    if not body.strip():
+        return 0
+
+    updates = {INTERNAL_FIELD: _append(INTERNAL_FIELD, body)}
+    if not message.is_internal:
+        updates[PUBLIC_FIELD] = _append(PUBLIC_FIELD, body)
+    return Ticket.objects.filter(id=message.ticket_id).update(**updates)
+
+
+def search_field_for_role(role: str) -> str:
+    if role in {UserProfile.Role.AGENT, UserProfile.Role.ADMIN}:
+        return INTERNAL_FIELD
+    return PUBLIC_FIELD
@@ -1,5 +1,7 @@
 from rest_framework import serializers
 
+from accounts.models import UserProfile
+from accounts.utils import get_user_role
 from tickets.models import Attachment, Ticket, TicketMessage
 
 
@@ -21,6 +23,16 @@ class TicketSerializer(serializers.ModelSerializer):
         except Exception:
             return None
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Customers get the public thread's counters so internal notes stay invisible;
+        # without a request in the context, assume the least privileged reader.
+        request = self.context.get("request")
+        if get_user_role(getattr(request, "user", None)) == UserProfile.Role.CUSTOMER:
+            data["message_count"] = instance.public_message_count
+            data["last_message_at"] = self.fields["last_message_at"].to_representation(instance.last_public_message_at)
+        return data
+
     class Meta:
         model = Ticket
         fields = [
@@ -36,6 +48,7 @@ class TicketSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
             "last_message_at",
+            "message_count",
             "closed_at",
         ]
         read_only_fields = [
@@ -47,6 +60,7 @@ class TicketSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
             "last_message_at",
+            "message_count",
             "closed_at",
         ]
 
@@ -58,7 +72,9 @@ class TicketMessageSerializer(serializers.ModelSerializer):
         qs = getattr(obj, "attachments", None)
         if qs is None:
             return []
-        return AttachmentSerializer(qs.all().order_by("id"), many=True, context=self.context).data
+        # Sort in Python so a prefetched ``attachments`` cache is reused instead of re-queried.
+        items = sorted(qs.all(), key=lambda a: a.id)
+        return AttachmentSerializer(items, many=True, context=self.context).data
 
     class Meta:
         model = TicketMessage
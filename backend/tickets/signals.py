@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from tickets import similarity, ws_access
+from tickets.models import Ticket, TicketMessage
+from tickets.search import append_message, rebuild_search_vectors
+
+_SEARCHABLE_TICKET_FIELDS = {"subject", "description"}
+
+
+@receiver(post_save, sender=Ticket)
+def refresh_ticket_search(sender, instance, created, update_fields=None, **kwargs):
+    if not created and update_fields is not None and not (_SEARCHABLE_TICKET_FIELDS & set(update_fields)):
+        return
+    rebuild_search_vectors([instance.id])
+
+
+@receiver(post_save, sender=TicketMessage)
+def index_ticket_message(sender, instance, created, **kwargs):
+    if created:
+        append_message(instance)
+    else:
+        rebuild_search_vectors([instance.ticket_id])
+
+
+def _recount_thread(message):
+    # Edits and deletes (e.g. through the admin) change the thread without adding
+    # a message: recount it and move the stamps so the thread ETags change. The
+    # public stamp only moves when the customer-visible thread did.
+    now = timezone.now()
+    thread = TicketMessage.objects.filter(ticket_id=OuterRef("pk")).order_by().values("ticket_id")
+    total = Coalesce(Subquery(thread.annotate(c=Count("id")).values("c")), 0)
+    public = Coalesce(Subquery(thread.filter(is_internal=False).annotate(c=Count("id")).values("c")), 0)
+    if message.is_internal:
+        public_stamp = Case(When(~Q(public_message_count=public), then=Value(now)), default=F("last_public_message_at"))
+    else:
+        public_stamp = Value(now)
+    Ticket.objects.filter(pk=message.ticket_id).update(
+        message_count=total,
+        public_message_count=public,
+        last_message_at=now,
+        last_public_message_at=public_stamp,
+        updated_at=now,
+    )
+
+
+@receiver(post_save, sender=TicketMessage)
+def recount_edited_thread(sender, instance, created, **kwargs):
+    # New messages are counted by the messages endpoint in the same transaction.
+    if not created:
+        _recount_thread(instance)
+
+
+@receiver(post_delete, sender=TicketMessage)
+def recount_pruned_thread(sender, instance, origin=None, **kwargs):
+    # Nothing to keep in sync when the whole ticket is being deleted.
+    if isinstance(origin, Ticket) or getattr(origin, "model", None) is Ticket:
+        return
+    _recount_thread(instance)
+
+
+@receiver(post_delete, sender=Ticket)
+def forget_similar_ticket(sender, instance, **kwargs):
+    similarity.forget_ticket(instance.id)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_stream_access(sender, instance, created, update_fields=None, **kwargs):
+    # Logins save last_login only; anything else may have toggled is_active.
+    if created or (update_fields is not None and "is_active" not in update_fields):
+        return
+    user_id = instance.pk
+    transaction.on_commit(lambda: ws_access.invalidate_user(user_id))
@@ -0,0 +1,486 @@
+# "Similar resolved tickets" index, CPU only. Each RESOLVED/CLOSED ticket
+# (subject, description, public messages) becomes a hashed bag-of-words vector:
+# unigrams and bigrams hashed into SIMILAR_INDEX_DIM signed buckets, sublinear
+# tf, L2-normalised, so a dot product is the cosine similarity. Vectors live in a
+# float32 matrix memory-mapped from SIMILAR_INDEX_DIR, so every process shares the
+# OS page cache. Large indexes add an inverted-file layer (see SimilarityIndex)
+# so a query scores a few thousand rows instead of all of them.
+#
+# update_index() applies ticket changes incrementally from an updated_at
+# watermark (Celery beat); a Postgres advisory lock keeps it to one writer.
+# Rows are appended or overwritten in place and meta.json (row count,
+# watermark) is replaced atomically last, so readers never see a row before
+# it is written; meta.json is only rewritten when something changed, since
+# every rewrite makes readers reopen the index. Tickets that leave
+# RESOLVED/CLOSED, or are deleted, are tombstoned (id 0); once tombstones pass
+# SIMILAR_INDEX_COMPACT_RATIO the live rows are copied into a new generation
+# of files.
+
+import json
+import math
+import os
+import re
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery, TextField
+from django.utils import timezone
+
+from tickets.models import Ticket, TicketMessage
+
+INDEXED_STATUSES = (Ticket.Status.RESOLVED, Ticket.Status.CLOSED)
+
+VECTORS_FILE = "vectors.f32"
+IDS_FILE = "ids.i64"
+LISTS_FILE = "lists.i32"
+CENTROIDS_FILE = "centroids.f32"
+META_FILE = "meta.json"
+
+# Arbitrary constant for pg_try_advisory_lock: one index writer at a time.
+_WRITE_LOCK_ID = 7305_0002
+
+# Rows added per file growth step.
+_GROW_ROWS = 65536
+
+_TOKEN_RE = re.compile(r"[a-z0-9]{2,}")
+_STOPWORDS = frozenset(
+    "the and for you your are was were this that with have has had not but can could would should will "
+    "from they them their there here what when where which who how all any our out get got just also been "
+    "into its it's is it to of in on at by or as be we me my an a i do does did so if no yes hi hello thanks thank please".split()
+)
+
+
+def _dim() -> int:
+    return int(getattr(settings, "SIMILAR_INDEX_DIM", 256))
+
+
+def index_dir() -> Path:
+    return Path(getattr(settings, "SIMILAR_INDEX_DIR", Path(settings.BASE_DIR) / "var" / "similar_index"))
+
+
+def _features(text: str) -> dict:
+    tokens = [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+    counts = {}
+    for i, token in enumerate(tokens):
+        counts[token] = counts.get(token, 0) + 1
+        if i:
+            bigram = tokens[i - 1] + " " + token
+            counts[bigram] = counts.get(bigram, 0) + 1
+    return counts
+
+
+def vectorize(texts, dim: int | None = None) -> np.ndarray:
+    """Hashed, L2-normalised vectors for ``texts`` (one row per text; all-zero for empty text)."""
+    dim = dim or _dim()
+    out = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for feature, count in _features(text or "").items():
+            # crc32, not hash(): the bucket must be stable across processes and restarts.
+            h = zlib.crc32(feature.encode())
+            out[row, h % dim] += (1.0 + math.log(count)) * (1.0 if h & 0x80000000 else -1.0)
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    np.divide(out, norms, out=out, where=norms > 0)
+    return out
+
+
+def _public_messages_text():
+    qs = (
+        TicketMessage.objects.filter(ticket_id=OuterRef("pk"), is_internal=False)
+        .order_by()
+        .values("ticket_id")
+        .annotate(text=StringAgg("body", delimiter="\n", ordering="id", output_field=TextField()))
+        .values("text")
+    )
+    return Subquery(qs, output_field=TextField())
+
+
+def ticket_texts(ticket_ids) -> dict:
+    """``{ticket_id: document}`` for indexing or querying, in one query."""
+    max_chars = int(getattr(settings, "SIMILAR_INDEX_MAX_CHARS", 20000))
+    rows = (
+        Ticket.objects.filter(id__in=list(ticket_ids))
+        .annotate(messages_text=_public_messages_text())
+        .values_list("id", "subject", "description", "messages_text")
+    )
+    # The subject is repeated to weigh it like the title it is.
+    return {
+        ticket_id: f"{subject}\n{subject}\n{description or ''}\n{messages or ''}"[:max_chars]
+        for ticket_id, subject, description, messages in rows
+    }
+
+
+def _nlists() -> int:
+    return max(1, int(getattr(settings, "SIMILAR_INDEX_LISTS", 1024)))
+
+
+def _nprobe() -> int:
+    return max(1, int(getattr(settings, "SIMILAR_INDEX_NPROBE", 16)))
+
+
+def _spherical_kmeans(sample: np.ndarray, k: int, rng, iterations: int = 10) -> np.ndarray:
+    centroids = sample[rng.choice(len(sample), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = np.flatnonzero(~sums.any(axis=1))
+        sums[empty] = sample[rng.choice(len(sample), size=len(empty))]
+        centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True).clip(min=1e-12)
+    return centroids.astype(np.float32)
+
+
+class SimilarityIndex:
+    """The on-disk index in ``path``. Writers must hold the advisory lock (see update_index).
+
+    Small indexes are searched exhaustively. Once there are ``40 x SIMILAR_INDEX_LISTS``
+    rows, spherical k-means centroids are trained and every row is assigned to its
+    nearest centroid (an inverted-file index); a query then scores only the rows of
+    the SIMILAR_INDEX_NPROBE closest lists, so its cost no longer grows with the corpus.
+    A --full rebuild retrains the centroids.
+    """
+
+    FILES = (VECTORS_FILE, IDS_FILE, LISTS_FILE)
+
+    def __init__(self, path: Path, dim: int, writable: bool = False):
+        self.path = Path(path)
+        self.dim = dim
+        self.writable = writable
+        self.meta = self._read_meta()
+        if self.meta.get("dim") != dim:
+            if not writable:
+                raise FileNotFoundError(f"No index with dim {dim} in {self.path}")
+            self._reset()
+        self._map()
+
+    def _file(self, name: str) -> Path:
+        # Compaction and resets write a new generation of files, so a reader
+        # always maps the set named by the meta.json it read.
+        generation = int(self.meta.get("generation") or 0)
+        return self.path / (f"{name}.{generation}" if generation else name)
+
+    def _files(self) -> list[Path]:
+        return [self._file(name) for name in self.FILES]
+
+    def _read_meta(self) -> dict:
+        try:
+            with open(self.path / META_FILE) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _reset(self) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        old = self._files()
+        generation = int(self.meta.get("generation") or 0) + 1
+        self.meta = {"dim": self.dim, "count": 0, "watermark": None, "lists": 0, "generation": generation}
+        for path in self._files():
+            with open(path, "wb"):
+                pass
+        self.save_meta()
+        # Readers still mapping the old files keep them until they reopen.
+        for path in old:
+            path.unlink(missing_ok=True)
+
+    def _map(self) -> None:
+        mode = "r+" if self.writable else "r"
+        rows = os.path.getsize(self._file(IDS_FILE)) // 8
+        self.capacity = rows
+        self._inverted = None
+        if rows == 0:
+            self.ids = np.zeros(0, dtype=np.int64)
+            self.lists = np.zeros(0, dtype=np.int32)
+            self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+        else:
+            self.ids = np.memmap(self._file(IDS_FILE), dtype=np.int64, mode=mode, shape=(rows,))
+            self.lists = np.memmap(self._file(LISTS_FILE), dtype=np.int32, mode=mode, shape=(rows,))
+            self.vectors = np.memmap(self._file(VECTORS_FILE), dtype=np.float32, mode=mode, shape=(rows, self.dim))
+        nlists = int(self.meta.get("lists") or 0)
+        self.centroids = None
+        if nlists:
+            self.centroids = np.fromfile(self.path / CENTROIDS_FILE, dtype=np.float32).reshape(nlists, self.dim)
+
+    @property
+    def count(self) -> int:
+        return int(self.meta.get("count", 0))
+
+    def _ensure_capacity(self, rows: int) -> None:
+        if rows <= self.capacity:
+            return
+        new_rows = max(rows, self.capacity + _GROW_ROWS, int(self.capacity * 1.5))
+        self.flush()
+        # Growing a file never invalidates existing maps of its first bytes.
+        os.truncate(self._file(IDS_FILE), new_rows * 8)
+        os.truncate(self._file(LISTS_FILE), new_rows * 4)
+        os.truncate(self._file(VECTORS_FILE), new_rows * self.dim * 4)
+        self._map()
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        out = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), _GROW_ROWS):
+            chunk = np.asarray(vectors[start : start + _GROW_ROWS])
+            out[start : start + len(chunk)] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return out
+
+    def _maybe_train(self) -> None:
+        nlists = _nlists()
+        count = self.count
+        if self.centroids is not None or count < nlists * 40:
+            return
+        # Count live rows, not appended ones: tombstones do not train.
+        live = np.flatnonzero(self.ids[:count] != 0)
+        if len(live) < nlists * 40:
+            return
+        rng = np.random.default_rng(0)
+        sample = np.asarray(self.vectors[np.sort(rng.choice(live, size=min(len(live), nlists * 64), replace=False))])
+        self.centroids = _spherical_kmeans(sample, nlists, rng)
+        self.lists[:count] = self._assign(self.vectors[:count])
+        tmp = self.path / f"{CENTROIDS_FILE}.tmp"
+        self.centroids.tofile(tmp)
+        os.replace(tmp, self.path / CENTROIDS_FILE)
+        self.meta["lists"] = nlists
+
+    def upsert(self, ticket_ids, vectors: np.ndarray) -> int:
+        """Write ``vectors`` for ``ticket_ids``. Returns the rows that were new or differed."""
+        ticket_ids = np.asarray(ticket_ids, dtype=np.int64)
+        if not len(ticket_ids):
+            return 0
+        count = self.count
+        existing = np.flatnonzero(np.isin(self.ids[:count], ticket_ids))
+        row_of = dict(zip(self.ids[existing].tolist(), existing.tolist()))
+        rows = np.empty(len(ticket_ids), dtype=np.int64)
+        next_row = count
+        for i, t in enumerate(ticket_ids.tolist()):
+            row = row_of.get(t)
+            if row is None:
+                row, next_row = next_row, next_row + 1
+            rows[i] = row
+        # Re-indexed but unchanged tickets (the update overlap window) are not rewritten.
+        changed = rows >= count
+        changed[~changed] = ~np.all(np.asarray(self.vectors[rows[~changed]]) == vectors[~changed], axis=1)
+        if not changed.any():
+            return 0
+        rows, ticket_ids, vectors = rows[changed], ticket_ids[changed], vectors[changed]
+        self._ensure_capacity(next_row)
+        self.vectors[rows] = vectors
+        if self.centroids is not None:
+            self.lists[rows] = self._assign(vectors)
+        self.ids[rows] = ticket_ids
+        self.meta["count"] = next_row
+        self._maybe_train()
+        return len(rows)
+
+    def remove(self, ticket_ids) -> int:
+        count = self.count
+        rows = np.flatnonzero(np.isin(self.ids[:count], np.asarray(list(ticket_ids), dtype=np.int64)))
+        self.ids[rows] = 0
+        self.vectors[rows] = 0
+        return len(rows)
+
+    def tombstones(self) -> int:
+        return int(np.count_nonzero(self.ids[: self.count] == 0))
+
+    def compact(self) -> int:
+        """Copy the live rows into a new file generation and switch meta.json to it. Returns rows dropped."""
+        count = self.count
+        live = np.flatnonzero(self.ids[:count] != 0)
+        old = self._files()
+        self.flush()
+        self.meta["generation"] = int(self.meta.get("generation") or 0) + 1
+        self.meta["count"] = len(live)
+        np.asarray(self.ids[live]).tofile(self._file(IDS_FILE))
+        np.asarray(self.lists[live]).tofile(self._file(LISTS_FILE))
+        with open(self._file(VECTORS_FILE), "wb") as f:
+            for start in range(0, len(live), _GROW_ROWS):
+                np.asarray(self.vectors[live[start : start + _GROW_ROWS]]).tofile(f)
+        self._map()
+        self.save_meta()
+        for path in old:
+            path.unlink(missing_ok=True)
+        return count - len(live)
+
+    def flush(self) -> None:
+        for array in (self.ids, self.lists, self.vectors):
+            if isinstance(array, np.memmap):
+                array.flush()
+
+    def save_meta(self) -> None:
+        tmp = self.path / f"{META_FILE}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self.path / META_FILE)
+
+    def _candidate_rows(self, vector: np.ndarray):
+        """Rows to score: everything, or the members of the lists nearest to ``vector``."""
+        count = self.count
+        if self.centroids is None:
+            return slice(0, count)
+        if self._inverted is None:
+            # Rows grouped by list, computed once per reader (the index changes only on meta updates).
+            order = np.argsort(self.lists[:count], kind="stable")
+            bounds = np.searchsorted(self.lists[:count][order], np.arange(len(self.centroids) + 1))
+            self._inverted = (order, bounds)
+        order, bounds = self._inverted
+        nprobe = min(_nprobe(), len(self.centroids))
+        probes = np.argpartition(-(self.centroids @ vector), nprobe - 1)[:nprobe]
+        rows = np.concatenate([order[bounds[p] : bounds[p + 1]] for p in probes])
+        rows.sort()  # read the memory map front to back
+        return rows
+
+    def search(self, vector: np.ndarray, k: int, exclude=()) -> list[tuple[int, float]]:
+        if self.count == 0 or k <= 0 or not vector.any():
+            return []
+        rows = self._candidate_rows(vector)
+        ids = np.asarray(self.ids[rows])
+        if not len(ids):
+            return []
+        scores = np.asarray(self.vectors[rows]) @ vector
+        scores[ids == 0] = -1.0
+        if exclude:
+            scores[np.isin(ids, np.asarray(list(exclude), dtype=np.int64))] = -1.0
+        k = min(k, len(ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+
+_reader = None
+_reader_key = None
+
+
+def get_reader() -> SimilarityIndex | None:
+    """A read-only view of the index, re-opened when the writer replaces meta.json."""
+    global _reader, _reader_key
+    path = index_dir()
+    try:
+        stat = os.stat(path / META_FILE)
+    except OSError:
+        return None
+    key = (str(path), stat.st_ino, stat.st_mtime_ns)
+    if _reader is None or _reader_key != key:
+        try:
+            _reader = SimilarityIndex(path, _dim())
+        except (OSError, ValueError):
+            return None
+        _reader_key = key
+    return _reader
+
+
+def similar_tickets(ticket, k: int = 5) -> list[tuple[int, float]]:
+    """Top ``k`` indexed tickets most similar to ``ticket`` as ``(ticket_id, score)``, best first."""
+    index = get_reader()
+    if index is None:
+        return []
+    text = ticket_texts([ticket.id]).get(ticket.id, "")
+    min_score = float(getattr(settings, "SIMILAR_MIN_SCORE", 0.05))
+    hits = index.search(vectorize([text], index.dim)[0], k, exclude=[ticket.id])
+    return [(ticket_id, score) for ticket_id, score in hits if score >= min_score]
+
+
+def _apply(index: SimilarityIndex, changed) -> int:
+    """Index or tombstone ``(ticket_id, status)`` pairs. Returns rows actually written."""
+    indexed = [ticket_id for ticket_id, status in changed if status in INDEXED_STATUSES]
+    others = [ticket_id for ticket_id, status in changed if status not in INDEXED_STATUSES]
+    written = 0
+    if others:
+        written += index.remove(others)
+    if indexed:
+        texts = ticket_texts(indexed)
+        indexed = [t for t in indexed if t in texts]
+        written += index.upsert(indexed, vectorize([texts[t] for t in indexed], index.dim))
+    return written
+
+
+def _maybe_compact(index: SimilarityIndex) -> None:
+    ratio = float(getattr(settings, "SIMILAR_INDEX_COMPACT_RATIO", 0.2))
+    if ratio > 0 and index.count and index.tombstones() > ratio * index.count:
+        index.compact()
+
+
+@contextmanager
+def _write_lock():
+    """Yield True while holding the index writer lock, or False if another writer has it."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [_WRITE_LOCK_ID])
+        if not cursor.fetchone()[0]:
+            yield False
+            return
+    try:
+        yield True
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [_WRITE_LOCK_ID])
+
+
+def remove_tickets(ticket_ids) -> int | None:
+    """Tombstone ``ticket_ids``. Returns rows removed, or None if another writer runs."""
+    if not (index_dir() / META_FILE).exists():
+        return 0
+    with _write_lock() as locked:
+        if not locked:
+            return None
+        index = SimilarityIndex(index_dir(), _dim(), writable=True)
+        removed = index.remove(ticket_ids)
+        if removed:
+            index.flush()
+            index.save_meta()
+        return removed
+
+
+def forget_ticket(ticket_id: int) -> None:
+    """post_delete hook: a deleted ticket has no updated_at left for update_index() to see."""
+    if not (index_dir() / META_FILE).exists():
+        return
+    from tickets.tasks import remove_from_similarity_index
+
+    transaction.on_commit(lambda: remove_from_similarity_index.delay([ticket_id]))
+
+
+def update_index(batch_size: int = 1000, rebuild: bool = False) -> int | None:
+    """Apply ticket changes since the last run. Returns tickets processed, or None if another writer runs."""
+    with _write_lock() as locked:
+        if not locked:
+            return None
+        index = SimilarityIndex(index_dir(), _dim(), writable=True)
+        if rebuild and index.count:
+            index._reset()
+            index._map()
+
+        watermark = index.meta.get("watermark")
+        newest = datetime.fromisoformat(watermark) if watermark else None
+        qs = Ticket.objects.order_by("updated_at", "id")
+        if newest is not None:
+            # Re-read a short window: a transaction may commit after a later one
+            # with an earlier updated_at. Re-indexing a ticket is idempotent.
+            overlap = timedelta(seconds=float(getattr(settings, "SIMILAR_INDEX_OVERLAP", 300)))
+            qs = qs.filter(updated_at__gte=newest - overlap)
+
+        total = 0
+        last = None
+        while True:
+            page = qs
+            if last is not None:
+                page = page.filter(updated_at__gte=last[0]).exclude(updated_at=last[0], id__lte=last[1])
+            rows = list(page.values_list("id", "status", "updated_at")[:batch_size])
+            if not rows:
+                break
+            written = _apply(index, [(ticket_id, status) for ticket_id, status, _ in rows])
+            total += len(rows)
+            last = (rows[-1][2], rows[-1][0])
+            newest = max(newest, last[0]) if newest is not None else last[0]
+            # Most runs only re-read the overlap window: leave meta.json (and the readers) alone.
+            if written or newest.isoformat() != index.meta.get("watermark"):
+                index.flush()
+                index.meta["watermark"] = newest.isoformat()
+                index.save_meta()
+
+        if index.meta.get("watermark") is None:
+            index.meta["watermark"] = (newest or timezone.now()).isoformat()
+            index.save_meta()
+        _maybe_compact(index)
+        return total
@@ -1,14 +1,26 @@
+import heapq
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
 from celery import shared_task
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
 from django.db import transaction
-from django.db.models import Count, Q
+from django.db.models import F, Min, Q
+from django.utils import timezone
+from redis.exceptions import RedisError
 
 from accounts.models import UserProfile
-from tickets.models import Ticket, TicketMessage
-from tickets.realtime import broadcast_ticket_event
+from core import mail_pool, metrics
+from tickets import agent_queue, ai_drafts, outbox, similarity, ws_access
+from tickets.agent_load import record_transition
+from tickets.models import OutboxEvent, PendingNotification, Ticket, TicketMessage
+from tickets.rollup import apply_changes as apply_rollup_changes, rollup_recent, snapshot
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 def _dedupe_emails(emails):
@@ -31,62 +43,31 @@ def send_email(self, subject: str, body: str, to_emails: list[str]):
     to_emails = _dedupe_emails(to_emails)
     if not to_emails:
         return True
-    send_mail(subject, body, None, to_emails, fail_silently=False)
+    mail_pool.send_messages([EmailMessage(subject, body, None, to_emails)])
     return True
 
 
-@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, retry_jitter=True, max_retries=3)
-def send_ticket_email(self, event_type: str, ticket_id: int, message_id: int | None = None, new_status: str | None = None):
-    try:
-        ticket = Ticket.objects.select_related("customer", "assigned_agent").get(id=ticket_id)
-    except Ticket.DoesNotExist:
-        return False
-
-    message = None
-    if message_id is not None:
-        try:
-            message = TicketMessage.objects.select_related("author").get(id=message_id)
-        except TicketMessage.DoesNotExist:
-            message = None
-
+def _customer_email(ticket) -> str:
     customer_email = getattr(ticket.customer, "email", "") if ticket.customer_id else ""
     if not customer_email and ticket.customer_id:
         # Some installs use username-as-email for customer accounts.
         u = getattr(ticket.customer, "username", "") or ""
         if "@" in u:
             customer_email = u
-    agent_email = getattr(ticket.assigned_agent, "email", "") if ticket.assigned_agent_id else ""
+    return customer_email
 
-    to_emails = []
-    if event_type == "ticket.message_created":
-        if message is None:
-            return False
-        if message.is_internal:
-            to_emails = [agent_email]
-        else:
-            to_emails = [customer_email, agent_email]
-    elif event_type == "ticket.status_changed":
-        to_emails = [customer_email, agent_email]
-    elif event_type == "ticket.assigned":
-        to_emails = [customer_email, agent_email]
-    else:
-        to_emails = [customer_email, agent_email]
 
-    to_emails = _dedupe_emails(to_emails)
-    if not to_emails:
-        return True
+def _ticket_email_recipients(ticket, event_type: str, message) -> list[str]:
+    customer_email = _customer_email(ticket)
+    agent_email = getattr(ticket.assigned_agent, "email", "") if ticket.assigned_agent_id else ""
 
-    subject = f"[Ticket #{ticket.id}] {ticket.subject}"
+    if event_type == "ticket.message_created" and message is not None and message.is_internal:
+        return _dedupe_emails([agent_email])
+    return _dedupe_emails([customer_email, agent_email])
 
-    lines = [
-        f"Ticket #{ticket.id}",
-        f"Subject: {ticket.subject}",
-        f"Status: {new_status or ticket.status}",
-        f"Priority: {ticket.priority}",
-        f"Event: {event_type}",
-        "",
-    ]
 
+def _event_lines(event_type: str, message) -> list[str]:
+    lines = [f"Event: {event_type}", ""]
     if message is not None:
         author = getattr(message.author, "username", None) or "unknown"
         lines += [
@@ -96,12 +77,139 @@ def send_ticket_email(self, event_type: str, ticket_id: int, message_id: int | N
             message.body,
             "",
         ]
+    return lines
+
+
+def _ticket_header(ticket, status: str | None) -> list[str]:
+    return [
+        f"Ticket #{ticket.id}",
+        f"Subject: {ticket.subject}",
+        f"Status: {status or ticket.status}",
+        f"Priority: {ticket.priority}",
+    ]
+
+
+def _digest_window() -> int:
+    return int(getattr(settings, "TICKET_EMAIL_DIGEST_WINDOW", 0))
 
-    body = "\n".join(lines)
-    send_email.delay(subject, body, to_emails)
+
+def _load_ticket_and_message(ticket_id: int, message_id: int | None):
+    """Fetch the ticket (and message, with its author) in a single query."""
+    if message_id is not None:
+        message = (
+            TicketMessage.objects.select_related("author", "ticket__customer", "ticket__assigned_agent")
+            .filter(id=message_id, ticket_id=ticket_id)
+            .first()
+        )
+        if message is not None:
+            return message.ticket, message
+
+    ticket = Ticket.objects.select_related("customer", "assigned_agent").filter(id=ticket_id).first()
+    return ticket, None
+
+
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, retry_jitter=True, max_retries=3)
+def send_ticket_email(self, event_type: str, ticket_id: int, message_id: int | None = None, new_status: str | None = None):
+    ticket, message = _load_ticket_and_message(ticket_id, message_id)
+    if ticket is None:
+        return False
+    if message is None and event_type == "ticket.message_created":
+        return False
+
+    to_emails = _ticket_email_recipients(ticket, event_type, message)
+    if not to_emails:
+        return True
+
+    if _digest_window() > 0:
+        PendingNotification.objects.bulk_create(
+            [
+                PendingNotification(
+                    recipient=email,
+                    ticket_id=ticket.id,
+                    message_id=message.id if message is not None else None,
+                    event_type=event_type,
+                    new_status=new_status or "",
+                )
+                for email in to_emails
+            ]
+        )
+        metrics.incr("email.events_buffered", len(to_emails))
+        return True
+
+    # Rendered and sent in this task; a retry re-renders from the current ticket state.
+    subject = f"[Ticket #{ticket.id}] {ticket.subject}"
+    body = "\n".join(_ticket_header(ticket, new_status) + _event_lines(event_type, message))
+    mail_pool.send_messages([EmailMessage(subject, body, None, to_emails)])
+    metrics.incr("email.events_sent_immediately", len(to_emails))
     return True
 
 
+def _render_digest(ticket, events) -> tuple[str, str]:
+    latest_status = next((e.new_status for e in reversed(events) if e.new_status), None)
+    if len(events) == 1:
+        subject = f"[Ticket #{ticket.id}] {ticket.subject}"
+    else:
+        subject = f"[Ticket #{ticket.id}] {ticket.subject} ({len(events)} updates)"
+
+    lines = _ticket_header(ticket, latest_status) + [""]
+    for event in events:
+        lines.append(f"--- {timezone.localtime(event.created_at):%Y-%m-%d %H:%M}")
+        lines += _event_lines(event.event_type, event.message)
+    return subject, "\n".join(lines)
+
+
+@shared_task
+def flush_ticket_email_digests(limit: int = 500) -> int:
+    """Send one email per (recipient, ticket) whose oldest buffered event is older than the window.
+
+    All digests in a flush go out over one pooled SMTP connection. Rows are
+    deleted in the same transaction, so a failed send leaves them for the next
+    flush; concurrent flushes skip each other's locked rows.
+    """
+    cutoff = timezone.now() - timedelta(seconds=max(0, _digest_window()))
+    ready = list(
+        PendingNotification.objects.values("recipient", "ticket_id")
+        .annotate(first=Min("created_at"))
+        .filter(first__lte=cutoff)
+        .order_by("first")
+        .values_list("recipient", "ticket_id")[:limit]
+    )
+    if not ready:
+        return 0
+
+    group_filter = Q()
+    for recipient, ticket_id in ready:
+        group_filter |= Q(recipient=recipient, ticket_id=ticket_id)
+
+    with transaction.atomic():
+        pending = list(
+            PendingNotification.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(group_filter)
+            .select_related("ticket", "message__author")
+            .order_by("created_at", "id")
+        )
+        if not pending:
+            return 0
+
+        groups = defaultdict(list)
+        for event in pending:
+            groups[(event.recipient, event.ticket_id)].append(event)
+
+        emails = []
+        for (recipient, _ticket_id), events in groups.items():
+            subject, body = _render_digest(events[0].ticket, events)
+            emails.append(EmailMessage(subject, body, None, [recipient]))
+
+        sent = mail_pool.send_messages(emails)
+
+        PendingNotification.objects.filter(id__in=[e.id for e in pending]).delete()
+
+    metrics.incr("email.digest_events", len(pending))
+    metrics.incr("email.digest_emails", sent)
+    logger.info("Flushed %s buffered ticket events into %s digest emails", len(pending), sent)
+    return sent
+
+
 @shared_task
 def assign_ticket(ticket_id: int) -> bool:
     try:
@@ -112,76 +220,166 @@ def assign_ticket(ticket_id: int) -> bool:
     if ticket.assigned_agent_id is not None:
         return True
 
-    with transaction.atomic():
-        ticket = Ticket.objects.select_for_update().get(id=ticket_id)
-        if ticket.assigned_agent_id is not None:
-            return True
-
-        # Count active assigned tickets per agent (exclude resolved/closed)
-        active_statuses = [
-            Ticket.Status.OPEN,
-            Ticket.Status.ASSIGNED,
-            Ticket.Status.IN_PROGRESS,
-            Ticket.Status.WAITING_ON_CUSTOMER,
-        ]
-
-        agent_qs = (
-            User.objects.filter(profile__role=UserProfile.Role.AGENT, profile__is_available=True)
-            .annotate(
-                active_count=Count(
-                    "assigned_tickets",
-                    filter=Q(assigned_tickets__status__in=active_statuses),
-                    distinct=True,
-                )
+    # A Redis reservation is only settled by the commit; release it on rollback.
+    reservation = []
+    try:
+        with transaction.atomic():
+            ticket = Ticket.objects.select_for_update().get(id=ticket_id)
+            if ticket.assigned_agent_id is not None:
+                return True
+
+            eligible = UserProfile.objects.filter(
+                role=UserProfile.Role.AGENT,
+                is_available=True,
+                active_count__lt=F("capacity"),
             )
-            .order_by("active_count", "id")
-        )
 
-        selected = None
-        for agent in agent_qs:
-            cap = getattr(getattr(agent, "profile", None), "capacity", 0) or 0
-            if agent.active_count < cap:
-                selected = agent
-                break
+            prof = None
+            if agent_queue.enabled():
+                try:
+                    reserved_id = agent_queue.reserve_agent()
+                except RedisError:
+                    logger.warning("Redis agent queue unavailable; using database selection", exc_info=True)
+                else:
+                    if reserved_id is not None:
+                        reservation.append(reserved_id)
+                        # Redis only proposes; the locked DB row still has the final say.
+                        prof = eligible.select_for_update().filter(user_id=reserved_id).first()
+                        if prof is None:
+                            agent_queue.release_agent(reservation.pop())
+                        else:
+                            agent_queue.schedule_sync([reserved_id])
+
+            if prof is None:
+                # Least-loaded agent under capacity, read from the denormalized counter.
+                # Profiles locked by a concurrent assignment are skipped, not waited on.
+                prof = eligible.select_for_update(skip_locked=True).order_by("active_count", "user_id").first()
+            if prof is None:
+                return False
+
+            prev = snapshot(ticket)
+            ticket.assigned_agent_id = prof.user_id
+            if ticket.status == Ticket.Status.OPEN:
+                ticket.status = Ticket.Status.ASSIGNED
+            ticket.save(update_fields=["assigned_agent", "status", "updated_at"])
+            record_transition(None, prev.status, prof.user_id, ticket.status)
+            apply_rollup_changes([(prev, snapshot(ticket))])
+            ws_access.schedule_invalidate(ticket.id, prof.user_id)
+
+            # prof.active_count was read before this assignment
+            if prof.active_count + 1 >= prof.capacity and prof.is_available:
+                prof.is_available = False
+                prof.save(update_fields=["is_available"])
+                agent_queue.schedule_sync([prof.user_id])
+
+            outbox.enqueue_many(_assigned_events(ticket.id, ticket.assigned_agent_id, ticket.status))
+    except Exception:
+        for agent_id in reservation:
+            agent_queue.release_agent(agent_id)
+        raise
+    return True
 
-        if selected is None:
-            return False
 
-        ticket.assigned_agent = selected
-        if ticket.status == Ticket.Status.OPEN:
-            ticket.status = Ticket.Status.ASSIGNED
-        ticket.save(update_fields=["assigned_agent", "status", "updated_at"])
-
-        try:
-            prof = getattr(selected, "profile", None)
-            if prof is not None:
-                cap = int(getattr(prof, "capacity", 0) or 0)
-                # selected.active_count was computed before assignment
-                if cap > 0 and (int(getattr(selected, "active_count", 0) or 0) + 1) >= cap:
-                    if prof.is_available:
-                        prof.is_available = False
-                        prof.save(update_fields=["is_available"])
-        except Exception:
-            pass
-
-        broadcast_ticket_event(
-            ticket.id,
-            {
+def _assigned_events(ticket_id, agent_id, ticket_status):
+    return [
+        OutboxEvent(
+            ticket_id=ticket_id,
+            kind=OutboxEvent.Kind.BROADCAST,
+            payload={
                 "type": "ticket.assigned",
-                "ticket_id": ticket.id,
-                "assigned_agent": ticket.assigned_agent_id,
-                "status": ticket.status,
+                "ticket_id": ticket_id,
+                "assigned_agent": agent_id,
+                "status": ticket_status,
             },
-        )
+        ),
+        OutboxEvent(
+            ticket_id=ticket_id,
+            kind=OutboxEvent.Kind.EMAIL,
+            payload={
+                "event_type": "ticket.assigned",
+                "ticket_id": ticket_id,
+                "message_id": None,
+                "new_status": ticket_status,
+            },
+        ),
+    ]
+
+
+@shared_task
+def assign_open_tickets_batch(limit: int = 50) -> int:
+    """Assign up to ``limit`` unassigned OPEN tickets in a single transaction.
+
+    Agent load is read once and tracked in a heap while the batch is handed
+    out, instead of re-running the aggregate query per ticket.
+    """
+    limit = max(1, int(limit))
 
-        send_ticket_email.delay(
-            "ticket.assigned",
-            ticket.id,
-            None,
-            ticket.status,
+    with transaction.atomic():
+        tickets = list(
+            Ticket.objects.select_for_update(skip_locked=True)
+            .filter(status=Ticket.Status.OPEN, assigned_agent__isnull=True)
+            .order_by("created_at", "id")[:limit]
         )
+        if not tickets:
+            return 0
+
+        profiles = list(
+            UserProfile.objects.select_for_update()
+            .filter(
+                role=UserProfile.Role.AGENT,
+                is_available=True,
+                active_count__lt=F("capacity"),
+            )
+            .order_by("user_id")
+        )
+        if not profiles:
+            return 0
+
+        heap = [(prof.active_count, prof.user_id, prof) for prof in profiles]
+        heapq.heapify(heap)
+
+        now = timezone.now()
+        assigned = []
+        touched = {}
+        rollup_changes = []
+        for ticket in tickets:
+            if not heap:
+                break
+            active, agent_id, prof = heapq.heappop(heap)
+            before = snapshot(ticket)
+            ticket.assigned_agent_id = agent_id
+            ticket.status = Ticket.Status.ASSIGNED
+            ticket.updated_at = now
+            assigned.append(ticket)
+            rollup_changes.append((before, snapshot(ticket)))
 
-    return True
+            # Profiles are locked, so the in-memory counter is authoritative here.
+            prof.active_count = active + 1
+            if prof.active_count >= prof.capacity:
+                prof.is_available = False
+            else:
+                heapq.heappush(heap, (prof.active_count, agent_id, prof))
+            touched[prof.id] = prof
+
+        if not assigned:
+            return 0
+
+        Ticket.objects.bulk_update(assigned, ["assigned_agent", "status", "updated_at"])
+        UserProfile.objects.bulk_update(list(touched.values()), ["active_count", "is_available"])
+        agent_queue.schedule_sync([prof.user_id for prof in touched.values()])
+        apply_rollup_changes(rollup_changes)
+        ws_access.schedule_invalidate_many((t.id, t.assigned_agent_id) for t in assigned)
+
+        events = []
+        for t in assigned:
+            events += _assigned_events(t.id, t.assigned_agent_id, t.status)
+        outbox.enqueue_many(events)
+
+    if len(assigned) == limit:
+        # The batch was full, so more backlog may be waiting for the remaining capacity.
+        assign_open_tickets_batch.delay(limit)
+
+    return len(assigned)
 
 
 @shared_task
@@ -201,19 +399,66 @@ def recompute_agent_availability(agent_id: int) -> bool:
         if prof.is_available:
             prof.is_available = False
             prof.save(update_fields=["is_available"])
+            agent_queue.sync_agents([agent.id])
         return True
 
-    active_statuses = [
-        Ticket.Status.OPEN,
-        Ticket.Status.ASSIGNED,
-        Ticket.Status.IN_PROGRESS,
-        Ticket.Status.WAITING_ON_CUSTOMER,
-    ]
-    active_count = Ticket.objects.filter(assigned_agent_id=agent.id, status__in=active_statuses).count()
-
-    should_be_available = active_count < cap
+    should_be_available = prof.active_count < cap
     if bool(prof.is_available) != bool(should_be_available):
         prof.is_available = bool(should_be_available)
         prof.save(update_fields=["is_available"])
+        agent_queue.sync_agents([agent.id])
 
     return True
+
+
+@shared_task
+def rollup_ticket_daily_stats(days: int = 2) -> int:
+    """Recompute the analytics rollup for the last ``days`` complete days."""
+    return rollup_recent(days)
+
+
+@shared_task
+def relay_outbox(batch_size: int = 200) -> int:
+    """Drain the outbox until empty; a safety net for when run_outbox_relay is not running."""
+    total = 0
+    while True:
+        delivered = outbox.drain(batch_size)
+        total += delivered
+        if delivered < batch_size:
+            return total
+
+
+@shared_task
+def purge_outbox(retention_hours: int = 24) -> int:
+    return outbox.purge_processed(timezone.now() - timedelta(hours=retention_hours))
+
+
+@shared_task
+def generate_ai_draft(job_id: str) -> bool:
+    """Run an AI draft job recorded by the ai-draft endpoint."""
+    job = ai_drafts.get_job(job_id)
+    if job is None or job["status"] in ai_drafts.FINISHED:
+        # Expired, or already handled by an earlier delivery of this message.
+        return False
+    return ai_drafts.run_job(job)["status"] == ai_drafts.DONE
+
+
+@shared_task
+def pregenerate_ai_draft(ticket_id: int) -> bool:
+    """Speculatively cache a draft after a customer message on an assigned ticket."""
+    return ai_drafts.pregenerate(ticket_id)
+
+
+@shared_task
+def update_similarity_index(batch_size: int = 1000) -> int:
+    """Apply ticket changes to the similar-tickets index (a no-op while another run holds the lock)."""
+    return similarity.update_index(batch_size) or 0
+
+
+@shared_task(bind=True, max_retries=20)
+def remove_from_similarity_index(self, ticket_ids) -> int:
+    """Tombstone deleted tickets in the similar-tickets index, waiting for a running update to finish."""
+    removed = similarity.remove_tickets(ticket_ids)
+    if removed is None:
+        raise self.retry(countdown=30)
+    return removed
@@ -0,0 +1,587 @@
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from accounts.models import UserProfile
+from core import ai_client, analytics_cache
+from tickets import agent_queue, outbox, similarity
+from tickets.management.commands.bench_ai_client import StubGeminiServer
+from tickets.models import Attachment, OutboxEvent, Ticket, TicketMessage
+from tickets.redaction import CARD, EMAIL, NUMBER, PHONE, redact, redact_many
+from tickets.tasks import assign_ticket
+
+User = get_user_model()
+
+_LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+def _user(username, role):
+    user = User.objects.create_user(username, f"{username}@example.com", "password")
+    UserProfile.objects.filter(user=user).update(role=role)
+    return user
+
+
+@override_settings(CACHES=_LOCMEM_CACHE, ROLE_CACHE_TTL=0)
+class QueryBudgetTests(APITestCase):
+    """Query counts for the list endpoints must not grow with the number of rows returned."""
+
+    # Per request: the user's role, then the rows (messages: the ticket, the thread, one attachments prefetch).
+    LIST_BUDGET = 2
+    SEARCH_BUDGET = 2
+    MESSAGES_BUDGET = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = _user("admin", UserProfile.Role.ADMIN)
+        cls.agents = [_user(f"agent{i}", UserProfile.Role.AGENT) for i in range(3)]
+        cls.customers = [_user(f"customer{i}", UserProfile.Role.CUSTOMER) for i in range(3)]
+
+    def _tickets(self, count):
+        return [
+            Ticket.objects.create(
+                customer=self.customers[i % len(self.customers)],
+                assigned_agent=self.agents[i % len(self.agents)],
+                subject=f"Printer jam {i}",
+                description="The printer in the office jams on every page.",
+            )
+            for i in range(count)
+        ]
+
+    def _messages(self, ticket, count):
+        for i in range(count):
+            message = TicketMessage.objects.create(
+                ticket=ticket, author=self.customers[0], body=f"Still jammed ({i})", is_internal=i % 3 == 0
+            )
+            for n in range(2):
+                Attachment.objects.create(
+                    ticket=ticket,
+                    message=message,
+                    uploader=self.customers[0],
+                    file=f"attachments/photo{n}.txt",
+                    filename=f"photo{n}.txt",
+                )
+
+    def _assert_budget(self, budget, url, expected_rows):
+        # A fresh instance, so the role lookup is counted on every request.
+        self.client.force_authenticate(User.objects.get(pk=self.admin.pk))
+        with self.assertNumQueries(budget):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), expected_rows)
+
+    def test_ticket_list(self):
+        self._tickets(3)
+        self._assert_budget(self.LIST_BUDGET, "/api/tickets/", 3)
+        self._tickets(27)
+        self._assert_budget(self.LIST_BUDGET, "/api/tickets/", 30)
+
+    def test_search(self):
+        self._tickets(3)
+        self._assert_budget(self.SEARCH_BUDGET, "/api/tickets/search/?q=printer", 3)
+        self._tickets(27)
+        self._assert_budget(self.SEARCH_BUDGET, "/api/tickets/search/?q=printer", 30)
+
+    def test_messages(self):
+        ticket = self._tickets(1)[0]
+        url = f"/api/tickets/{ticket.id}/messages/"
+        self._messages(ticket, 2)
+        self._assert_budget(self.MESSAGES_BUDGET, url, 2)
+        self._messages(ticket, 28)
+        self._assert_budget(self.MESSAGES_BUDGET, url, 30)
+
+
+@override_settings(CACHES=_LOCMEM_CACHE, ROLE_CACHE_TTL=0)
+class ThreadETagTests(APITestCase):
+    """Customers never observe internal notes; every change to a thread moves its ETag."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.agent = _user("agent", UserProfile.Role.AGENT)
+        cls.customer = _user("customer", UserProfile.Role.CUSTOMER)
+
+    def setUp(self):
+        self.ticket = Ticket.objects.create(customer=self.customer, assigned_agent=self.agent, subject="Printer jam")
+        self.url = f"/api/tickets/{self.ticket.id}/messages/"
+
+    def _post(self, user, body, is_internal=False):
+        self.client.force_authenticate(User.objects.get(pk=user.pk))
+        response = self.client.post(self.url, {"body": body, "is_internal": is_internal}, format="json")
+        self.assertEqual(response.status_code, 201)
+        return TicketMessage.objects.get(pk=response.json()["id"])
+
+    def _get(self, user, url, etag=None):
+        self.client.force_authenticate(User.objects.get(pk=user.pk))
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def test_internal_note_is_invisible_to_customer(self):
+        self._post(self.customer, "It jams again.")
+        etag = self._get(self.customer, self.url)["ETag"]
+        agent_etag = self._get(self.agent, self.url)["ETag"]
+
+        self._post(self.agent, "Customer has an old driver.", is_internal=True)
+
+        self.assertEqual(self._get(self.customer, self.url, etag).status_code, 304)
+        self.assertEqual(self._get(self.agent, self.url, agent_etag).status_code, 200)
+        detail = f"/api/tickets/{self.ticket.id}/"
+        self.assertEqual(self._get(self.customer, detail).json()["message_count"], 1)
+        self.assertEqual(self._get(self.agent, detail).json()["message_count"], 2)
+
+    def test_edit_and_delete_change_etag(self):
+        message = self._post(self.customer, "It jams again.")
+        etag = self._get(self.customer, self.url)["ETag"]
+
+        message.body = "It jams on every page."
+        message.save()
+        response = self._get(self.customer, self.url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["body"], "It jams on every page.")
+
+        message.delete()
+        response = self._get(self.customer, self.url, response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+        self.ticket.refresh_from_db()
+        self.assertEqual((self.ticket.message_count, self.ticket.public_message_count), (0, 0))
+
+    def test_internal_note_edit_keeps_customer_etag(self):
+        self._post(self.customer, "It jams again.")
+        note = self._post(self.agent, "Customer has an old driver.", is_internal=True)
+        etag = self._get(self.customer, self.url)["ETag"]
+
+        note.body = "Driver updated remotely."
+        note.save()
+        self.assertEqual(self._get(self.customer, self.url, etag).status_code, 304)
+
+        note.is_internal = False
+        note.save()
+        self.assertEqual(self._get(self.customer, self.url, etag).status_code, 200)
+
+
+@override_settings(CACHES=_LOCMEM_CACHE, ROLE_CACHE_TTL=0)
+class AnalyticsInvalidationTests(APITestCase):
+    """Every write that moves status or priority counts refreshes the analytics cache once it commits."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = _user("admin", UserProfile.Role.ADMIN)
+
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+        self.ticket = Ticket.objects.create(subject="Printer jam")
+        self.url = f"/api/tickets/{self.ticket.id}/"
+
+    def test_update_invalidates_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.patch(self.url, {"priority": Ticket.Priority.HIGH}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(analytics_cache.invalidate, callbacks)
+
+    def test_destroy_invalidates_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, 204)
+        self.assertIn(analytics_cache.invalidate, callbacks)
+
+
+class RedactionTests(SimpleTestCase):
+    """Anything that looks like PII is replaced; a failed check never lets the raw text through."""
+
+    def test_card_numbers(self):
+        self.assertEqual(redact("card 4111 1111 1111 1111 expires"), f"card {CARD} expires")
+        self.assertEqual(redact("card 4111-1111-1111-1111"), f"card {CARD}")
+
+    def test_luhn_failure_is_still_redacted(self):
+        self.assertEqual(redact("ref: 1234567890123456"), f"ref: {NUMBER}")
+        self.assertEqual(redact("ref: 1234 5678 9012 3456 789"), f"ref: {NUMBER}")
+        self.assertEqual(redact("call 1234567890123"), f"call {PHONE}")
+
+    def test_long_digit_runs(self):
+        self.assertEqual(redact("account " + "9" * 20), f"account {NUMBER}")
+        self.assertEqual(redact("account " + "9" * 40 + " ok"), f"account {NUMBER} ok")
+        self.assertEqual(redact("+" + "4" * 25), NUMBER)
+        self.assertEqual(redact("12345678901234567890abc"), f"{NUMBER}abc")
+
+    def test_long_email_local_part(self):
+        self.assertEqual(redact("from " + "a" * 80 + "@example.com"), f"from {EMAIL}")
+        self.assertEqual(redact("from first.last+tag@mail.example.co.uk."), f"from {EMAIL}.")
+
+    def test_leaves_ordinary_text(self):
+        self.assertEqual(redact("Order 123456 arrived on Monday."), "Order 123456 arrived on Monday.")
+
+    def test_batch_matches_single(self):
+        texts = ["ref: 1234567890123456", None, "", "x" * 70 + "@example.com", "4111111111111111"]
+        self.assertEqual(redact_many(texts), [redact(t) for t in texts])
+
+
+class AIClientTests(SimpleTestCase):
+    """core.ai_client against the local Gemini stub (models: gemini-1.5-flash, gemini-1.5-pro)."""
+
+    MODEL_CACHE_TTL = 0.5
+
+    def setUp(self):
+        self.server = StubGeminiServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        overrides = override_settings(
+            GEMINI_API_BASE=self.server.base_url, GEMINI_API_KEY="test", AI_MODEL_CACHE_TTL=self.MODEL_CACHE_TTL
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        for reset in (ai_client.close_session, ai_client.reset_model_cache):
+            reset()
+            self.addCleanup(reset)
+
+    def _generate(self):
+        self.server.calls.clear()
+        text = ai_client.generate("Draft a reply")
+        return text, list(self.server.calls)
+
+    def _expire_model_cache(self):
+        time.sleep(self.MODEL_CACHE_TTL + 0.1)
+
+    def test_model_list_is_cached_until_ttl(self):
+        _, calls = self._generate()
+        self.assertEqual(calls, [("GET", "models"), ("POST", "gemini-1.5-flash")])
+        _, calls = self._generate()
+        self.assertEqual(calls, [("POST", "gemini-1.5-flash")])
+
+        self._expire_model_cache()
+        _, calls = self._generate()
+        self.assertEqual(calls, [("GET", "models"), ("POST", "gemini-1.5-flash")])
+
+    def test_rejected_models_are_skipped(self):
+        for status in (403, 404):
+            with self.subTest(status=status):
+                ai_client.reset_model_cache()
+                self.server.statuses = {"gemini-1.5-flash": status}
+                text, calls = self._generate()
+                self.assertTrue(text.startswith("[gemini-1.5-pro]"))
+                self.assertEqual(calls, [("GET", "models"), ("POST", "gemini-1.5-flash"), ("POST", "gemini-1.5-pro")])
+
+    def test_other_errors_are_not_skipped(self):
+        self.server.statuses = {"gemini-1.5-flash": 500}
+        with self.assertRaises(ai_client.AIClientError):
+            self._generate()
+        self.assertEqual(self.server.calls, [("GET", "models"), ("POST", "gemini-1.5-flash")])
+
+    def test_last_good_model_is_tried_first(self):
+        self.server.statuses = {"gemini-1.5-flash": 403}
+        self._generate()
+
+        # Even after re-discovery, and with the preferred model working again.
+        self.server.statuses = {}
+        self._expire_model_cache()
+        text, calls = self._generate()
+        self.assertTrue(text.startswith("[gemini-1.5-pro]"))
+        self.assertEqual(calls, [("GET", "models"), ("POST", "gemini-1.5-pro")])
+
+    def test_rediscovers_once_when_every_cached_model_is_rejected(self):
+        self._generate()
+
+        self.server.models = ["gemini-1.0-pro"]
+        text, calls = self._generate()
+        self.assertTrue(text.startswith("[gemini-1.0-pro]"))
+        self.assertEqual(
+            calls,
+            [
+                ("POST", "gemini-1.5-flash"),
+                ("POST", "gemini-1.5-pro"),
+                ("GET", "models"),
+                ("POST", "gemini-1.0-pro"),
+            ],
+        )
+
+        self.server.models = []
+        with self.assertRaises(ai_client.AIClientError):
+            self._generate()
+        self.assertEqual(self.server.calls.count(("GET", "models")), 1)
+
+    def test_session_is_reused(self):
+        self.assertIs(ai_client.get_session(), ai_client.get_session())
+        for _ in range(5):
+            self._generate()
+        self.assertEqual(self.server.connections, 1)
+
+
+class _FakeRedis:
+    """The slice of redis-py the replay log uses: counters and stream appends through pipelines."""
+
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.streams = defaultdict(list)
+
+    def pipeline(self, transaction=False):
+        return _FakePipeline(self)
+
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.results = []
+
+    def incrby(self, key, amount):
+        self.redis.counters[key] += amount
+        self.results.append(self.redis.counters[key])
+
+    def xadd(self, key, fields, id, **kwargs):
+        self.redis.streams[key].append(id)
+        self.results.append(id)
+
+    def expire(self, key, seconds):
+        self.results.append(True)
+
+    def execute(self):
+        results, self.results = self.results, []
+        return results
+
+
+@override_settings(CACHES=_LOCMEM_CACHE, OUTBOX_MAX_ATTEMPTS=3)
+class OutboxDrainTests(TestCase):
+    """Per-ticket order and at-least-once delivery through tickets.outbox.drain."""
+
+    def setUp(self):
+        self.emails = []
+        self.email_failures = set()
+        self.frames = []
+        self.broadcast_failures = set()
+        self.redis = _FakeRedis()
+
+        def send_email(event_type, ticket_id, message_id, new_status):
+            if ticket_id in self.email_failures:
+                raise ConnectionError("broker unavailable")
+            self.emails.append((ticket_id, event_type))
+
+        async def send_all(messages):
+            failures = {}
+            for ticket_id, group, message in messages:
+                if ticket_id in self.broadcast_failures:
+                    failures.setdefault(ticket_id, ConnectionError("channel layer unavailable"))
+                else:
+                    self.frames.append((ticket_id, message))
+            return failures
+
+        for patcher in (
+            mock.patch("tickets.tasks.send_ticket_email.delay", side_effect=send_email),
+            mock.patch("tickets.realtime._send_all", new=send_all),
+            mock.patch("tickets.event_log.get_client", return_value=self.redis),
+            mock.patch("tickets.outbox.logger"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _broadcast(self, ticket_id, event_type="ticket.message_created"):
+        return outbox.enqueue_broadcast(ticket_id, {"type": event_type, "ticket_id": ticket_id})
+
+    def _email(self, ticket_id, event_type="ticket.message_created"):
+        return outbox.enqueue_ticket_email(event_type, ticket_id)
+
+    def test_failed_event_blocks_later_events_of_its_ticket(self):
+        first = self._email(1, "ticket.assigned")
+        self._broadcast(1)
+        self._email(1, "ticket.message_created")
+        self._email(2)
+        self.email_failures = {1}
+
+        self.assertEqual(outbox.drain(), 1)
+        self.assertEqual(self.emails, [(2, "ticket.message_created")])
+        self.assertEqual(self.frames, [])
+        first.refresh_from_db()
+        self.assertEqual((first.attempts, first.processed_at), (1, None))
+        self.assertEqual(OutboxEvent.objects.filter(ticket_id=1, processed_at__isnull=True).count(), 3)
+
+        self.email_failures = set()
+        self.assertEqual(outbox.drain(), 3)
+        self.assertEqual(self.emails[1:], [(1, "ticket.assigned"), (1, "ticket.message_created")])
+        self.assertEqual([ticket_id for ticket_id, _ in self.frames], [1])
+        self.assertFalse(OutboxEvent.objects.filter(processed_at__isnull=True).exists())
+
+    def test_event_is_parked_after_max_attempts(self):
+        stuck = self._email(1)
+        later = self._email(1, "ticket.status_changed")
+        self.email_failures = {1}
+        for _ in range(3):
+            self.assertEqual(outbox.drain(), 0)
+
+        stuck.refresh_from_db()
+        self.assertEqual(stuck.attempts, 3)
+        self.assertIsNotNone(stuck.processed_at)
+        self.assertIn("broker unavailable", stuck.last_error)
+
+        # Parking unblocked the ticket, so the later event was already tried in the last drain.
+        later.refresh_from_db()
+        self.assertEqual((later.attempts, later.processed_at), (1, None))
+
+        self.email_failures = set()
+        self.assertEqual(outbox.drain(), 1)
+        self.assertEqual(self.emails, [(1, "ticket.status_changed")])
+
+    def test_retried_broadcast_keeps_its_seq(self):
+        event = self._broadcast(1)
+        self.broadcast_failures = {1}
+        self.assertEqual(outbox.drain(), 0)
+        event.refresh_from_db()
+        self.assertEqual(event.payload["seq"], 1)
+
+        self.broadcast_failures = set()
+        self.assertEqual(outbox.drain(), 1)
+        self._broadcast(1)
+        self.assertEqual(outbox.drain(), 1)
+
+        self.assertEqual(self.redis.streams["tickets:events:1"], ["1-0", "2-0"])
+        self.assertEqual([message["max_seq"] for _, message in self.frames], [1, 2])
+
+    def test_rolled_back_write_leaves_no_event(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self._broadcast(1)
+            self._email(1)
+            raise RuntimeError("write failed")
+
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(outbox.drain(), 0)
+        self.assertEqual((self.emails, self.frames), ([], []))
+
+
+class SimilarityIndexTests(TestCase):
+    """Incremental updates of the on-disk similar-tickets index."""
+
+    def setUp(self):
+        path = tempfile.TemporaryDirectory()
+        self.addCleanup(path.cleanup)
+        self.index_dir = Path(path.name)
+        overrides = override_settings(SIMILAR_INDEX_DIR=self.index_dir, SIMILAR_INDEX_COMPACT_RATIO=0.25)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.tickets = [
+            Ticket.objects.create(
+                subject=f"Printer jam on floor {i}",
+                description="The office printer jams on every page.",
+                status=Ticket.Status.RESOLVED,
+            )
+            for i in range(8)
+        ]
+
+    def _meta_stamp(self):
+        return (self.index_dir / similarity.META_FILE).stat().st_mtime_ns
+
+    def _reader(self):
+        return similarity.SimilarityIndex(self.index_dir, similarity._dim())
+
+    def test_unchanged_run_leaves_meta_alone(self):
+        self.assertEqual(similarity.update_index(), 8)
+        stamp = self._meta_stamp()
+
+        # The overlap window re-reads every ticket, but none of them changed.
+        self.assertEqual(similarity.update_index(), 8)
+        self.assertEqual(self._meta_stamp(), stamp)
+
+        Ticket.objects.filter(pk=self.tickets[0].pk).update(subject="Scanner jam", updated_at=timezone.now())
+        similarity.update_index()
+        self.assertNotEqual(self._meta_stamp(), stamp)
+
+    def test_tombstones_past_ratio_compact(self):
+        similarity.update_index()
+        reopened = [t.pk for t in self.tickets[:2]]
+        Ticket.objects.filter(pk__in=reopened).update(status=Ticket.Status.OPEN, updated_at=timezone.now())
+        similarity.update_index()
+        index = self._reader()
+        self.assertEqual((index.count, index.tombstones()), (8, 2))
+
+        Ticket.objects.filter(pk=self.tickets[2].pk).update(status=Ticket.Status.OPEN, updated_at=timezone.now())
+        similarity.update_index()
+        index = self._reader()
+        self.assertEqual((index.count, index.tombstones(), index.meta["generation"]), (5, 0, 2))
+        self.assertEqual(sorted(index.ids.tolist()), sorted(t.pk for t in self.tickets[3:]))
+        # Only the current generation's files are left.
+        self.assertEqual(
+            sorted(p.name for p in self.index_dir.iterdir() if p.name != similarity.META_FILE),
+            sorted(p.name for p in index._files()),
+        )
+        hits = index.search(similarity.vectorize(["printer jam"])[0], 3)
+        self.assertTrue(hits and all(ticket_id in index.ids for ticket_id, _ in hits))
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}, WS_ACCESS_CACHE_TTL=0
+)
+class StreamConnectTests(TransactionTestCase):
+    # database_sync_to_async closes old connections, which TestCase's wrapping transaction cannot survive.
+
+    async def _connect(self, user):
+        from channels.testing import WebsocketCommunicator
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        from config.asgi import application
+
+        communicator = WebsocketCommunicator(application, f"/ws/stream/?token={AccessToken.for_user(user)}")
+        connected, code = await communicator.connect()
+        await communicator.disconnect()
+        return connected, code
+
+    async def test_active_user_connects(self):
+        user = await User.objects.acreate(username="streamer")
+        connected, _ = await self._connect(user)
+        self.assertTrue(connected)
+
+    async def test_deactivated_user_with_valid_token_is_rejected(self):
+        user = await User.objects.acreate(username="gone", is_active=False)
+        connected, code = await self._connect(user)
+        self.assertFalse(connected)
+        self.assertEqual(code, 4403)
+
+    def test_deactivation_drops_cached_check(self):
+        user = User.objects.create(username="toggled")
+        user.is_active = False
+        with mock.patch("tickets.ws_access.invalidate_user") as invalidate:
+            user.save()
+            user.save(update_fields=["last_login"])
+        invalidate.assert_called_once_with(user.pk)
+
+
+@override_settings(TICKET_ASSIGNMENT_BACKEND="redis")
+class AssignReservationTests(TestCase):
+    """A Redis reservation that does not end in a committed assignment is handed back."""
+
+    def setUp(self):
+        self.agent = _user("agent", UserProfile.Role.AGENT)
+        UserProfile.objects.filter(user=self.agent).update(is_available=True)
+        self.offline = _user("offline", UserProfile.Role.AGENT)
+        self.ticket = Ticket.objects.create(subject="Printer jam")
+        for name in ("sync_agents", "release_agent"):
+            patcher = mock.patch.object(agent_queue, name)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def _assign(self, reserved_id):
+        with mock.patch.object(agent_queue, "reserve_agent", return_value=reserved_id):
+            return assign_ticket(self.ticket.id)
+
+    def test_accepted_reservation_is_kept(self):
+        self.assertTrue(self._assign(self.agent.id))
+        self.release_agent.assert_not_called()
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.assigned_agent_id, self.agent.id)
+
+    def test_reservation_rejected_by_db_is_released(self):
+        self.assertTrue(self._assign(self.offline.id))
+        self.release_agent.assert_called_once_with(self.offline.id)
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.assigned_agent_id, self.agent.id)
+
+    def test_reservation_is_released_on_rollback(self):
+        with mock.patch.object(outbox, "enqueue_many", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                self._assign(self.agent.id)
+        self.release_agent.assert_called_once_with(self.agent.id)
+        self.ticket.refresh_from_db()
+        self.assertIsNone(self.ticket.assigned_agent_id)
@@ -1,14 +1,13 @@
-import os
-import re
+import hashlib
+from datetime import datetime, time, timedelta
 
-import requests
 from django.contrib.auth import get_user_model
-from django.contrib.postgres.aggregates import StringAgg
-from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import transaction
 from django.db.utils import OperationalError, ProgrammingError
-from django.db.models import Q, TextField, Value
-from django.db.models.functions import Coalesce
+from django.db.models import F, Prefetch, Q
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
@@ -18,11 +17,16 @@ from rest_framework.throttling import UserRateThrottle
 
 from accounts.models import UserProfile
 from accounts.utils import get_user_role
+from core import ai_client, analytics_cache
+from tickets.agent_load import record_transition
 from tickets.models import Attachment, Ticket, TicketMessage
+from tickets.pagination import TicketMessagePagination, TicketPagination
 from tickets.permissions import IsAgentOrAdmin
-from tickets.realtime import broadcast_ticket_event
+from tickets import ai_drafts, outbox, similarity, ws_access
+from tickets.rollup import apply_changes as apply_rollup_changes, snapshot
+from tickets.search import SEARCH_VECTOR_FIELDS, search_field_for_role
 from tickets.serializers import TicketMessageSerializer, TicketSerializer
-from tickets.tasks import assign_ticket, recompute_agent_availability, send_ticket_email
+from tickets.tasks import assign_ticket, generate_ai_draft, recompute_agent_availability
 
 User = get_user_model()
 
@@ -31,104 +35,66 @@ class AIDraftThrottle(UserRateThrottle):
     scope = "ai_draft"
 
 
-def _redact_pii(text: str) -> str:
-    if not text:
-        return text
-    text = re.sub(r"[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}", "[redacted-email]", text, flags=re.IGNORECASE)
-    text = re.sub(r"\b\+?\d[\d\s\-()]{7,}\b", "[redacted-phone]", text)
-    return text
-
-
-def _gemini_list_models(api_key: str) -> list[str]:
-    url = f"https://generativelanguage.googleapis.com/v1beta/models?key={api_key}"
-    res = requests.get(url, timeout=15)
-    if not res.ok:
-        return []
-    data = res.json() if res.content else {}
-    models = data.get("models") or []
-    out = []
-    for m in models:
-        name = (m.get("name") or "").strip()
-        if not name.startswith("models/"):
-            continue
-        supported = set(m.get("supportedGenerationMethods") or [])
-        if "generateContent" not in supported:
-            continue
-        out.append(name[len("models/") :])
-    return out
-
-
-def _gemini_generate(prompt: str) -> str:
-    api_key = os.getenv("GEMINI_API_KEY", "").strip()
-    if not api_key:
-        raise RuntimeError("GEMINI_API_KEY is not configured")
-
-    preferred = [
-        "gemini-1.5-flash",
-        "gemini-1.5-flash-latest",
-        "gemini-1.5-pro",
-        "gemini-1.5-pro-latest",
-        "gemini-1.0-pro",
-    ]
-
-    discovered = []
+def _draft_job_data(job: dict) -> dict:
+    return {k: job.get(k) for k in ("job_id", "ticket_id", "status", "draft", "error", "cached")}
+
+
+def _day_start(value: str):
     try:
-        discovered = _gemini_list_models(api_key)
-    except Exception:
-        discovered = []
-
-    if discovered:
-        model_candidates = [m for m in preferred if m in set(discovered)]
-        if not model_candidates:
-            model_candidates = discovered
+        day = parse_date(value)
+    except ValueError:
+        return None
+    if day is None:
+        return None
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _parse_timestamp(value: str):
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        return None
+    if parsed is None:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _thread_etag(ticket, role: str, request) -> str:
+    # Customers see a different (public-only) thread, built only from the public
+    # counters so internal notes never change their tag; filters/cursors change
+    # the body, so they are part of the tag too.
+    if role == UserProfile.Role.CUSTOMER:
+        audience, count, last = "public", ticket.public_message_count, ticket.last_public_message_at
     else:
-        model_candidates = preferred
+        audience, count, last = "all", ticket.message_count, ticket.last_message_at
+    stamp = last.timestamp() if last else 0
+    raw = f"{ticket.id}:{count}:{stamp}:{audience}:{request.META.get('QUERY_STRING', '')}"
+    return f'W/"{hashlib.sha1(raw.encode()).hexdigest()}"'
 
-    payload = {
-        "contents": [
-            {
-                "role": "user",
-                "parts": [{"text": prompt}],
-            }
-        ],
-        "generationConfig": {
-            "temperature": 0.3,
-            "maxOutputTokens": 300,
-        },
-    }
-
-    last_res = None
-    for model in model_candidates:
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
-        res = requests.post(url, json=payload, timeout=20)
-        last_res = res
-        if res.ok:
-            data = res.json() if res.content else {}
-            candidates = data.get("candidates") or []
-            if not candidates:
-                return ""
-            content = (candidates[0].get("content") or {}).get("parts") or []
-            text = "".join([p.get("text", "") for p in content if isinstance(p, dict)])
-            return (text or "").strip()
-
-        if res.status_code not in {404, 403}:
-            break
-
-    status_code = getattr(last_res, "status_code", "unknown")
-    body = (getattr(last_res, "text", "") or "").strip()
-    body = body[:1000]
-    raise RuntimeError(
-        f"Gemini API error: HTTP {status_code} {body} (tried models: {', '.join(model_candidates[:8])})"
-    )
+
+def _etag_matches(request, etag: str) -> bool:
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    tags = {t.strip() for t in header.split(",")}
+    # Weak comparison: W/"x" and "x" match (RFC 9110 13.1.2).
+    return "*" in tags or etag in tags or etag[2:] in tags
 
 
 class TicketViewSet(viewsets.ModelViewSet):
     serializer_class = TicketSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TicketPagination
 
     def get_queryset(self):
         role = get_user_role(self.request.user)
-        qs = Ticket.objects.all().order_by("-created_at")
+        qs = (
+            Ticket.objects.select_related("customer", "assigned_agent")
+            .defer(*SEARCH_VECTOR_FIELDS)
+            .order_by("-created_at", "-id")
+        )
 
         status_filter = (self.request.query_params.get("status") or "").strip()
         priority_filter = (self.request.query_params.get("priority") or "").strip()
@@ -150,16 +116,14 @@ class TicketViewSet(viewsets.ModelViewSet):
                 if user_match is not None:
                     qs = qs.filter(assigned_agent_id=user_match.id)
 
-        if created_from:
-            try:
-                qs = qs.filter(created_at__date__gte=created_from)
-            except Exception:
-                pass
-        if created_to:
-            try:
-                qs = qs.filter(created_at__date__lte=created_to)
-            except Exception:
-                pass
+        # Compare created_at against day boundaries (not created_at::date) so the
+        # created_at indexes stay usable.
+        range_start = _day_start(created_from) if created_from else None
+        if range_start is not None:
+            qs = qs.filter(created_at__gte=range_start)
+        range_end = _day_start(created_to) if created_to else None
+        if range_end is not None:
+            qs = qs.filter(created_at__lt=range_end + timedelta(days=1))
 
         if role == UserProfile.Role.CUSTOMER:
             return qs.filter(customer=self.request.user)
@@ -169,10 +133,42 @@ class TicketViewSet(viewsets.ModelViewSet):
 
         return qs
 
+    def _lock_ticket(self, ticket):
+        # Re-read the counted fields under a row lock so the agent load counter
+        # and analytics rollup move exactly once per transition.
+        return (
+            Ticket.objects.select_for_update()
+            .only("status", "assigned_agent", "priority", "created_at", "closed_at")
+            .get(pk=ticket.pk)
+        )
+
     def perform_create(self, serializer):
         ticket = serializer.save(customer=self.request.user)
+        # New tickets are not broadcast, so refresh the analytics cache directly.
+        analytics_cache.invalidate()
         assign_ticket.delay(ticket.id)
 
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            prev = self._lock_ticket(serializer.instance)
+            ticket = serializer.save()
+            record_transition(prev.assigned_agent_id, prev.status, ticket.assigned_agent_id, ticket.status)
+            apply_rollup_changes([(snapshot(prev), snapshot(ticket))])
+            if prev.assigned_agent_id != ticket.assigned_agent_id:
+                ws_access.schedule_invalidate(ticket.id, prev.assigned_agent_id, ticket.assigned_agent_id)
+            # Edits are not broadcast either; status, priority or assignee may have moved.
+            transaction.on_commit(analytics_cache.invalidate)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            prev = self._lock_ticket(instance)
+            ticket_id = instance.pk
+            instance.delete()
+            record_transition(prev.assigned_agent_id, prev.status, None, None)
+            apply_rollup_changes([(snapshot(prev), None)])
+            ws_access.schedule_invalidate(ticket_id, instance.customer_id, prev.assigned_agent_id)
+            transaction.on_commit(analytics_cache.invalidate)
+
     @action(detail=False, methods=["get"], url_path="search", permission_classes=[IsAuthenticated])
     def search(self, request):
         q = (request.query_params.get("q") or "").strip()
@@ -200,34 +196,17 @@ class TicketViewSet(viewsets.ModelViewSet):
                 if user_match is not None:
                     qs = qs.filter(assigned_agent_id=user_match.id)
 
-        msg_filter = Q(messages__is_internal=False)
-        if role in {UserProfile.Role.AGENT, UserProfile.Role.ADMIN}:
-            msg_filter = Q()
-
-        qs = qs.annotate(
-            messages_text=Coalesce(
-                StringAgg(
-                    "messages__body",
-                    delimiter=" ",
-                    filter=msg_filter,
-                    distinct=True,
-                    output_field=TextField(),
-                ),
-                Value("", output_field=TextField()),
-                output_field=TextField(),
-            )
-        )
-
-        vector = (
-            SearchVector("subject", weight="A")
-            + SearchVector("description", weight="B")
-            + SearchVector("messages_text", weight="C")
-        )
+        # Customers only match on the public document so internal notes never leak.
+        vector_field = search_field_for_role(role)
         query = SearchQuery(q)
 
-        qs = qs.annotate(rank=SearchRank(vector, query)).filter(rank__gt=0.0).order_by("-rank", "-created_at")
+        qs = (
+            qs.filter(**{vector_field: query})
+            .annotate(rank=SearchRank(F(vector_field), query))
+            .order_by("-rank", "-created_at")
+        )
 
-        return Response(TicketSerializer(qs[:50], many=True).data)
+        return Response(TicketSerializer(qs[:50], many=True, context={"request": request}).data)
 
     @action(
         detail=True,
@@ -240,10 +219,46 @@ class TicketViewSet(viewsets.ModelViewSet):
         ticket = self.get_object()
         role = get_user_role(request.user)
         if request.method.lower() == "get":
-            qs = TicketMessage.objects.filter(ticket=ticket).order_by("created_at")
+            # Adding, editing or deleting a message moves the thread counters
+            # (here and in tickets.signals), so the ticket row already loaded by
+            # get_object is enough to answer a conditional request.
+            etag = _thread_etag(ticket, role, request)
+            if _etag_matches(request, etag):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+            qs = (
+                TicketMessage.objects.filter(ticket=ticket)
+                .prefetch_related(Prefetch("attachments", queryset=Attachment.objects.order_by("id")))
+                .order_by("created_at", "id")
+            )
             if role == UserProfile.Role.CUSTOMER:
                 qs = qs.filter(is_internal=False)
-            return Response(TicketMessageSerializer(qs, many=True).data)
+
+            # Delta sync: only messages newer than what the client already has.
+            after_id = request.query_params.get("after_id")
+            if after_id:
+                try:
+                    qs = qs.filter(id__gt=int(after_id))
+                except ValueError:
+                    return Response({"detail": "after_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            updated_since = request.query_params.get("updated_since")
+            if updated_since:
+                since = _parse_timestamp(updated_since)
+                if since is None:
+                    return Response(
+                        {"detail": "updated_since must be an ISO 8601 datetime"},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                qs = qs.filter(created_at__gt=since)
+
+            paginator = TicketMessagePagination()
+            page = paginator.paginate_queryset(qs, request, view=self)
+            if page is not None:
+                response = paginator.get_paginated_response(TicketMessageSerializer(page, many=True).data)
+            else:
+                response = Response(TicketMessageSerializer(qs, many=True).data)
+            response["ETag"] = etag
+            return response
 
         raw_internal = request.data.get("is_internal", False)
         if isinstance(raw_internal, str):
@@ -260,49 +275,56 @@ class TicketViewSet(viewsets.ModelViewSet):
         if is_internal and role == UserProfile.Role.CUSTOMER:
             return Response({"detail": "Customers cannot create internal messages"}, status=status.HTTP_403_FORBIDDEN)
 
-        msg = serializer.save(ticket=ticket, author=request.user, is_internal=is_internal)
-
         files = []
         try:
             files = request.FILES.getlist("files")
         except Exception:
             files = []
 
-        for f in files:
-            try:
-                Attachment.objects.create(
-                    ticket=ticket,
-                    message=msg,
-                    uploader=request.user,
-                    file=f,
-                    filename=getattr(f, "name", "") or "",
-                    content_type=getattr(f, "content_type", "") or "",
-                    size=int(getattr(f, "size", 0) or 0),
-                )
-            except (ProgrammingError, OperationalError):
-                # Attachments table may not be migrated yet; keep message send working.
-                break
-
-        ticket.last_message_at = timezone.now()
-        ticket.save(update_fields=["last_message_at", "updated_at"])
-
-        broadcast_ticket_event(
-            ticket.id,
-            {
-                "type": "ticket.message_created",
-                "ticket_id": ticket.id,
-                "message": TicketMessageSerializer(msg).data,
-            },
-        )
+        with transaction.atomic():
+            msg = serializer.save(ticket=ticket, author=request.user, is_internal=is_internal)
+
+            for f in files:
+                try:
+                    with transaction.atomic():
+                        Attachment.objects.create(
+                            ticket=ticket,
+                            message=msg,
+                            uploader=request.user,
+                            file=f,
+                            filename=getattr(f, "name", "") or "",
+                            content_type=getattr(f, "content_type", "") or "",
+                            size=int(getattr(f, "size", 0) or 0),
+                        )
+                except (ProgrammingError, OperationalError):
+                    # Attachments table may not be migrated yet; keep message send working.
+                    break
+
+            now = timezone.now()
+            counters = {"last_message_at": now, "message_count": F("message_count") + 1}
+            if not is_internal:
+                counters.update(last_public_message_at=now, public_message_count=F("public_message_count") + 1)
+            Ticket.objects.filter(pk=ticket.pk).update(updated_at=now, **counters)
+
+            msg_data = TicketMessageSerializer(msg).data
+
+            outbox.enqueue_broadcast(
+                ticket.id,
+                {
+                    "type": "ticket.message_created",
+                    "ticket_id": ticket.id,
+                    "message": msg_data,
+                },
+            )
+            outbox.enqueue_ticket_email("ticket.message_created", ticket.id, msg.id, None)
 
-        send_ticket_email.delay(
-            "ticket.message_created",
-            ticket.id,
-            msg.id,
-            None,
-        )
+            if not is_internal:
+                # The conversation changed, so any cached AI draft is stale.
+                transaction.on_commit(lambda: ai_drafts.invalidate(ticket.id))
+                if role == UserProfile.Role.CUSTOMER and ticket.assigned_agent_id:
+                    ai_drafts.schedule_pregenerate(ticket.id)
 
-        return Response(TicketMessageSerializer(msg).data, status=status.HTTP_201_CREATED)
+        return Response(msg_data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=["post"], url_path="set-status", permission_classes=[IsAgentOrAdmin])
     def set_status(self, request, pk=None):
@@ -315,31 +337,29 @@ class TicketViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        ticket.status = new_status
-        if new_status == Ticket.Status.CLOSED:
-            ticket.closed_at = timezone.now()
-        ticket.save(update_fields=["status", "closed_at", "updated_at"])
-
-        broadcast_ticket_event(
-            ticket.id,
-            {
-                "type": "ticket.status_changed",
-                "ticket_id": ticket.id,
-                "status": ticket.status,
-            },
-        )
-
-        send_ticket_email.delay(
-            "ticket.status_changed",
-            ticket.id,
-            None,
-            ticket.status,
-        )
+        with transaction.atomic():
+            prev = self._lock_ticket(ticket)
+            ticket.status = new_status
+            if new_status == Ticket.Status.CLOSED:
+                ticket.closed_at = timezone.now()
+            ticket.save(update_fields=["status", "closed_at", "updated_at"])
+            record_transition(prev.assigned_agent_id, prev.status, prev.assigned_agent_id, ticket.status)
+            apply_rollup_changes([(snapshot(prev), snapshot(ticket))])
+
+            outbox.enqueue_broadcast(
+                ticket.id,
+                {
+                    "type": "ticket.status_changed",
+                    "ticket_id": ticket.id,
+                    "status": ticket.status,
+                },
+            )
+            outbox.enqueue_ticket_email("ticket.status_changed", ticket.id, None, ticket.status)
 
         if ticket.assigned_agent_id is not None and new_status in {Ticket.Status.RESOLVED, Ticket.Status.CLOSED}:
             recompute_agent_availability.delay(int(ticket.assigned_agent_id))
 
-        return Response(TicketSerializer(ticket).data)
+        return Response(TicketSerializer(ticket, context={"request": request}).data)
 
     @action(detail=True, methods=["post"], url_path="assign", permission_classes=[IsAgentOrAdmin])
     def assign(self, request, pk=None):
@@ -348,28 +368,66 @@ class TicketViewSet(viewsets.ModelViewSet):
         if not agent_id:
             return Response({"detail": "assigned_agent is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        ticket.assigned_agent_id = agent_id
-        if ticket.status == Ticket.Status.OPEN:
-            ticket.status = Ticket.Status.ASSIGNED
-        ticket.save(update_fields=["assigned_agent", "status", "updated_at"])
-
-        broadcast_ticket_event(
-            ticket.id,
-            {
-                "type": "ticket.assigned",
-                "ticket_id": ticket.id,
-                "assigned_agent": ticket.assigned_agent_id,
-                "status": ticket.status,
-            },
-        )
+        try:
+            agent_id = int(agent_id)
+        except (TypeError, ValueError):
+            return Response({"detail": "assigned_agent must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            prev = self._lock_ticket(ticket)
+            ticket.assigned_agent_id = agent_id
+            ticket.status = prev.status
+            if ticket.status == Ticket.Status.OPEN:
+                ticket.status = Ticket.Status.ASSIGNED
+            ticket.save(update_fields=["assigned_agent", "status", "updated_at"])
+            record_transition(prev.assigned_agent_id, prev.status, agent_id, ticket.status)
+            apply_rollup_changes([(snapshot(prev), snapshot(ticket))])
+            if prev.assigned_agent_id != agent_id:
+                ws_access.schedule_invalidate(ticket.id, prev.assigned_agent_id, agent_id)
+
+            outbox.enqueue_broadcast(
+                ticket.id,
+                {
+                    "type": "ticket.assigned",
+                    "ticket_id": ticket.id,
+                    "assigned_agent": ticket.assigned_agent_id,
+                    "status": ticket.status,
+                    "previous_agent": prev.assigned_agent_id,
+                },
+            )
+            outbox.enqueue_ticket_email("ticket.assigned", ticket.id, None, ticket.status)
+
+        return Response(TicketSerializer(ticket, context={"request": request}).data)
 
-        send_ticket_email.delay(
-            "ticket.assigned",
-            ticket.id,
-            None,
-            ticket.status,
+    @action(detail=True, methods=["get"], url_path="similar", permission_classes=[IsAgentOrAdmin])
+    def similar(self, request, pk=None):
+        ticket = self.get_object()
+        try:
+            k = max(1, min(int(request.query_params.get("k", 5)), 50))
+        except ValueError:
+            return Response({"detail": "k must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        hits = similarity.similar_tickets(ticket, k)
+        # Only tickets this user may already see (agents: their own assignments).
+        rows = (
+            self.get_queryset()
+            .select_related(None)
+            .only("id", "subject", "status", "closed_at")
+            .in_bulk([t for t, _ in hits])
+        )
+        return Response(
+            [
+                {
+                    "id": ticket_id,
+                    "subject": rows[ticket_id].subject,
+                    "status": rows[ticket_id].status,
+                    "closed_at": rows[ticket_id].closed_at,
+                    "score": round(score, 4),
+                }
+                for ticket_id, score in hits
+                if ticket_id in rows
+            ]
         )
-        return Response(TicketSerializer(ticket).data)
 
     @action(
         detail=True,
@@ -380,36 +438,32 @@ class TicketViewSet(viewsets.ModelViewSet):
     )
     def ai_draft(self, request, pk=None):
         ticket = self.get_object()
+        if not ai_client.is_configured():
+            return Response({"detail": "GEMINI_API_KEY is not configured"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        force = str(request.data.get("force", "")).strip().lower() in {"1", "true", "yes", "y", "on"}
+        if not force:
+            _, digest = ai_drafts.build_prompt(ticket)
+            draft = ai_drafts.cached_draft(digest)
+            if draft is not None:
+                return Response(_draft_job_data(ai_drafts.finished_job(ticket.id, request.user.id, draft)))
+
+        # Gemini can take many seconds; a worker generates the draft and pushes
+        # it to the requester's sockets as ``ticket.ai_draft``.
+        job = ai_drafts.create_job(ticket.id, request.user.id, force=force)
+        generate_ai_draft.delay(job["job_id"])
+        location = request.build_absolute_uri(f"{job['job_id']}/")
+        return Response(_draft_job_data(job), status=status.HTTP_202_ACCEPTED, headers={"Location": location})
 
-        msgs = TicketMessage.objects.filter(ticket=ticket, is_internal=False).order_by("-created_at")[:10]
-        msgs = list(reversed(list(msgs)))
-
-        history_lines = []
-        for m in msgs:
-            author = getattr(m.author, "username", None) or "unknown"
-            history_lines.append(f"{author}: {_redact_pii(m.body)}")
-
-        prompt = "\n".join(
-            [
-                "You are a helpful customer support agent.",
-                "Write a short, friendly, and actionable reply.",
-                "Do not include private data. If you need more info, ask concise questions.",
-                "",
-                f"Ticket subject: {_redact_pii(ticket.subject)}",
-                f"Ticket description: {_redact_pii(ticket.description)}",
-                "",
-                "Conversation:",
-                *history_lines,
-                "",
-                "Draft reply:",
-            ]
-        )
-
-        try:
-            draft = _gemini_generate(prompt)
-        except RuntimeError as e:
-            return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        except Exception:
-            return Response({"detail": "Failed to generate draft"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        return Response({"ticket_id": ticket.id, "draft": draft})
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path=r"ai-draft/(?P<job_id>[0-9a-f]{32})",
+        permission_classes=[IsAgentOrAdmin],
+    )
+    def ai_draft_job(self, request, pk=None, job_id=None):
+        ticket = self.get_object()
+        job = ai_drafts.get_job(job_id)
+        if job is None or job["ticket_id"] != ticket.id or job["requested_by"] != request.user.id:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(_draft_job_data(job))
@@ -0,0 +1,186 @@
+# WebSocket authorization for ticket subscriptions. Decisions are resolved for
+# many tickets in one query (user, role and ticket ownership together) and
+# cached per (ticket, user) in Redis via the asyncio client, so a reconnect
+# storm costs one Redis round-trip per socket and no worker-thread hop.
+# Misses take a single database_sync_to_async hop (which also releases the
+# connection, unlike the async ORM's internal thread hop).
+# Assignment changes delete the affected keys; role changes expire with the TTL.
+# Stream sockets check the user itself at connect (tokens are validated without
+# the database), cached the same way and dropped when is_active changes.
+
+import logging
+
+import redis
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, Subquery
+
+from accounts.models import UserProfile
+from core.redis_clients import get_async_client, get_client
+from tickets.models import ACTIVE_STATUSES, Ticket
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+_ALLOWED = b"1"
+_DENIED = b"0"
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "WS_ACCESS_CACHE_TTL", 60))
+
+
+def _key(ticket_id, user_id) -> str:
+    return f"tickets:ws_access:{int(ticket_id)}:{int(user_id)}"
+
+
+def _user_key(user_id) -> str:
+    return f"tickets:ws_access:user:{int(user_id)}"
+
+
+def _decide(user_id, role, is_active, customer_id, assigned_agent_id) -> bool:
+    if not is_active:
+        return False
+    if role == UserProfile.Role.ADMIN:
+        return True
+    if role == UserProfile.Role.AGENT:
+        return assigned_agent_id == user_id
+    # No profile yet means the default (customer) role, as in get_user_role.
+    return customer_id == user_id
+
+
+@database_sync_to_async
+def _resolve(user_id: int, ticket_ids) -> set[int]:
+    rows = (
+        Ticket.objects.filter(id__in=ticket_ids)
+        .annotate(
+            viewer_role=Subquery(UserProfile.objects.filter(user_id=user_id).values("role")[:1]),
+            viewer_active=Exists(User.objects.filter(pk=user_id, is_active=True)),
+        )
+        .values_list("id", "customer_id", "assigned_agent_id", "viewer_role", "viewer_active")
+    )
+    return {
+        ticket_id
+        for ticket_id, customer_id, assigned_agent_id, role, is_active in rows
+        if _decide(user_id, role, is_active, customer_id, assigned_agent_id)
+    }
+
+
+@database_sync_to_async
+def _user_active(user_id: int) -> bool:
+    return User.objects.filter(pk=user_id, is_active=True).exists()
+
+
+@database_sync_to_async
+def queue_ticket_ids(user_id: int):
+    """Active tickets assigned to an agent or admin, or None if the user has no queue."""
+    role = (
+        UserProfile.objects.filter(user_id=user_id, user__is_active=True).values_list("role", flat=True).first()
+    )
+    if role not in (UserProfile.Role.AGENT, UserProfile.Role.ADMIN):
+        return None
+    return list(
+        Ticket.objects.filter(assigned_agent_id=user_id, status__in=ACTIVE_STATUSES)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+
+async def allowed_ticket_ids(user_id: int, ticket_ids) -> set[int]:
+    """Return the subset of ``ticket_ids`` the user may subscribe to."""
+    user_id = int(user_id)
+    ticket_ids = list(dict.fromkeys(int(t) for t in ticket_ids))
+    if not ticket_ids:
+        return set()
+
+    ttl = _ttl()
+    allowed = set()
+    missing = ticket_ids
+    if ttl > 0:
+        try:
+            cached = await get_async_client().mget([_key(t, user_id) for t in ticket_ids])
+        except redis.RedisError:
+            logger.warning("WebSocket access cache unavailable", exc_info=True)
+            ttl = 0
+        else:
+            missing = []
+            for ticket_id, value in zip(ticket_ids, cached):
+                if value == _ALLOWED:
+                    allowed.add(ticket_id)
+                elif value is None:
+                    missing.append(ticket_id)
+
+    if not missing:
+        return allowed
+
+    resolved = await _resolve(user_id, missing)
+    allowed |= resolved
+
+    if ttl > 0:
+        try:
+            pipe = get_async_client().pipeline(transaction=False)
+            for ticket_id in missing:
+                pipe.set(_key(ticket_id, user_id), _ALLOWED if ticket_id in resolved else _DENIED, ex=ttl)
+            await pipe.execute()
+        except redis.RedisError:
+            logger.warning("Failed to cache WebSocket access decisions", exc_info=True)
+    return allowed
+
+
+async def user_is_active(user_id: int) -> bool:
+    """Whether the user behind a (stateless) token still exists and is active."""
+    user_id = int(user_id)
+    ttl = _ttl()
+    if ttl > 0:
+        try:
+            cached = await get_async_client().get(_user_key(user_id))
+        except redis.RedisError:
+            logger.warning("WebSocket access cache unavailable", exc_info=True)
+            ttl = 0
+        else:
+            if cached is not None:
+                return cached == _ALLOWED
+
+    active = await _user_active(user_id)
+    if ttl > 0:
+        try:
+            await get_async_client().set(_user_key(user_id), _ALLOWED if active else _DENIED, ex=ttl)
+        except redis.RedisError:
+            logger.warning("Failed to cache WebSocket access decisions", exc_info=True)
+    return active
+
+
+def invalidate_user(user_id: int) -> None:
+    """Delete the cached active check for a user."""
+    if _ttl() <= 0:
+        return
+    try:
+        get_client().delete(_user_key(user_id))
+    except redis.RedisError:
+        logger.warning("Failed to invalidate WebSocket access cache", exc_info=True)
+
+
+def invalidate(pairs) -> None:
+    """Delete cached decisions for ``(ticket_id, user_id)`` pairs."""
+    keys = [_key(ticket_id, user_id) for ticket_id, user_id in pairs if user_id is not None]
+    if not keys or _ttl() <= 0:
+        return
+    try:
+        get_client().delete(*keys)
+    except redis.RedisError:
+        # Decisions expire on their own after WS_ACCESS_CACHE_TTL.
+        logger.warning("Failed to invalidate WebSocket access cache", exc_info=True)
+
+
+def schedule_invalidate_many(pairs) -> None:
+    """Invalidate ``(ticket_id, user_id)`` pairs once the current transaction commits."""
+    pairs = [(t, u) for t, u in pairs if u is not None]
+    if pairs:
+        transaction.on_commit(lambda: invalidate(pairs))
+
+
+def schedule_invalidate(ticket_id: int, *user_ids) -> None:
+    schedule_invalidate_many((ticket_id, u) for u in user_ids)
@@ -764,6 +764,8 @@ export default function App() {
   const [aiDraft, setAiDraft] = useState('')
   const [aiDraftLoading, setAiDraftLoading] = useState(false)
   const [aiDraftError, setAiDraftError] = useState('')
+  // Job id of the draft being generated; results arrive over the ticket socket (or by polling).
+  const aiDraftJobRef = useRef(null)
 
   const [availability, setAvailability] = useState(null)
   const [adminAgentsPresence, setAdminAgentsPresence] = useState(null)
@@ -1182,13 +1184,23 @@ export default function App() {
     if (!token || !selectedTicketId) return
 
     const wsBase = getWsBaseUrl()
-    const url = `${wsBase}/ws/tickets/${selectedTicketId}/?token=${encodeURIComponent(token)}`
-    const ws = new WebSocket(url)
-    wsRef.current = ws
-
-    ws.onmessage = (event) => {
-      const payload = safeJsonParse(event.data)
+    const baseUrl = `${wsBase}/ws/tickets/${selectedTicketId}/?token=${encodeURIComponent(token)}`
+    // Highest event seq seen; reconnects ask the server to replay only what came after it.
+    let lastSeq = null
+    let closedByEffect = false
+    let reconnectTimer = null
+    let ws = null
+
+    const handlePayload = (payload) => {
       if (!payload || !payload.type) return
+      if (typeof payload.seq === 'number') lastSeq = Math.max(lastSeq ?? 0, payload.seq)
+
+      if (payload.type === 'resync') {
+        // Missed events are no longer retained; refetch instead.
+        if (typeof payload.seq === 'number') lastSeq = payload.seq
+        loadTicketDetails(selectedTicketId)
+        return
+      }
 
       if (payload.type === 'ticket.message_created' && payload.message) {
         setMessages((prev) => {
@@ -1198,6 +1210,10 @@ export default function App() {
         })
       }
 
+      if (payload.type === 'ticket.ai_draft') {
+        applyAIDraftJob(payload)
+      }
+
       if (payload.type === 'ticket.status_changed') {
         setSelectedTicket((prev) => (prev ? { ...prev, status: payload.status } : prev))
         setTickets((prev) =>
@@ -1229,10 +1245,32 @@ export default function App() {
       }
     }
 
-    ws.onerror = () => {}
-    ws.onclose = () => {}
+    const connect = () => {
+      const url = lastSeq === null ? baseUrl : `${baseUrl}&since=${lastSeq}`
+      ws = new WebSocket(url)
+      wsRef.current = ws
+
+      ws.onmessage = (event) => {
+        const payload = safeJsonParse(event.data)
+        if (!payload) return
+        // Bursts (and replays) arrive as one frame: {type: 'batch', events: [...]}
+        const events = payload.type === 'batch' ? payload.events || [] : [payload]
+        events.forEach(handlePayload)
+      }
+
+      ws.onerror = () => {}
+      ws.onclose = (event) => {
+        // 44xx: auth/permission failures, do not retry.
+        if (closedByEffect || (event.code >= 4400 && event.code < 4500 && event.code !== 4408)) return
+        reconnectTimer = setTimeout(connect, 2000)
+      }
+    }
+
+    connect()
 
     return () => {
+      closedByEffect = true
+      clearTimeout(reconnectTimer)
       try {
         ws.close()
       } catch {
@@ -1341,20 +1379,55 @@ export default function App() {
     }
   }
 
+  // Apply a draft job update (socket event or poll); returns true once the job is finished.
+  function applyAIDraftJob(job) {
+    if (!job || !job.job_id || job.job_id !== aiDraftJobRef.current) return false
+    setAiDraft(job.draft || '')
+    if (job.status !== 'done' && job.status !== 'failed') return false
+    aiDraftJobRef.current = null
+    setAiDraftLoading(false)
+    if (job.status === 'failed') setAiDraftError(job.error || 'Failed to generate draft')
+    return true
+  }
+
   async function generateAIDraft() {
     if (!token || !selectedTicketId) return
+    // Asking again while a draft is shown means "give me a different one": skip the server's draft cache.
+    const force = Boolean(aiDraft.trim())
     setAiDraftError('')
+    setAiDraft('')
     setAiDraftLoading(true)
+    const ticketId = selectedTicketId
     try {
-      const res = await apiFetch(`/api/tickets/${selectedTicketId}/ai-draft/`, {
+      const job = await apiFetch(`/api/tickets/${ticketId}/ai-draft/`, {
         method: 'POST',
         token,
-        body: {},
+        body: { force },
       })
-      setAiDraft(res?.draft || '')
+      aiDraftJobRef.current = job?.job_id || null
+      if (!aiDraftJobRef.current || applyAIDraftJob(job)) {
+        setAiDraftLoading(false)
+        return
+      }
+
+      // Polling fallback in case the socket is down or misses the result.
+      const poll = async () => {
+        if (aiDraftJobRef.current !== job.job_id) return
+        try {
+          const latest = await apiFetch(`/api/tickets/${ticketId}/ai-draft/${job.job_id}/`, { token })
+          if (applyAIDraftJob(latest)) return
+        } catch (err) {
+          if (aiDraftJobRef.current !== job.job_id) return
+          aiDraftJobRef.current = null
+          setAiDraftError(err.message)
+          setAiDraftLoading(false)
+          return
+        }
+        setTimeout(poll, 3000)
+      }
+      setTimeout(poll, 3000)
     } catch (err) {
       setAiDraftError(err.message)
-    } finally {
       setAiDraftLoading(false)
     }
   }